@@ -10,64 +10,47 @@ PREREQUISITES:
 2. Import your K1 model (File > Import > your format)
 3. Select your K1 model in the scene
 4. Open Blender's Scripting workspace
-5. Create new text block and paste this entire script
+5. Click "Open" and select this file (k1_rig.py must be in the same folder)
 6. Click "Run Script"
 
 The script will create 5 camera setups and lighting rigs, one for each render category.
+Re-running it updates the existing CAT1-CAT5 cameras and lights in place (only
+changed properties are written) instead of deleting and recreating them.
 """
 
-import bpy
+import os
+import sys
 import math
 
+import bpy
+
+
+def _script_dir():
+    """
+    Folder this script lives in. From the Text Editor's Run Script, __file__
+    is <blend>/<text name>, so use the text block's own file path there.
+    """
+    text = getattr(getattr(bpy.context, "space_data", None), "text", None)
+    if text is None and not os.path.isfile(__file__):
+        text = bpy.data.texts.get(os.path.basename(__file__))
+    if text is not None and text.filepath:
+        return os.path.dirname(bpy.path.abspath(text.filepath))
+    return os.path.dirname(os.path.abspath(__file__))  # blender -b --python
+
+
+# Cameras and lights are reconciled against a declarative spec (k1_rig.py)
+# instead of being deleted and recreated on every run.
+sys.path.insert(0, _script_dir())
+import k1_rig  # noqa: E402
+from k1_rig import camera_spec, light_spec  # noqa: E402
+
 # Configuration - adjust these if your model has different dimensions
 DEVICE_CENTER = (0, 0, 0)  # Assuming K1 model is centered at origin
 DEVICE_LENGTH = 0.32  # 32cm in meters
 DEVICE_WIDTH = 0.054  # 54mm in meters
 
-def clear_scene_cameras_lights():
-    """Remove existing cameras and lights to start fresh"""
-    for obj in bpy.data.objects:
-        if obj.type in ['CAMERA', 'LIGHT']:
-            bpy.data.objects.remove(obj, do_unlink=True)
-    print("Cleared existing cameras and lights")
-
-def create_camera(name, location, rotation, lens=50):
-    """Helper function to create and configure a camera"""
-    cam_data = bpy.data.cameras.new(name=name)
-    cam_data.lens = lens
-    cam_obj = bpy.data.objects.new(name, cam_data)
-    bpy.context.collection.objects.link(cam_obj)
-    cam_obj.location = location
-    cam_obj.rotation_euler = rotation
-    return cam_obj
-
-def create_light(name, light_type, location, energy, color=(1, 1, 1)):
-    """Helper function to create and configure a light"""
-    light_data = bpy.data.lights.new(name=name, type=light_type)
-    light_data.energy = energy
-    light_data.color = color
-    light_obj = bpy.data.objects.new(name, light_data)
-    bpy.context.collection.objects.link(light_obj)
-    light_obj.location = location
-    # Point light at device center
-    direction = tuple(DEVICE_CENTER[i] - location[i] for i in range(3))
-    light_obj.rotation_euler = (0, 0, 0)  # Will be properly oriented by track_to below
-    return light_obj
-
-def add_track_to_constraint(obj, target_location):
-    """Make object point toward target location"""
-    # Create empty at device center if it doesn't exist
-    if "DeviceCenter" not in bpy.data.objects:
-        empty = bpy.data.objects.new("DeviceCenter", None)
-        bpy.context.collection.objects.link(empty)
-        empty.location = target_location
-    else:
-        empty = bpy.data.objects["DeviceCenter"]
-
-    constraint = obj.constraints.new(type='TRACK_TO')
-    constraint.target = empty
-    constraint.track_axis = 'TRACK_NEGATIVE_Z'
-    constraint.up_axis = 'UP_Y'
+# Name prefixes this script owns; anything else in the scene is left alone.
+MANAGED_PREFIXES = ("CAT1_", "CAT2_", "CAT3_", "CAT4_", "CAT5_")
 
 # ============================================================================
 # CATEGORY 1: HERO ROTATION SETUP
@@ -79,6 +62,8 @@ def setup_category_1_hero_rotation():
     """
     print("\n=== Setting up Category 1: Hero Rotation ===")
 
+    rig = []
+
     # Camera position: 50cm from device, 15 degrees elevation, 45 degrees horizontal angle
     distance = 0.5
     elevation_rad = math.radians(15)
@@ -88,36 +73,38 @@ def setup_category_1_hero_rotation():
     cam_y = -distance * math.cos(elevation_rad) * math.sin(angle_rad)
     cam_z = distance * math.sin(elevation_rad)
 
-    cam = create_camera(
+    rig.append(camera_spec(
         name="CAT1_HeroRotation_Camera",
         location=(cam_x, cam_y, cam_z),
         rotation=(elevation_rad, 0, angle_rad + math.pi/2),
-        lens=50
-    )
-    add_track_to_constraint(cam, DEVICE_CENTER)
+        lens=50,
+        track=True
+    ))
 
     # Key light: upper right, intensity 0.8 (800W equivalent)
-    key_light = create_light(
+    rig.append(light_spec(
         name="CAT1_KeyLight",
         light_type='AREA',
         location=(0.4, -0.3, 0.5),
-        energy=800
-    )
-    add_track_to_constraint(key_light, DEVICE_CENTER)
+        energy=800,
+        track=True
+    ))
 
     # Rim light: behind device, intensity 0.4 (400W equivalent)
-    rim_light = create_light(
+    rig.append(light_spec(
         name="CAT1_RimLight",
         light_type='AREA',
         location=(-0.3, 0, 0.3),
-        energy=400
-    )
-    add_track_to_constraint(rim_light, DEVICE_CENTER)
+        energy=400,
+        track=True
+    ))
 
     print("✓ Category 1 setup complete")
-    print(f"  Camera: {cam.name} at {cam.location}")
+    print(f"  Camera: CAT1_HeroRotation_Camera at {tuple(round(v, 3) for v in (cam_x, cam_y, cam_z))}")
     print("  Render 30 frames rotating device 12 degrees per frame")
 
+    return rig
+
 # ============================================================================
 # CATEGORY 2: EDGE DETAIL CLOSEUPS
 # ============================================================================
@@ -128,53 +115,57 @@ def setup_category_2_edge_closeups():
     """
     print("\n=== Setting up Category 2: Edge Detail Closeups ===")
 
+    rig = []
+
     close_distance = 0.1  # 10cm from edge
 
     # Left edge camera
-    cam_left = create_camera(
+    rig.append(camera_spec(
         name="CAT2_EdgeLeft_Camera",
         location=(-DEVICE_LENGTH/2 - close_distance, 0, 0.05),
         rotation=(math.radians(90), 0, math.radians(90)),
         lens=85  # Longer lens for macro effect
-    )
+    ))
 
     # Right edge camera
-    cam_right = create_camera(
+    rig.append(camera_spec(
         name="CAT2_EdgeRight_Camera",
         location=(DEVICE_LENGTH/2 + close_distance, 0, 0.05),
         rotation=(math.radians(90), 0, math.radians(-90)),
         lens=85
-    )
+    ))
 
     # Top detail camera
-    cam_top = create_camera(
+    rig.append(camera_spec(
         name="CAT2_EdgeTop_Camera",
         location=(0, 0, DEVICE_WIDTH/2 + close_distance),
         rotation=(0, 0, 0),
         lens=85
-    )
+    ))
 
     # Bottom detail camera
-    cam_bottom = create_camera(
+    rig.append(camera_spec(
         name="CAT2_EdgeBottom_Camera",
         location=(0, 0, -DEVICE_WIDTH/2 - close_distance),
         rotation=(math.radians(180), 0, 0),
         lens=85
-    )
+    ))
 
     # Grazing side light (intensity 0.9 = 900W)
-    edge_light = create_light(
+    rig.append(light_spec(
         name="CAT2_GrazingLight",
         light_type='AREA',
         location=(0, -0.15, 0.05),
-        energy=900
-    )
-    add_track_to_constraint(edge_light, DEVICE_CENTER)
+        energy=900,
+        track=True
+    ))
 
     print("✓ Category 2 setup complete")
     print("  Created 4 edge-focused cameras with macro lens")
     print("  Render each camera separately for 4 closeup views")
 
+    return rig
+
 # ============================================================================
 # CATEGORY 3: CONTEXT SCALE (DESK ENVIRONMENT)
 # ============================================================================
@@ -185,56 +176,60 @@ def setup_category_3_context_scale():
     """
     print("\n=== Setting up Category 3: Context Scale ===")
 
+    rig = []
+
     # Front view (user POV)
-    cam_front = create_camera(
+    rig.append(camera_spec(
         name="CAT3_DeskFront_Camera",
         location=(0, -0.6, 0.15),
         rotation=(math.radians(80), 0, 0),
-        lens=35  # Wider lens for environment context
-    )
-    add_track_to_constraint(cam_front, DEVICE_CENTER)
+        lens=35,  # Wider lens for environment context
+        track=True
+    ))
 
     # 45-degree angle view
-    cam_angle = create_camera(
+    rig.append(camera_spec(
         name="CAT3_DeskAngle_Camera",
         location=(0.4, -0.5, 0.2),
         rotation=(math.radians(75), 0, math.radians(40)),
-        lens=35
-    )
-    add_track_to_constraint(cam_angle, DEVICE_CENTER)
+        lens=35,
+        track=True
+    ))
 
     # Top-down view
-    cam_top = create_camera(
+    rig.append(camera_spec(
         name="CAT3_DeskTop_Camera",
         location=(0, 0, 0.8),
         rotation=(0, 0, 0),
-        lens=50
-    )
-    add_track_to_constraint(cam_top, DEVICE_CENTER)
+        lens=50,
+        track=True
+    ))
 
     # Ambient room light (low intensity, cool temp)
-    ambient = create_light(
+    rig.append(light_spec(
         name="CAT3_AmbientRoom",
         light_type='SUN',
         location=(0, 0, 1),
         energy=50,
         color=(0.9, 0.95, 1.0)  # Slightly cool
-    )
+    ))
 
     # Warm desk lamp (tungsten color temp ~3200K)
-    desk_lamp = create_light(
+    rig.append(light_spec(
         name="CAT3_DeskLamp",
         light_type='AREA',
         location=(-0.4, -0.3, 0.4),
         energy=600,
-        color=(1.0, 0.8, 0.6)  # Warm tungsten
-    )
-    add_track_to_constraint(desk_lamp, DEVICE_CENTER)
+        color=(1.0, 0.8, 0.6),  # Warm tungsten
+        track=True
+    ))
 
     print("✓ Category 3 setup complete")
     print("  NOTE: You'll need to add desk props (keyboard, mouse, etc) manually")
     print("  Render from each of the 3 cameras with props in scene")
 
+    return rig
+
 # ============================================================================
 # CATEGORY 4: LIGHT-READY DARK BACKGROUNDS
 # ============================================================================
@@ -245,52 +240,56 @@ def setup_category_4_light_ready_dark():
     """
     print("\n=== Setting up Category 4: Light-Ready Dark ===")
 
+    rig = []
+
     # Front-facing view
-    cam_front = create_camera(
+    rig.append(camera_spec(
         name="CAT4_DarkFront_Camera",
         location=(0, -0.5, 0),
         rotation=(math.radians(90), 0, 0),
-        lens=50
-    )
-    add_track_to_constraint(cam_front, DEVICE_CENTER)
+        lens=50,
+        track=True
+    ))
 
     # 3/4 view (main hero angle)
-    cam_three_quarter = create_camera(
+    rig.append(camera_spec(
         name="CAT4_DarkThreeQuarter_Camera",
         location=(0.35, -0.35, 0.1),
         rotation=(math.radians(85), 0, math.radians(45)),
-        lens=50
-    )
-    add_track_to_constraint(cam_three_quarter, DEVICE_CENTER)
+        lens=50,
+        track=True
+    ))
 
     # Pure side profile
-    cam_side = create_camera(
+    rig.append(camera_spec(
         name="CAT4_DarkSide_Camera",
         location=(-0.5, 0, 0),
         rotation=(math.radians(90), 0, math.radians(90)),
-        lens=50
-    )
-    add_track_to_constraint(cam_side, DEVICE_CENTER)
+        lens=50,
+        track=True
+    ))
 
     # Minimal rim light (intensity 0.3 = 300W) - just enough to define edges
-    rim = create_light(
+    rig.append(light_spec(
         name="CAT4_MinimalRim",
         light_type='AREA',
         location=(-0.2, 0.1, 0.2),
-        energy=300
-    )
-    add_track_to_constraint(rim, DEVICE_CENTER)
+        energy=300,
+        track=True
+    ))
 
     # Set world background to pure black
-    bpy.context.scene.world.use_nodes = True
+    k1_rig.set_if_changed(bpy.context.scene.world, "use_nodes", True)
     bg_node = bpy.context.scene.world.node_tree.nodes["Background"]
-    bg_node.inputs[0].default_value = (0, 0, 0, 1)  # Pure black RGBA
-    bg_node.inputs[1].default_value = 0  # Zero strength
+    k1_rig.set_if_changed(bg_node.inputs[0], "default_value", (0, 0, 0, 1))  # Pure black RGBA
+    k1_rig.set_if_changed(bg_node.inputs[1], "default_value", 0)  # Zero strength
 
     print("✓ Category 4 setup complete")
     print("  World background set to pure black")
     print("  Device will be mostly silhouette - perfect for AI light animation")
 
+    return rig
+
 # ============================================================================
 # CATEGORY 5: MATERIAL DETAIL MACRO
 # ============================================================================
@@ -301,45 +300,49 @@ def setup_category_5_material_macro():
     """
     print("\n=== Setting up Category 5: Material Macro ===")
 
+    rig = []
+
     macro_distance = 0.03  # 3cm from surface
 
     # Aluminum housing texture macro
-    cam_aluminum = create_camera(
+    rig.append(camera_spec(
         name="CAT5_MacroAluminum_Camera",
         location=(DEVICE_LENGTH/4, -macro_distance, 0.02),
         rotation=(math.radians(85), 0, 0),
         lens=100  # Very long lens for extreme macro
-    )
+    ))
 
     # Light guide plate edge macro (showing transparency)
-    cam_acrylic = create_camera(
+    rig.append(camera_spec(
         name="CAT5_MacroAcrylic_Camera",
         location=(0, -macro_distance, DEVICE_WIDTH/2),
         rotation=(math.radians(75), 0, 0),
         lens=100
-    )
+    ))
 
     # Corner detail/seam macro
-    cam_corner = create_camera(
+    rig.append(camera_spec(
         name="CAT5_MacroCorner_Camera",
         location=(DEVICE_LENGTH/2 - 0.02, -macro_distance, 0.02),
         rotation=(math.radians(80), 0, math.radians(-15)),
         lens=100
-    )
+    ))
 
     # Close directional light for texture reveal
-    macro_light = create_light(
+    rig.append(light_spec(
         name="CAT5_MacroLight",
         light_type='SPOT',
         location=(0, -0.05, 0.08),
-        energy=500
-    )
-    add_track_to_constraint(macro_light, DEVICE_CENTER)
+        energy=500,
+        track=True
+    ))
 
     print("✓ Category 5 setup complete")
     print("  Created 3 extreme macro cameras (add more manually if needed)")
     print("  Use 100mm equivalent lens for shallow depth of field effect")
 
+    return rig
+
 # ============================================================================
 # MAIN EXECUTION
 # ============================================================================
@@ -349,15 +352,17 @@ def main():
     print("K1-Lightwave Blender Setup - Starting Automation")
     print("="*60)
 
-    # Clear existing cameras and lights
-    clear_scene_cameras_lights()
-
-    # Setup all 5 categories
-    setup_category_1_hero_rotation()
-    setup_category_2_edge_closeups()
-    setup_category_3_context_scale()
-    setup_category_4_light_ready_dark()
-    setup_category_5_material_macro()
+    # Collect the rig spec of all 5 categories
+    rig = []
+    rig += setup_category_1_hero_rotation()
+    rig += setup_category_2_edge_closeups()
+    rig += setup_category_3_context_scale()
+    rig += setup_category_4_light_ready_dark()
+    rig += setup_category_5_material_macro()
+
+    # Update the scene in place: reuse existing cameras/lights, only write what changed
+    print()
+    k1_rig.reconcile_rig(rig, MANAGED_PREFIXES, DEVICE_CENTER)
 
     print("\n" + "="*60)
     print("SETUP COMPLETE!")
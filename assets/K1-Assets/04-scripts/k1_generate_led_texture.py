@@ -1,50 +1,72 @@
 """
 K1 Lightwave - LED Texture Generation Script
-Uses AI-Render addon to create realistic LED textures for the light guide plate
+Bakes procedural LED textures and wires them into the K1_LED_* materials
 
 Based on: Hardware specs - 320 RGB LEDs (160 per edge), dual edge-lit design
-Addon: AI-Render with StableHorde API (1000 free requests)
+Textures: k1_led_textures.py (NumPy, same HSV palette math as the physics kernel)
 
 USAGE:
-1. Ensure AI-Render addon is enabled
-2. Open K1_Final.blend
-3. Copy this script to Blender's Scripting workspace
-4. Run the script (Alt+P or click Run)
-5. Wait 30-60 seconds for AI texture generation
+1. Open K1_Final.blend
+2. Open this script in Blender's Scripting workspace (k1_led_textures.py must be in the same folder)
+3. Run the script (Alt+P or click Run)
+4. All six textures are baked offline in about a second and assigned automatically
+
+For animated LEDs, pack a physics run with k1_led_atlas.py and call
+create_led_atlas_material(); each rendered frame then shows that frame's LEDs.
+
+Textures are written next to the .blend (//led_textures/) as 32-bit EXR, so
+LED values above 1.0 survive into the emission shader. Re-running re-bakes
+them and updates the existing materials in place.
 """
 
+import os
+import sys
+import json
+import time
+
 import bpy
-import math
 
-def create_led_texture_material(name, preset="fire"):
+
+def _script_dir():
+    """
+    Folder this script lives in. From the Text Editor's Run Script, __file__
+    is <blend>/<text name>, so use the text block's own file path there.
     """
-    Create material with AI-generated LED texture
+    text = getattr(getattr(bpy.context, "space_data", None), "text", None)
+    if text is None and not os.path.isfile(__file__):
+        text = bpy.data.texts.get(os.path.basename(__file__))
+    if text is not None and text.filepath:
+        return os.path.dirname(bpy.path.abspath(text.filepath))
+    return os.path.dirname(os.path.abspath(__file__))  # blender -b --python
+
+
+sys.path.insert(0, _script_dir())
+import k1_led_atlas  # noqa: E402
+import k1_led_textures  # noqa: E402
+
+# Emission strength per format: PNG stores value / VALUE_SCALE, EXR stores the value.
+EMISSION_STRENGTH = {"png": k1_led_textures.VALUE_SCALE, "exr": 1.0}
+
+TEXTURE_NODE_LABEL = "K1_LED_TEXTURE"
+
+def create_led_texture_material(name, preset="fire", image_path=None, fmt="exr"):
+    """
+    Create (or update) an LED material driven by a baked texture
 
     Presets based on K1 firmware palettes:
     - fire: Orange/red glow (warm, energetic)
     - ocean: Blue/cyan gradient (cool, calm)
     - neon: Pink/purple/blue (vibrant, electric)
     - white: Clean white with slight blue tint (professional)
+    - dual_edge: Cyan bottom edge, magenta top edge
+    - reactive: Bass pulse travelling out from the centre
     """
 
-    # AI-Render prompts optimized for LED visualization
-    prompts = {
-        "fire": "320 individual RGB LED pixels in a line, orange to red gradient, soft glow effect, professional product photography lighting, 4K resolution, slight bloom, warm color temperature",
-        "ocean": "320 individual RGB LED pixels in a line, deep blue to cyan gradient, soft glow effect, professional product photography lighting, 4K resolution, slight bloom, cool color temperature",
-        "neon": "320 individual RGB LED pixels in a line, pink to purple to blue gradient, vibrant neon glow effect, professional product photography lighting, 4K resolution, strong bloom, electric aesthetic",
-        "white": "320 individual RGB LED pixels in a line, clean white with slight blue tint, soft uniform glow, professional product photography lighting, 4K resolution, minimal bloom, neutral color temperature",
-        "dual_edge": "320 RGB LED pixels, dual light source from both edges, even diffusion across acrylic light guide plate, no hotspots, professional lighting, 4K resolution, symmetrical glow",
-        "reactive": "320 RGB LED pixels responding to music, bass-reactive pattern, dynamic color shifts, blue to pink gradient, pulsing glow effect, professional photography lighting, 4K resolution"
-    }
-
-    prompt = prompts.get(preset, prompts["fire"])
-
-    print(f"\n🎨 Generating LED Texture: {name}")
+    print(f"\n🎨 LED Texture: {name}")
     print(f"   Preset: {preset}")
-    print(f"   Prompt: {prompt[:80]}...")
 
-    # Create new material
-    mat = bpy.data.materials.new(name=name)
+    # Reuse the material if it exists so objects using it pick up the new texture
+    mat = bpy.data.materials.get(name) or bpy.data.materials.new(name=name)
     mat.use_nodes = True
     nodes = mat.node_tree.nodes
     links = mat.node_tree.links
@@ -59,63 +81,163 @@ def create_led_texture_material(name, preset="fire"):
     # Add Emission shader (LEDs emit light)
     emission_node = nodes.new('ShaderNodeEmission')
     emission_node.location = (200, 0)
-    emission_node.inputs['Strength'].default_value = 2.0  # LED brightness
+    emission_node.inputs['Strength'].default_value = EMISSION_STRENGTH[fmt]  # LED brightness
 
-    # Add AI-Render texture node
-    # NOTE: You'll need to manually trigger AI-Render generation
-    # This script sets up the material structure
+    # Add baked texture node
     image_tex_node = nodes.new('ShaderNodeTexImage')
     image_tex_node.location = (0, 0)
-    image_tex_node.label = "AI_RENDER_HERE"
+    image_tex_node.label = TEXTURE_NODE_LABEL
+    if image_path:
+        image = bpy.data.images.load(image_path, check_existing=True)
+        image.reload()  # pick up a re-bake of the same file
+        image_tex_node.image = image
+        image_tex_node.extension = 'EXTEND'
+        print(f"   Texture: {bpy.path.relpath(image_path)}")
 
     # Link nodes
     links.new(image_tex_node.outputs['Color'], emission_node.inputs['Color'])
     links.new(emission_node.outputs['Emission'], output_node.inputs['Surface'])
 
-    print(f"   ✓ Material created: {name}")
-    print(f"   ⚠️  NEXT STEP: Manually generate AI texture")
+    print(f"   ✓ Material ready: {name}")
 
     return mat
 
-def setup_led_materials():
-    """Create all LED texture materials for different firmware presets"""
+def setup_led_materials(out_dir=None, fmt="exr"):
+    """Bake all LED textures and create the K1_LED_* materials for the firmware presets"""
 
     print("\n💡 K1 LIGHTWAVE - LED TEXTURE SETUP")
     print("=" * 60)
 
-    materials = []
+    if out_dir is None:
+        # Next to the .blend if it has been saved, otherwise next to this script
+        base = bpy.path.abspath("//") if bpy.data.filepath else os.path.dirname(os.path.abspath(__file__))
+        out_dir = os.path.join(base, "led_textures")
+
+    t0 = time.perf_counter()
+    paths = k1_led_textures.bake_all(out_dir, fmt=fmt)
+    print(f"✓ Baked {len(paths)} textures in {time.perf_counter() - t0:.2f}s -> {out_dir}")
 
-    # Create materials for each preset
-    presets = [
-        ("K1_LED_Fire", "fire"),
-        ("K1_LED_Ocean", "ocean"),
-        ("K1_LED_Neon", "neon"),
-        ("K1_LED_White", "white"),
-        ("K1_LED_DualEdge", "dual_edge"),
-        ("K1_LED_Reactive", "reactive")
-    ]
-
-    for mat_name, preset in presets:
-        mat = create_led_texture_material(mat_name, preset)
+    materials = []
+    for preset, mat_name in k1_led_textures.PRESETS.items():
+        mat = create_led_texture_material(mat_name, preset, paths[preset], fmt)
         materials.append(mat)
 
     print("\n" + "=" * 60)
-    print(f"✅ Created {len(materials)} LED materials")
-    print("\n📋 MANUAL STEPS REQUIRED (AI-Render):")
-    print("=" * 60)
-    print("\nFor EACH material created above:")
-    print("1. Select the material in Shader Editor")
-    print("2. Select the 'AI_RENDER_HERE' Image Texture node")
-    print("3. In the AI-Render panel (right sidebar):")
-    print("   • Click 'Generate' button")
-    print("   • Wait 30-60 seconds for generation")
-    print("   • Image will appear in the texture node")
-    print("4. Repeat for next material")
+    print(f"✅ {len(materials)} LED materials ready")
     print("\n💡 TIP: Start with K1_LED_Fire (hero shot primary)")
     print("=" * 60)
 
     return materials
 
+def _atlas_driver(socket, index, expression):
+    fcurve = socket.driver_add("default_value", index)
+    fcurve.driver.type = 'SCRIPTED'
+    fcurve.driver.expression = expression  # simple expression: no Python auto-run needed
+
+def create_led_atlas_material(name, atlas_path, start_frame=1):
+    """
+    Create (or update) an LED material animated by a k1_led_atlas.py atlas
+
+    Scene frame `start_frame` shows atlas frame 0; the run loops after its
+    last frame. Expects the plate's UVs to run along the strip in U with the
+    top edge at V=1 (same orientation as the baked stills).
+    """
+
+    path = bpy.path.abspath(atlas_path)
+    with open(k1_led_atlas.sidecar_path(path), encoding="utf-8") as f:
+        layout = json.load(f)
+    frames, rows, columns, height = layout["frames"], layout["rows"], layout["columns"], layout["height"]
+
+    print(f"\n🎞️  LED Atlas: {name}")
+    print(f"   {frames} frames from {bpy.path.relpath(path)} (frame {start_frame} = atlas frame 0)")
+    render = bpy.context.scene.render
+    scene_fps = render.fps / render.fps_base
+    if abs(scene_fps - layout["fps"]) > 1e-3:
+        print(f"   ⚠️  Atlas was simulated at {layout['fps']:g} fps, scene runs at {scene_fps:g} fps")
+
+    mat = bpy.data.materials.get(name) or bpy.data.materials.new(name=name)
+    mat.use_nodes = True
+    nodes = mat.node_tree.nodes
+    links = mat.node_tree.links
+    nodes.clear()
+
+    image = bpy.data.images.load(path, check_existing=True)
+    image.reload()
+
+    output_node = nodes.new('ShaderNodeOutputMaterial')
+    output_node.location = (1000, 0)
+    emission_node = nodes.new('ShaderNodeEmission')
+    emission_node.location = (800, 0)
+    emission_node.inputs['Strength'].default_value = EMISSION_STRENGTH["png"]
+
+    coord_node = nodes.new('ShaderNodeTexCoord')
+    coord_node.location = (-800, 0)
+    split_node = nodes.new('ShaderNodeSeparateXYZ')
+    split_node.location = (-600, -300)
+    links.new(coord_node.outputs['UV'], split_node.inputs['Vector'])
+
+    # Atlas frame for the current scene frame (looped), its tile column and row
+    t = f"(frame - {start_frame})"
+    idx = f"({t} - floor({t} / {frames}) * {frames})"
+    col = f"floor({idx} / {rows})"
+    row = f"({idx} - {col} * {rows})"
+
+    falloff = k1_led_textures.GLOW_FALLOFF
+    strip_colors = []
+    for strip, label in enumerate(("Top", "Bottom")):
+        y = 200 - 400 * strip
+
+        # Sample this frame's strip row: U spans one tile, V is pinned to the row centre
+        mapping_node = nodes.new('ShaderNodeMapping')
+        mapping_node.location = (-400, y)
+        mapping_node.label = f"{label} strip"
+        mapping_node.inputs['Scale'].default_value = (1.0 / columns, 0.0, 1.0)
+        _atlas_driver(mapping_node.inputs['Location'], 0, f"{col} / {columns}")
+        _atlas_driver(mapping_node.inputs['Location'], 1, f"({height - 0.5 - strip} - 2 * {row}) / {height}")
+        links.new(coord_node.outputs['UV'], mapping_node.inputs['Vector'])
+
+        tex_node = nodes.new('ShaderNodeTexImage')
+        tex_node.location = (-200, y)
+        tex_node.label = f"{TEXTURE_NODE_LABEL} {label}"
+        tex_node.image = image
+        tex_node.extension = 'EXTEND'
+        links.new(mapping_node.outputs['Vector'], tex_node.inputs['Vector'])
+
+        # Glow fades with distance from its edge: exp(-depth / falloff)
+        depth_node = nodes.new('ShaderNodeMath')
+        depth_node.location = (-200, y - 250)
+        if strip == 0:  # depth = 1 - V
+            depth_node.operation = 'MULTIPLY_ADD'
+            depth_node.inputs[1].default_value = 1.0 / falloff
+            depth_node.inputs[2].default_value = -1.0 / falloff
+        else:  # depth = V
+            depth_node.operation = 'MULTIPLY'
+            depth_node.inputs[1].default_value = -1.0 / falloff
+        links.new(split_node.outputs['Y'], depth_node.inputs[0])
+        exp_node = nodes.new('ShaderNodeMath')
+        exp_node.location = (0, y - 250)
+        exp_node.operation = 'EXPONENT'
+        links.new(depth_node.outputs['Value'], exp_node.inputs[0])
+
+        scale_node = nodes.new('ShaderNodeVectorMath')
+        scale_node.location = (200, y)
+        scale_node.operation = 'SCALE'
+        links.new(tex_node.outputs['Color'], scale_node.inputs[0])
+        links.new(exp_node.outputs['Value'], scale_node.inputs['Scale'])
+        strip_colors.append(scale_node)
+
+    add_node = nodes.new('ShaderNodeVectorMath')
+    add_node.location = (500, 0)
+    add_node.operation = 'ADD'
+    links.new(strip_colors[0].outputs['Vector'], add_node.inputs[0])
+    links.new(strip_colors[1].outputs['Vector'], add_node.inputs[1])
+    links.new(add_node.outputs['Vector'], emission_node.inputs['Color'])
+    links.new(emission_node.outputs['Emission'], output_node.inputs['Surface'])
+
+    print(f"   ✓ Material ready: {name}")
+
+    return mat
+
 def create_led_plane_with_texture(material_name="K1_LED_Fire"):
     """
     Create a plane representing the LED strip with the generated texture
@@ -186,14 +308,13 @@ if __name__ == "__main__":
 
     print("\n\n🎯 WORKFLOW SUMMARY:")
     print("=" * 60)
-    print("STEP 1: Generate textures in AI-Render (30-60 sec each)")
-    print("STEP 2: Test on preview plane:")
+    print("STEP 1: Test on preview plane:")
     print("        >>> create_led_plane_with_texture('K1_LED_Fire')")
-    print("STEP 3: Apply to K1 model:")
+    print("STEP 2: Apply to K1 model:")
     print("        >>> apply_led_texture_to_k1('K1_LED_Fire', 'FINAL_K1')")
-    print("STEP 4: Render test shot (F12)")
+    print("STEP 3: Render test shot (F12)")
+    print("\nANIMATED LEDs (hero rotation): pack a physics run into an atlas")
+    print("        $ python k1_led_atlas.py --mode Snapwave --hero --frames 30 --out cat1_atlas.png")
+    print("        >>> create_led_atlas_material('K1_LED_Animated', '//cat1_atlas.png')")
+    print("        >>> apply_led_texture_to_k1('K1_LED_Animated', 'FINAL_K1')")
     print("=" * 60)
-
-    print("\n💡 QUICK START:")
-    print("After generating AI textures, run this in console:")
-    print(">>> apply_led_texture_to_k1('K1_LED_Fire', 'FINAL_K1')")
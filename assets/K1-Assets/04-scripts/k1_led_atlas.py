@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+K1 Lightwave - Animated LED Atlas Builder
+=========================================
+
+Packs a physics run into one atlas texture so rendered frames show the LED
+state of that frame instead of a frozen still (e.g. the 30-frame CAT1 hero
+rotation).
+
+Each frame is a 160 x 2 tile (top strip above bottom strip, raw LED values).
+Tiles are stacked top to bottom in columns of up to MAX_ROWS frames, so even
+long runs stay one image under GPU texture limits and the renderer opens a
+single file instead of one per frame. A small JSON sidecar records the layout;
+k1_generate_led_texture.create_led_atlas_material() reads it and drives the
+material's UV offset from the scene frame.
+
+Sources:
+- a .k1ls LED timeline (tools/python/physics/led_timeline.py), or
+- a fresh run of the physics kernel (tools/python/physics/k1_physics.py).
+
+USAGE:
+    python k1_led_atlas.py --timeline hero.k1ls --out hero_atlas.png
+    python k1_led_atlas.py --mode Snapwave --hero --frames 30 --fps 30 --out cat1_atlas.png
+
+Then in Blender:
+    >>> create_led_atlas_material('K1_LED_Animated', '//cat1_atlas.png')
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+
+import numpy as np
+
+from k1_led_textures import write_png
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PHYSICS_DIR = os.path.join(SCRIPT_DIR, "..", "..", "..", "tools", "python", "physics")
+
+LEDS_PER_EDGE = 160
+STRIPS = 2                 # rows per tile: top, bottom
+MAX_TEXTURE_SIZE = 16384   # common GPU limit, per side
+MAX_ROWS = MAX_TEXTURE_SIZE // STRIPS
+
+ATLAS_VERSION = 1
+
+# k1_physics.MODES; listed here so argparse rejects a bad --mode before the kernel is imported.
+PHYSICS_MODES = ("Existing", "Snapwave", "Bloom")
+
+
+# ============================================================================
+# ATLAS LAYOUT
+# ============================================================================
+
+def atlas_layout(frames):
+    """Columns/rows of the tile grid for `frames` frames."""
+    rows = min(frames, MAX_ROWS)
+    columns = math.ceil(frames / rows)
+    if columns * LEDS_PER_EDGE > MAX_TEXTURE_SIZE:
+        raise ValueError(f"{frames} frames do not fit in a {MAX_TEXTURE_SIZE}px atlas")
+    return {
+        "version": ATLAS_VERSION,
+        "frames": frames,
+        "columns": columns,
+        "rows": rows,
+        "width": columns * LEDS_PER_EDGE,
+        "height": rows * STRIPS,
+        "leds": LEDS_PER_EDGE,
+    }
+
+
+def build_atlas(leds):
+    """
+    leds: (frames, 2, 160, 3) bottom/top LED values (led_timeline layout).
+    Returns (image, layout); image is (height, width, 3), row 0 at the top.
+    Frame k sits in column k // rows, tile row k % rows: top strip first.
+    """
+    frames = len(leds)
+    layout = atlas_layout(frames)
+    rows, columns = layout["rows"], layout["columns"]
+    padded = np.zeros((columns * rows, STRIPS, LEDS_PER_EDGE, 3), dtype=np.float32)
+    padded[:frames] = leds[:, ::-1]  # (bottom, top) -> (top, bottom)
+    # (columns, rows, strip, led, c) -> (rows, strip, columns, led, c)
+    grid = padded.reshape(columns, rows, STRIPS, LEDS_PER_EDGE, 3).transpose(1, 2, 0, 3, 4)
+    return grid.reshape(layout["height"], layout["width"], 3), layout
+
+
+def write_atlas(path, leds, fps):
+    """Write the atlas PNG and its .json layout sidecar; returns the layout."""
+    image, layout = build_atlas(leds)
+    layout["fps"] = fps
+    write_png(path, image)
+    with open(sidecar_path(path), "w", encoding="utf-8") as f:
+        json.dump(layout, f, indent=2)
+    return layout
+
+
+def sidecar_path(atlas_path):
+    return os.path.splitext(atlas_path)[0] + ".json"
+
+
+# ============================================================================
+# SOURCES
+# ============================================================================
+
+def leds_from_timeline(path, frames=None):
+    sys.path.insert(0, PHYSICS_DIR)
+    from led_timeline import LedTimeline
+
+    with LedTimeline(path) as tl:
+        return tl.frames_range(0, frames or len(tl)), tl.fps
+
+
+def leds_from_physics(mode, frames, fps, hero=False, seed=0):
+    sys.path.insert(0, PHYSICS_DIR)
+    from k1_physics import PhysicsParams, simulate
+
+    bottom, top = simulate(PhysicsParams(mode=mode, heroMode=hero), frames, delta=1.0 / fps, seed=seed)
+    return np.stack([bottom[0, ..., :3], top[0, ..., :3]], axis=1), fps
+
+
+# ============================================================================
+# MAIN EXECUTION
+# ============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pack a K1 LED run into an animated atlas texture.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--timeline", help=".k1ls LED timeline (led_timeline.py).")
+    source.add_argument("--mode", choices=PHYSICS_MODES, help="Run the physics kernel in this mode.")
+    parser.add_argument("--hero", action="store_true", help="Physics: hero-loop trigger schedule.")
+    parser.add_argument("--frames", type=int, help="Frames to pack (default: whole timeline, or 30).")
+    parser.add_argument("--fps", type=float, default=30.0, help="Physics: frame rate (match the scene).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="led_atlas.png")
+    args = parser.parse_args(argv)
+
+    if args.timeline:
+        leds, fps = leds_from_timeline(args.timeline, args.frames)
+    else:
+        leds, fps = leds_from_physics(args.mode, args.frames or 30, args.fps, args.hero, args.seed)
+
+    layout = write_atlas(args.out, leds, fps)
+    print(f"✓ {layout['frames']} frames -> {args.out} "
+          f"({layout['width']}x{layout['height']}, {layout['columns']} column(s), {fps:g} fps)")
+    print(f"  Layout: {sidecar_path(args.out)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+K1 Lightwave - Procedural LED Texture Baker
+===========================================
+
+Bakes the K1_LED_* emission textures from the firmware-style palettes with
+NumPy instead of generating them through AI-Render. No network, no addon:
+all six presets bake in well under a second.
+
+Each texture covers the light guide plate: 160 LEDs along the top edge and
+160 along the bottom edge (320 total). Every LED is a sharp dot at its edge
+plus a wide glow that fades toward the middle of the plate. LED colours use
+the same HSV math as the physics kernel (hsvToRgb in useK1Physics.ts /
+tools/python/physics/k1_physics.py), so the stills match the web engine's
+palette.
+
+Formats:
+- PNG: 16-bit sRGB, written with zlib (no imaging library needed).
+- EXR: 32-bit linear float, keeps LED values above 1.0. Written through
+  Blender, so only available when baking inside Blender.
+Blender builds mip levels itself when it loads the image, so one level is
+written per texture.
+
+USAGE:
+    python k1_led_textures.py --out led-textures/              # all presets, PNG
+    python k1_led_textures.py --presets fire neon --leds-px 32
+
+k1_generate_led_texture.py calls bake_all() inside Blender and wires the
+results into the K1_LED_* materials.
+"""
+
+import argparse
+import math
+import os
+import struct
+import sys
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+LEDS_PER_EDGE = 160
+CENTER = LEDS_PER_EDGE // 2
+
+DEFAULT_LED_PX = 16        # texture pixels per LED along the strip
+DEFAULT_HEIGHT = 256       # pixels across the plate (top edge -> bottom edge)
+
+# Glow shape, in LED spacings / plate heights
+DOT_SIGMA = 0.3            # sharp LED dot at the edge
+GLOW_SIGMA = 2.5           # horizontal spread of the diffused glow
+DOT_DEPTH = 0.04           # how far the dot reaches into the plate
+GLOW_FALLOFF = 0.35        # exponential fade of the glow toward the centre
+GLOW_GAIN = 0.6
+
+# The physics kernel's field ceiling; PNG stores value / VALUE_SCALE.
+VALUE_SCALE = 2.0
+
+# zlib level; the Up filter does most of the work, higher levels only cost time.
+PNG_COMPRESSION = 1
+
+# preset -> Blender material
+PRESETS = {
+    "fire": "K1_LED_Fire",
+    "ocean": "K1_LED_Ocean",
+    "neon": "K1_LED_Neon",
+    "white": "K1_LED_White",
+    "dual_edge": "K1_LED_DualEdge",
+    "reactive": "K1_LED_Reactive",
+}
+
+
+# ============================================================================
+# PALETTES
+# ============================================================================
+
+def hsv_to_rgb(h, s, v):
+    """Vectorized hsvToRgb from the physics kernel; h wraps into [0, 1)."""
+    h = np.mod(np.asarray(h, dtype=np.float64), 1.0)
+    s = np.asarray(s, dtype=np.float64)
+    v = np.asarray(v, dtype=np.float64)
+    i = np.floor(h * 6.0)
+    f = h * 6.0 - i
+    p = v * (1.0 - s)
+    q = v * (1.0 - f * s)
+    t = v * (1.0 - (1.0 - f) * s)
+    sector = np.mod(i, 6.0).astype(np.int64)
+    v, p, q, t = np.broadcast_arrays(v, p, q, t)
+    r = np.choose(sector, (v, q, p, p, t, v))
+    g = np.choose(sector, (t, v, v, q, p, p))
+    b = np.choose(sector, (p, p, t, v, v, q))
+    return np.stack([r, g, b], axis=-1)
+
+
+def preset_leds(preset, seed=0):
+    """(bottom, top) LED colours, each (160, 3) float in 0..VALUE_SCALE."""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0.0, 1.0, LEDS_PER_EDGE)
+    # Distance from the centre LED, 0 at the middle and 1 at either end (center origin).
+    d = np.abs(np.arange(LEDS_PER_EDGE) - (CENTER - 0.5)) / CENTER
+
+    if preset == "fire":
+        flicker = 0.75 + 0.25 * rng.random((2, LEDS_PER_EDGE))
+        bottom = hsv_to_rgb(0.0 + 0.09 * x, 1.0, 1.6 * flicker[0])
+        top = hsv_to_rgb(0.09 - 0.09 * x, 1.0, 1.6 * flicker[1])
+    elif preset == "ocean":
+        bottom = hsv_to_rgb(0.66 - 0.16 * x, 0.9, 1.2 + 0.3 * np.sin(x * 2 * math.pi) ** 2)
+        top = hsv_to_rgb(0.50 + 0.16 * x, 0.9, 1.2 + 0.3 * np.cos(x * 2 * math.pi) ** 2)
+    elif preset == "neon":
+        hue = 0.92 - 0.30 * x
+        bottom = hsv_to_rgb(hue, 1.0, 1.8)
+        top = hsv_to_rgb(hue[::-1], 1.0, 1.8)
+    elif preset == "white":
+        bottom = top = hsv_to_rgb(np.full(LEDS_PER_EDGE, 0.6), 0.06, 1.5)
+    elif preset == "dual_edge":
+        bottom = hsv_to_rgb(np.full(LEDS_PER_EDGE, 0.52), 1.0, 1.5)
+        top = hsv_to_rgb(np.full(LEDS_PER_EDGE, 0.85), 1.0, 1.5)
+    elif preset == "reactive":
+        # A bass hit travelling outward from the centre, Snapwave style.
+        pulse = np.exp(-((d - 0.35) / 0.12) ** 2) + 0.25 * (1.0 - d)
+        bottom = hsv_to_rgb(0.62 + 0.3 * d, 1.0, 2.0 * pulse)
+        top = hsv_to_rgb(0.92 - 0.3 * d, 1.0, 2.0 * pulse)
+    else:
+        raise ValueError(f"Unknown preset '{preset}' (expected one of {', '.join(PRESETS)})")
+    return (np.clip(bottom, 0.0, VALUE_SCALE).astype(np.float32),
+            np.clip(top, 0.0, VALUE_SCALE).astype(np.float32))
+
+
+# ============================================================================
+# BAKING
+# ============================================================================
+
+def _gaussian(sigma_px):
+    radius = max(1, int(math.ceil(3 * sigma_px)))
+    k = np.exp(-0.5 * (np.arange(-radius, radius + 1) / sigma_px) ** 2)
+    return (k / k.max()).astype(np.float32)
+
+
+def _along_strip(leds, led_px, sigma):
+    """Place LEDs at their pixel centres and blur along the strip: (W, 3)."""
+    width = len(leds) * led_px
+    impulses = np.zeros((width, 3), dtype=np.float32)
+    impulses[led_px // 2::led_px] = leds
+    kernel = _gaussian(sigma * led_px)
+    return np.stack([np.convolve(impulses[:, c], kernel, mode="same") for c in range(3)], axis=-1)
+
+
+def bake_texture(bottom, top, led_px=DEFAULT_LED_PX, height=DEFAULT_HEIGHT):
+    """
+    Linear float texture (height, 160 * led_px, 3), row 0 = top edge.
+    `bottom`/`top` are (160, 3) LED colours.
+    """
+    v = (np.arange(height, dtype=np.float32) + 0.5) / height      # 0 at top edge, 1 at bottom
+    depth = np.stack([v, 1.0 - v])                                 # distance from top, bottom edge
+    dot_v = np.exp(-depth / DOT_DEPTH)
+    glow_v = GLOW_GAIN * np.exp(-depth / GLOW_FALLOFF)
+
+    image = np.zeros((height, len(top) * led_px, 3), dtype=np.float32)
+    for edge, leds in enumerate((top, bottom)):
+        dot = _along_strip(leds, led_px, DOT_SIGMA)
+        glow = _along_strip(leds, led_px, GLOW_SIGMA) / (GLOW_SIGMA * math.sqrt(2 * math.pi))
+        image += dot_v[edge][:, None, None] * dot[None]
+        image += glow_v[edge][:, None, None] * glow[None]
+    return image
+
+
+# ============================================================================
+# WRITERS
+# ============================================================================
+
+def _srgb_encode(linear):
+    linear = np.clip(linear, 0.0, 1.0, dtype=np.float32)
+    return np.where(linear <= 0.0031308, linear * np.float32(12.92),
+                    np.float32(1.055) * np.power(linear, np.float32(1 / 2.4)) - np.float32(0.055))
+
+
+def write_png(path, image):
+    """16-bit RGB PNG of a linear (H, W, 3) image scaled by 1/VALUE_SCALE."""
+    height, width, _ = image.shape
+    pixels = np.round(_srgb_encode(image / VALUE_SCALE) * 65535).astype(">u2")
+    rows = pixels.reshape(height, width * 3).view(np.uint8)
+    # PNG "Up" filter: each row minus the one above (bytewise, wrapping).
+    filtered = rows.copy()
+    filtered[1:] -= rows[:-1]
+    raw = np.hstack([np.full((height, 1), 2, dtype=np.uint8), filtered]).tobytes()
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 16, 2, 0, 0, 0)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) +
+                chunk(b"IDAT", zlib.compress(raw, PNG_COMPRESSION)) + chunk(b"IEND", b""))
+    os.replace(tmp, path)
+
+
+def write_exr(path, image):
+    """32-bit float EXR through Blender's image writer (Blender only)."""
+    import bpy
+
+    height, width, _ = image.shape
+    name = os.path.basename(path)
+    img = bpy.data.images.new(name, width, height, alpha=True, float_buffer=True)
+    rgba = np.ones((height, width, 4), dtype=np.float32)
+    rgba[..., :3] = image[::-1]  # Blender rows run bottom-up
+    img.pixels.foreach_set(rgba.ravel())
+    img.filepath_raw = path
+    img.file_format = 'OPEN_EXR'
+    img.save()
+    bpy.data.images.remove(img)
+
+
+WRITERS = {"png": write_png, "exr": write_exr}
+
+
+def texture_path(preset, out_dir, fmt="png"):
+    return os.path.join(out_dir, f"k1_led_{preset}.{fmt}")
+
+
+def bake_preset(preset, out_dir, fmt="png", led_px=DEFAULT_LED_PX, height=DEFAULT_HEIGHT, seed=0):
+    """Bake one preset to <out_dir>/k1_led_<preset>.<fmt>; returns the path."""
+    image = bake_texture(*preset_leds(preset, seed), led_px=led_px, height=height)
+    path = texture_path(preset, out_dir, fmt)
+    WRITERS[fmt](path, image)
+    return path
+
+
+def bake_all(out_dir, presets=None, fmt="png", led_px=DEFAULT_LED_PX, height=DEFAULT_HEIGHT, workers=None):
+    """
+    Bake presets in parallel (NumPy and zlib release the GIL); returns {preset: path}.
+
+    bpy may only be called from the main thread, so for EXR the pool only
+    computes the arrays and the files are written here one after another.
+    """
+    presets = list(presets or PRESETS)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {p: texture_path(p, out_dir, fmt) for p in presets}
+
+    def bake(preset):
+        image = bake_texture(*preset_leds(preset), led_px=led_px, height=height)
+        if fmt == "exr":
+            return image
+        WRITERS[fmt](paths[preset], image)
+        return None
+
+    with ThreadPoolExecutor(workers or min(len(presets), os.cpu_count() or 1)) as pool:
+        images = list(pool.map(bake, presets))
+    if fmt == "exr":
+        for preset, image in zip(presets, images):
+            write_exr(paths[preset], image)
+    return paths
+
+
+# ============================================================================
+# MAIN EXECUTION
+# ============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bake K1 LED emission textures.")
+    parser.add_argument("--out", default="led-textures", help="Output folder.")
+    parser.add_argument("--presets", nargs="+", choices=sorted(PRESETS), help="Default: all.")
+    parser.add_argument("--format", default="png", choices=["png"], help="EXR needs Blender.")
+    parser.add_argument("--leds-px", type=int, default=DEFAULT_LED_PX, help="Pixels per LED.")
+    parser.add_argument("--height", type=int, default=DEFAULT_HEIGHT)
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    paths = bake_all(args.out, args.presets, args.format, args.leds_px, args.height, args.workers)
+    elapsed = time.perf_counter() - t0
+    for preset, path in paths.items():
+        print(f"✓ {PRESETS[preset]:<16} {path}")
+    print(f"Baked {len(paths)} textures in {elapsed:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
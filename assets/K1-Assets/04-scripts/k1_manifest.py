@@ -0,0 +1,51 @@
+"""
+K1 Lightwave - Job Manifest
+===========================
+
+Record of finished jobs shared by k1_render_batch.py (renders) and
+k1_optimize_videos.py (web video encodes), so both resume the same way.
+
+A job is a dict with at least "id", "hash" and "output". It counts as done
+when the manifest holds the same hash for its id and the output file still
+exists; everything else is re-run. The manifest is rewritten atomically
+after every finished job, so an interrupted run loses nothing.
+
+File format (<dir>/manifest.json):
+    {"version": 2, "jobs": {"<id>": {"hash": ..., "output": ..., "seconds": ...}}}
+"""
+
+import json
+import os
+import threading
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 2
+
+
+class Manifest:
+    """Job id -> {hash, output, seconds}; saved atomically after every change."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.jobs = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.jobs = data.get("jobs", {})
+
+    def is_done(self, job: dict) -> bool:
+        entry = self.jobs.get(job["id"])
+        return bool(entry and entry.get("hash") == job["hash"] and os.path.exists(job["output"]))
+
+    def mark_done(self, job: dict, seconds: float) -> None:
+        with self.lock:
+            self.jobs[job["id"]] = {"hash": job["hash"], "output": job["output"], "seconds": round(seconds, 3)}
+            self._save()
+
+    def _save(self) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "jobs": self.jobs}, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+K1 Lightwave - Web Video Optimization Pipeline
+==============================================
+
+Encodes every raw video in 02-ai-video-generation/raw-outputs into the web
+renditions listed in PROFILES (H.264 1080p/720p, VP9 1080p, JPEG poster),
+in parallel, and only re-encodes what changed.
+
+- Jobs are (source, rendition) pairs run on a pool of encoder processes.
+  The pool is sized to the machine: --workers encoders (default: one per
+  core, at most one per job), each given cores / workers threads.
+- Each job's hash covers the source file's content and the rendition's
+  encoder arguments. Finished jobs are recorded in a manifest
+  (k1_manifest.py, shared with k1_render_batch.py); a rerun skips every job
+  whose hash is unchanged and whose output exists, so editing one profile
+  re-encodes only that rendition.
+- The manifest and the logs of failed encodes live in a state folder
+  (04-scripts/.video-cache by default, --state-dir), never in --out, which
+  is deployed as is.
+- Output names come from the source file name, so two sources with the same
+  name in different subfolders are rejected before anything is encoded.
+- Encodes write to a .part file and are renamed when the encoder succeeds,
+  so an interrupted run never leaves a truncated video behind.
+- Every job reports encode speed (frames/s and x real time, read from
+  ffmpeg's -progress output), and video_inventory.txt lists all renditions.
+
+The encoder only has to accept ffmpeg's command line, write the last
+argument and print "-progress" key=value lines, so tests can substitute a
+stub (--ffmpeg path/to/stub).
+
+USAGE:
+    python k1_optimize_videos.py
+    python k1_optimize_videos.py --profiles 1080p poster --workers 2
+    python k1_optimize_videos.py --input clips/ --out web/ --force
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from k1_manifest import MANIFEST_NAME, Manifest
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+INPUT_DIR = os.path.join(PROJECT_ROOT, "02-ai-video-generation", "raw-outputs")
+OUTPUT_DIR = os.path.join(PROJECT_ROOT, "03-final-web-assets", "videos")
+STATE_DIR = os.path.join(SCRIPT_DIR, ".video-cache")
+INVENTORY_NAME = "video_inventory.txt"
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv")
+
+# Bump to invalidate every output (e.g. after changing ffmpeg_args()).
+PIPELINE_VERSION = 1
+
+# Renditions. "1080p" keeps the old optimize-videos.sh settings and file name.
+PROFILES = {
+    "1080p": {"suffix": "_optimized.mp4", "codec": "h264", "width": 1920, "height": 1080,
+              "bitrate": "2500k", "maxrate": "3000k", "bufsize": "5000k", "fps": 24},
+    "720p": {"suffix": "_720p.mp4", "codec": "h264", "width": 1280, "height": 720,
+             "bitrate": "1200k", "maxrate": "1500k", "bufsize": "2500k", "fps": 24},
+    "1080p-vp9": {"suffix": "_1080p.webm", "codec": "vp9", "width": 1920, "height": 1080,
+                  "crf": 33, "fps": 24},
+    "poster": {"suffix": "_poster.jpg", "codec": "jpeg", "width": 1920, "height": 1080,
+               "at": 1.0},
+}
+
+
+# ============================================================================
+# JOBS
+# ============================================================================
+
+def find_sources(input_dir: str) -> List[str]:
+    sources = []
+    for root, _, files in os.walk(input_dir):
+        for name in files:
+            if name.lower().endswith(VIDEO_EXTENSIONS):
+                sources.append(os.path.join(root, name))
+    return sorted(sources)
+
+
+def stem_collisions(sources: List[str]) -> Dict[str, List[str]]:
+    """Sources that would write the same output names, by lower-cased stem."""
+    by_stem: Dict[str, List[str]] = {}
+    for src in sources:
+        by_stem.setdefault(os.path.splitext(os.path.basename(src))[0].lower(), []).append(src)
+    return {stem: paths for stem, paths in by_stem.items() if len(paths) > 1}
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def ffmpeg_args(profile: dict, src: str, dst: str, threads: int) -> List[str]:
+    """Encoder arguments (without the executable) for one rendition."""
+    w, h = profile["width"], profile["height"]
+    fit = f"scale={w}:{h}:force_original_aspect_ratio=decrease,pad={w}:{h}:(ow-iw)/2:(oh-ih)/2"
+    head = ["-hide_banner", "-nostats", "-loglevel", "error", "-progress", "pipe:1", "-y"]
+    if profile["codec"] == "jpeg":
+        return head + ["-ss", str(profile["at"]), "-i", src, "-vf", fit,
+                       "-frames:v", "1", "-q:v", "3", "-update", "1", dst]
+    args = head + ["-i", src, "-vf", fit, "-r", str(profile["fps"]), "-an", "-threads", str(threads)]
+    if profile["codec"] == "h264":
+        args += ["-c:v", "libx264", "-b:v", profile["bitrate"], "-maxrate", profile["maxrate"],
+                 "-bufsize", profile["bufsize"], "-preset", "slow", "-profile:v", "high",
+                 "-level", "4.0", "-pix_fmt", "yuv420p", "-movflags", "+faststart"]
+    else:
+        args += ["-c:v", "libvpx-vp9", "-crf", str(profile["crf"]), "-b:v", "0",
+                 "-row-mt", "1", "-pix_fmt", "yuv420p"]
+    return args + [dst]
+
+
+def build_jobs(sources: List[str], profiles: List[str], out_dir: str) -> List[dict]:
+    jobs = []
+    for src in sources:
+        digest = file_hash(src)
+        stem = os.path.splitext(os.path.basename(src))[0]
+        for name in profiles:
+            profile = PROFILES[name]
+            spec = json.dumps([PIPELINE_VERSION, digest, profile], sort_keys=True)
+            jobs.append({
+                "id": f"{stem}:{name}",
+                "source": src,
+                "profile": name,
+                "output": os.path.join(out_dir, stem + profile["suffix"]),
+                "hash": hashlib.sha256(spec.encode()).hexdigest()[:16],
+            })
+    return jobs
+
+
+# ============================================================================
+# ENCODING
+# ============================================================================
+
+def part_path(output: str) -> str:
+    # Keep the extension last so the encoder still picks the right container.
+    root, ext = os.path.splitext(output)
+    return f"{root}.part{ext}"
+
+
+def run_job(ffmpeg: str, job: dict, threads: int, manifest: Manifest, log_dir: str) -> Optional[dict]:
+    """Encode one rendition; returns its stats, or None if it failed."""
+    tmp = part_path(job["output"])
+    cmd = [ffmpeg] + ffmpeg_args(PROFILES[job["profile"]], job["source"], tmp, threads)
+    log_path = os.path.join(log_dir, job["id"].replace(":", "_") + ".log")
+    progress: Dict[str, str] = {}
+    t0 = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        log.write(" ".join(cmd) + "\n\n")
+        log.flush()
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=log, text=True)
+        for line in proc.stdout:
+            key, sep, value = line.strip().partition("=")
+            if sep:
+                progress[key] = value
+        proc.wait()
+    seconds = time.perf_counter() - t0
+
+    if proc.returncode != 0 or not os.path.exists(tmp):
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        print(f"  ✗ {job['id']}: encoder exited with status {proc.returncode} (see {log_path})")
+        return None
+
+    os.remove(log_path)
+    os.replace(tmp, job["output"])
+    manifest.mark_done(job, seconds)
+    frames = _progress_int(progress, "frame")
+    media_seconds = _progress_int(progress, "out_time_us") / 1e6
+    stats = {
+        "seconds": seconds,
+        "fps": frames / seconds if seconds > 0 else 0.0,
+        "realtime": media_seconds / seconds if seconds > 0 else 0.0,
+        "size": os.path.getsize(job["output"]),
+    }
+    if PROFILES[job["profile"]]["codec"] == "jpeg" or not frames:
+        speed = "still"
+    else:
+        speed = f"{stats['fps']:.1f} fps, {stats['realtime']:.2f}x real time"
+    print(f"  ✓ {job['id']}: {format_size(stats['size'])} in {seconds:.1f}s ({speed})")
+    return stats
+
+
+def _progress_int(progress: Dict[str, str], key: str) -> int:
+    try:
+        return int(progress.get(key, 0))
+    except ValueError:  # "N/A" before the first frame
+        return 0
+
+
+def format_size(size: float) -> str:
+    if size < 1024:
+        return f"{int(size)}B"
+    for unit in ("K", "M"):
+        size /= 1024
+        if size < 1024:
+            return f"{size:.1f}{unit}"
+    return f"{size / 1024:.1f}G"
+
+
+def write_inventory(path: str, jobs: List[dict]) -> None:
+    """One line per rendition on disk: size, profile, output, source."""
+    lines = []
+    for job in jobs:
+        if os.path.exists(job["output"]):
+            lines.append(f"{format_size(os.path.getsize(job['output'])):>8}  {job['profile']:<10}  "
+                         f"{os.path.basename(job['output'])}  <- {os.path.basename(job['source'])}")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + ("\n" if lines else ""))
+
+
+# ============================================================================
+# MAIN EXECUTION
+# ============================================================================
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Encode K1 videos into web renditions.")
+    parser.add_argument("--input", default=INPUT_DIR, help="Folder of raw videos (searched recursively).")
+    parser.add_argument("--out", default=OUTPUT_DIR, help="Output folder (renditions + inventory only).")
+    parser.add_argument("--state-dir", default=STATE_DIR, help="Manifest and encoder logs (kept out of --out).")
+    parser.add_argument("--profiles", nargs="+", choices=list(PROFILES), default=list(PROFILES))
+    parser.add_argument("--workers", type=int, help="Concurrent encoders (default: one per core).")
+    parser.add_argument("--ffmpeg", default=os.environ.get("FFMPEG", "ffmpeg"), help="Encoder executable.")
+    parser.add_argument("--force", action="store_true", help="Re-encode even if up to date.")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("K1-Lightwave Video Optimization")
+    print("=" * 60)
+    if shutil.which(args.ffmpeg) is None:
+        print(f"ERROR: encoder not found: {args.ffmpeg}")
+        print("Install it with:")
+        print("  Ubuntu/Debian: sudo apt-get install ffmpeg")
+        print("  Mac: brew install ffmpeg")
+        return 1
+
+    sources = find_sources(args.input)
+    print(f"Input:   {args.input} ({len(sources)} video(s))")
+    print(f"Output:  {args.out}")
+    collisions = stem_collisions(sources)
+    if collisions:
+        print("ERROR: these sources would overwrite each other's renditions; rename one of each group:")
+        for paths in collisions.values():
+            print("  " + "  ".join(os.path.relpath(p, args.input) for p in paths))
+        return 1
+    os.makedirs(args.out, exist_ok=True)
+    log_dir = os.path.join(args.state_dir, "logs")
+    os.makedirs(log_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(args.state_dir, MANIFEST_NAME))
+
+    jobs = build_jobs(sources, args.profiles, args.out)
+    pending = [job for job in jobs if args.force or not manifest.is_done(job)]
+    cores = os.cpu_count() or 1
+    workers = max(1, min(args.workers or cores, len(pending) or 1))
+    threads = max(1, cores // workers)
+    print(f"Jobs:    {len(jobs)}   Up to date: {len(jobs) - len(pending)}   "
+          f"Pending: {len(pending)} on {workers} worker(s) x {threads} thread(s)")
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(workers) as pool:
+        results = list(pool.map(lambda job: run_job(args.ffmpeg, job, threads, manifest, log_dir), pending))
+    elapsed = time.perf_counter() - t0
+
+    write_inventory(os.path.join(args.out, INVENTORY_NAME), jobs)
+    failed = sum(1 for r in results if r is None)
+    print("=" * 60)
+    if pending:
+        written = sum(r["size"] for r in results if r)
+        print(f"Encoded {len(pending) - failed}/{len(pending)} rendition(s) in {elapsed:.1f}s "
+              f"({format_size(written)} written)")
+    else:
+        print("Nothing to encode.")
+    print(f"Inventory: {os.path.join(args.out, INVENTORY_NAME)}")
+    if failed:
+        print(f"{failed} job(s) failed; rerun the same command to retry them.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
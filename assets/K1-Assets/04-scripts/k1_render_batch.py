@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+K1 Lightwave - Headless Batch Render Orchestrator
+==================================================
+
+Renders every camera created by blender-setup-automation.py (CAT1-CAT5) and
+k1_setup_hero_cameras.py (HERO_01-HERO_10) without opening Blender's UI.
+
+How it works:
+- Camera names are read straight from the two setup scripts, so adding a
+  camera there adds it here.
+- Each (camera, frame) pair is one job. Pending jobs are split into batches
+  and up to --workers `blender -b` processes run at once, each rendering one
+  batch (the scene is set up once per process, not once per job).
+- Before rendering, one Blender process runs the setup scripts and hashes
+  every camera rig (k1_rig_hash.py): the camera itself plus its category's
+  lights, and separately what all views share (meshes, K1_LED_* materials,
+  world, unprefixed lights). A job's key is the hash of its rig, the shared
+  state, the render settings and the frame. Workers hide the other
+  categories' lights before each render, so changing CAT2_GrazingLight
+  only re-renders the CAT2 views.
+- Finished jobs are recorded in <out>/manifest.json and their images are
+  stored by key in a render cache (<out>/.cache). On the next run, jobs whose
+  key is unchanged and whose image still exists are skipped; jobs whose key
+  is in the cache (e.g. after reverting a change) are restored from it
+  without rendering. An interrupted run just resumes.
+
+This same file is the script Blender runs (it switches to worker mode when
+`bpy` is importable). The worker protocol is small enough to stub:
+
+    <blender> -b <file.blend> --python k1_render_batch.py -- --rig-hashes <spec.json>
+        spec.json: {"setupScripts": [...]}
+        stdout:    "K1SHARED <hash>" once, then "K1RIG <camera> <hash>" per camera
+
+    <blender> -b <file.blend> --python k1_render_batch.py -- --jobs <batch.json>
+        batch.json: {"setupScripts": [...], "settings": {...},
+                     "jobs": [{"id", "camera", "frame", "output"}, ...]}
+        stdout:     "K1JOB DONE <id>" or "K1JOB FAIL <id> <reason>" per job
+
+so any executable that reads the spec, writes the outputs and prints those
+lines can stand in for Blender (--blender path/to/stub).
+
+USAGE:
+    python k1_render_batch.py K1_Final.blend --out renders/
+    python k1_render_batch.py K1_Final.blend --cameras HERO CAT4 --frames 1-30 --workers 4
+    python k1_render_batch.py K1_Final.blend --list
+"""
+
+import argparse
+import ast
+import fnmatch
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# `blender --python` doesn't put this folder on sys.path.
+sys.path.insert(0, SCRIPT_DIR)
+from k1_manifest import MANIFEST_NAME, Manifest  # noqa: E402
+
+# Each script reconciles the cameras/lights under its own prefixes (k1_rig.py):
+# CAT1_-CAT5_ for the first, HERO_ for the second.
+SETUP_SCRIPTS = {
+    "blender-setup-automation.py": "main",
+    "k1_setup_hero_cameras.py": "setup_hero_cameras",
+}
+
+CATEGORIES = ("CAT1", "CAT2", "CAT3", "CAT4", "CAT5", "HERO")
+
+DEFAULT_SETTINGS = {
+    "resolution": [1920, 1080],
+    "engine": "CYCLES",
+    "samples": 128,
+    "format": "PNG",
+}
+
+CACHE_DIR_NAME = ".cache"
+
+JOB_PREFIX = "K1JOB"
+RIG_PREFIX = "K1RIG"
+SHARED_PREFIX = "K1SHARED"
+
+
+# ============================================================================
+# CAMERAS AND JOBS
+# ============================================================================
+
+def discover_cameras(script_dir: str = SCRIPT_DIR) -> Dict[str, List[str]]:
+    """Camera names defined by each setup script (string literals ending in _Camera)."""
+    cameras = {}
+    for script in SETUP_SCRIPTS:
+        with open(os.path.join(script_dir, script), encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+        names = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Constant) and isinstance(node.value, str) and node.value.endswith("_Camera"):
+                if node.value not in names:
+                    names.append(node.value)
+        cameras[script] = names
+    return cameras
+
+
+def select_cameras(all_cameras: List[str], patterns: Optional[List[str]]) -> List[str]:
+    """Filter by category (CAT1, HERO, ...) or fnmatch pattern; None selects all."""
+    if not patterns:
+        return list(all_cameras)
+    selected = []
+    for cam in all_cameras:
+        for pattern in patterns:
+            if pattern.upper() in CATEGORIES:
+                pattern = f"{pattern.upper()}_*"
+            if fnmatch.fnmatchcase(cam, pattern):
+                selected.append(cam)
+                break
+    return selected
+
+
+def parse_frames(spec: str) -> List[int]:
+    """'1-30,45' -> [1, ..., 30, 45]."""
+    frames = []
+    for part in spec.split(","):
+        part = part.strip()
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            frames.extend(range(int(lo), int(hi) + 1))
+        elif part:
+            frames.append(int(part))
+    return sorted(set(frames))
+
+
+def job_key(shared: str, rig: str, settings: dict, frame: int) -> str:
+    """Render cache key: same rig, shared scene state, settings and frame -> same image."""
+    blob = json.dumps([shared, rig, settings, frame], sort_keys=True)
+    return hashlib.sha256(blob.encode()).hexdigest()[:24]
+
+
+def build_jobs(cameras: List[str], frames: List[int], out_dir: str, shared: str,
+               rigs: Dict[str, str], settings: dict) -> List[dict]:
+    jobs = []
+    for cam in cameras:
+        for frame in frames:
+            jobs.append({
+                "id": f"{cam}@{frame}",
+                "camera": cam,
+                "frame": frame,
+                "output": os.path.abspath(os.path.join(out_dir, cam, f"{frame:04d}.png")),
+                "hash": job_key(shared, rigs[cam], settings, frame),
+            })
+    return jobs
+
+
+# ============================================================================
+# RENDER CACHE
+# ============================================================================
+
+class RenderCache:
+    """Content-addressed store of rendered images: <dir>/<key[:2]>/<key>.png."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], key + ".png")
+
+    def has(self, key: str) -> bool:
+        return os.path.exists(self._file(key))
+
+    def store(self, key: str, src: str) -> None:
+        dst = self._file(key)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        _link_or_copy(src, dst)
+
+    def restore(self, key: str, dst: str) -> None:
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        _link_or_copy(self._file(key), dst)
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    # Hard links cost no space; fall back to a copy across filesystems.
+    tmp = dst + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
+
+
+# ============================================================================
+# ORCHESTRATOR
+# ============================================================================
+
+def _write_spec(spec: dict, log_dir: str, prefix: str) -> str:
+    fd, path = tempfile.mkstemp(prefix=prefix, suffix=".json", dir=log_dir)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(spec, f)
+    return path
+
+
+def query_rig_hashes(blender: str, blend_path: str, log_dir: str):
+    """Run the setup scripts in one Blender process; returns (shared hash, {camera: rig hash})."""
+    spec_path = _write_spec({"setupScripts": [os.path.join(SCRIPT_DIR, s) for s in SETUP_SCRIPTS]},
+                            log_dir, "k1rigs_")
+    cmd = [blender, "-b", blend_path, "--python", os.path.abspath(__file__), "--", "--rig-hashes", spec_path]
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    except OSError as exc:
+        raise RuntimeError(f"Blender not found: {blender} ({exc})") from exc
+    finally:
+        os.remove(spec_path)
+    shared, rigs = None, {}
+    for line in result.stdout.splitlines():
+        parts = line.split()
+        if len(parts) == 2 and parts[0] == SHARED_PREFIX:
+            shared = parts[1]
+        elif len(parts) == 3 and parts[0] == RIG_PREFIX:
+            rigs[parts[1]] = parts[2]
+    if shared is None:
+        log_path = spec_path[:-5] + ".log"
+        with open(log_path, "w", encoding="utf-8") as log:
+            log.write(result.stdout)
+        raise RuntimeError(f"Blender did not report rig hashes (exit {result.returncode}); see {log_path}")
+    return shared, rigs
+
+
+def make_batches(jobs: List[dict], workers: int, batch_size: Optional[int]) -> List[List[dict]]:
+    """Split jobs, keeping each camera's frames together where possible."""
+    if not jobs:
+        return []
+    size = batch_size or max(1, -(-len(jobs) // (workers * 2)))
+    return [jobs[i:i + size] for i in range(0, len(jobs), size)]
+
+
+def run_batch(blender: str, blend_path: str, batch: List[dict], settings: dict,
+              manifest: Manifest, cache: RenderCache, log_dir: str) -> List[str]:
+    """Render one batch in one Blender process; returns the ids that did not finish."""
+    spec = {
+        "setupScripts": [os.path.join(SCRIPT_DIR, s) for s in SETUP_SCRIPTS],
+        "settings": settings,
+        "jobs": [{k: job[k] for k in ("id", "camera", "frame", "output")} for job in batch],
+    }
+    by_id = {job["id"]: job for job in batch}
+    for job in batch:
+        # Outputs may be hard links into the cache; never let Blender write through one.
+        if os.path.exists(job["output"]):
+            os.remove(job["output"])
+    spec_path = _write_spec(spec, log_dir, "k1batch_")
+
+    cmd = [blender, "-b", blend_path, "--python", os.path.abspath(__file__), "--", "--jobs", spec_path]
+    log_path = spec_path[:-5] + ".log"
+    failed = []
+    t_last = time.perf_counter()
+    try:
+        with open(log_path, "w", encoding="utf-8") as log:
+            try:
+                proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+            except OSError as exc:
+                print(f"  ✗ Blender not found: {blender} ({exc}); {len(by_id)} job(s) not rendered")
+                return list(by_id)
+            for line in proc.stdout:
+                log.write(line)
+                parts = line.split(maxsplit=3)
+                if len(parts) < 3 or parts[0] != JOB_PREFIX:
+                    continue
+                job = by_id.pop(parts[2], None)
+                if job is None:
+                    continue
+                now = time.perf_counter()
+                if parts[1] == "DONE" and os.path.exists(job["output"]):
+                    cache.store(job["hash"], job["output"])
+                    manifest.mark_done(job, now - t_last)
+                    print(f"  ✓ {job['id']}")
+                else:
+                    failed.append(job["id"])
+                    print(f"  ✗ {job['id']}: {parts[3].strip() if len(parts) > 3 else 'failed'}")
+                t_last = now
+            proc.wait()
+    finally:
+        os.remove(spec_path)
+    if by_id:
+        print(f"  ✗ Blender exited ({proc.returncode}) with {len(by_id)} job(s) unfinished; see {log_path}")
+    return failed + list(by_id)
+
+
+def orchestrate(args) -> int:
+    blend_path = os.path.abspath(args.blend)
+    if not os.path.exists(blend_path):
+        print(f"ERROR: .blend file not found: {blend_path}")
+        return 1
+
+    settings = dict(DEFAULT_SETTINGS, resolution=[args.width, args.height],
+                    engine=args.engine, samples=args.samples)
+    cameras = [c for names in discover_cameras().values() for c in names]
+    cameras = select_cameras(cameras, args.cameras)
+    if args.list:
+        for cam in cameras:
+            print(cam)
+        return 0
+    if not cameras:
+        print("ERROR: no cameras match", " ".join(args.cameras or []))
+        return 1
+
+    if shutil.which(args.blender) is None:
+        print(f"ERROR: Blender executable not found: {args.blender} (use --blender or $BLENDER)")
+        return 1
+
+    os.makedirs(args.out, exist_ok=True)
+    log_dir = os.path.join(args.out, "logs")
+    os.makedirs(log_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(args.out, MANIFEST_NAME))
+    cache = RenderCache(args.cache_dir or os.path.join(args.out, CACHE_DIR_NAME))
+
+    print("=" * 60)
+    print("K1-Lightwave Batch Render")
+    print("=" * 60)
+    try:
+        shared, rigs = query_rig_hashes(args.blender, blend_path, log_dir)
+    except RuntimeError as exc:
+        print(f"ERROR: {exc}")
+        return 1
+    missing = [cam for cam in cameras if cam not in rigs]
+    if missing:
+        print(f"ERROR: setup scripts did not create: {', '.join(missing)}")
+        return 1
+
+    jobs = build_jobs(cameras, parse_frames(args.frames), args.out, shared, rigs, settings)
+    up_to_date, restored, pending = 0, 0, []
+    for job in jobs:
+        if args.force:
+            pending.append(job)
+        elif manifest.is_done(job):
+            up_to_date += 1
+        elif cache.has(job["hash"]):
+            cache.restore(job["hash"], job["output"])
+            manifest.mark_done(job, 0.0)
+            restored += 1
+        else:
+            pending.append(job)
+    batches = make_batches(pending, args.workers, args.batch_size)
+
+    print(f"Scene:   {os.path.basename(blend_path)} (shared {shared[:12]})")
+    print(f"Cameras: {len(cameras)}   Jobs: {len(jobs)}   Up to date: {up_to_date}   From cache: {restored}")
+    print(f"Pending: {len(pending)} in {len(batches)} batch(es) on {args.workers} worker(s)")
+    if not pending:
+        print("Nothing to render.")
+        return 0
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(args.workers) as pool:
+        results = list(pool.map(
+            lambda batch: run_batch(args.blender, blend_path, batch, settings, manifest, cache, log_dir), batches))
+    failed = [job_id for ids in results for job_id in ids]
+
+    print("=" * 60)
+    print(f"Rendered {len(pending) - len(failed)}/{len(pending)} jobs in {time.perf_counter() - t0:.1f}s")
+    if failed:
+        print(f"{len(failed)} job(s) failed; rerun the same command to retry them.")
+        return 1
+    return 0
+
+
+# ============================================================================
+# BLENDER WORKER
+# ============================================================================
+
+def worker_main(argv: List[str]) -> int:
+    """Runs inside Blender: set up cameras/lights once, then hash rigs or render each job."""
+    import bpy
+    import runpy
+
+    parser = argparse.ArgumentParser()
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--jobs")
+    mode.add_argument("--rig-hashes")
+    args = parser.parse_args(argv)
+    with open(args.jobs or args.rig_hashes, encoding="utf-8") as f:
+        spec = json.load(f)
+
+    import k1_rig_hash
+
+    for path in spec["setupScripts"]:
+        entry = SETUP_SCRIPTS[os.path.basename(path)]
+        runpy.run_path(path, run_name="k1_setup")[entry]()
+
+    if args.rig_hashes:
+        print(f"{SHARED_PREFIX} {k1_rig_hash.shared_hash()}", flush=True)
+        for name, h in sorted(k1_rig_hash.rig_hashes().items()):
+            print(f"{RIG_PREFIX} {name} {h}", flush=True)
+        return 0
+
+    scene = bpy.context.scene
+    settings = spec["settings"]
+    scene.render.resolution_x, scene.render.resolution_y = settings["resolution"]
+    scene.render.resolution_percentage = 100
+    scene.render.engine = settings["engine"]
+    if settings["engine"] == "CYCLES":
+        scene.cycles.samples = settings["samples"]
+    scene.render.image_settings.file_format = settings["format"]
+
+    for job in spec["jobs"]:
+        try:
+            scene.camera = bpy.data.objects[job["camera"]]
+            k1_rig_hash.isolate_category(scene.camera, scene)
+            scene.frame_set(job["frame"])
+            os.makedirs(os.path.dirname(job["output"]), exist_ok=True)
+            scene.render.filepath = job["output"]
+            bpy.ops.render.render(write_still=True)
+            print(f"{JOB_PREFIX} DONE {job['id']}", flush=True)
+        except Exception as exc:  # keep going; the orchestrator retries on the next run
+            print(f"{JOB_PREFIX} FAIL {job['id']} {exc}", flush=True)
+    return 0
+
+
+# ============================================================================
+# MAIN EXECUTION
+# ============================================================================
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Render K1 camera setups headlessly with Blender.")
+    parser.add_argument("blend", help="Scene with the K1 model imported (e.g. K1_Final.blend).")
+    parser.add_argument("--out", default="renders", help="Output folder (images + manifest.json).")
+    parser.add_argument("--cameras", nargs="+", help=f"Categories ({', '.join(CATEGORIES)}) or name patterns.")
+    parser.add_argument("--frames", default="1", help="Frame list, e.g. 1-30,45.")
+    parser.add_argument("--workers", type=int, default=2, help="Concurrent Blender processes.")
+    parser.add_argument("--batch-size", type=int, help="Jobs per Blender process (default: balanced).")
+    parser.add_argument("--blender", default=os.environ.get("BLENDER", "blender"), help="Blender executable.")
+    parser.add_argument("--width", type=int, default=DEFAULT_SETTINGS["resolution"][0])
+    parser.add_argument("--height", type=int, default=DEFAULT_SETTINGS["resolution"][1])
+    parser.add_argument("--engine", default=DEFAULT_SETTINGS["engine"], choices=["CYCLES", "BLENDER_EEVEE_NEXT"])
+    parser.add_argument("--samples", type=int, default=DEFAULT_SETTINGS["samples"])
+    parser.add_argument("--cache-dir", help=f"Render cache (default: <out>/{CACHE_DIR_NAME}).")
+    parser.add_argument("--force", action="store_true", help="Re-render even if up to date.")
+    parser.add_argument("--list", action="store_true", help="List the selected cameras and exit.")
+    return orchestrate(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    try:
+        import bpy  # noqa: F401
+    except ImportError:
+        sys.exit(main())
+    else:
+        argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+        worker_main(argv)
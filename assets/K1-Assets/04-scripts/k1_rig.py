@@ -0,0 +1,207 @@
+"""
+K1 Lightwave - Declarative Rig Reconcile
+========================================
+
+Shared by blender-setup-automation.py and k1_setup_hero_cameras.py. A setup
+script describes its cameras and lights as a list of spec dicts and calls
+reconcile_rig(); the scene is then brought in line with the spec:
+
+- Objects that already exist are reused and only properties that differ
+  from the spec are written. Re-running setup on an unchanged scene writes
+  nothing, so it is instant even on heavy scenes.
+- Missing objects are created, reusing leftover camera/light data of the
+  same name instead of allocating new datablocks.
+- Cameras and lights under the script's name prefixes that are no longer in
+  the spec are removed together with their data, and orphaned camera/light
+  data under those prefixes (left by older delete-and-recreate runs) is
+  purged, so .blend files don't grow with every run.
+- Tracking objects share a single DeviceCenter empty and a single TRACK_TO
+  constraint each, updated in place.
+
+Objects outside the managed prefixes (your own cameras, lights, props) are
+never touched.
+
+Spec keys:
+    camera: name, location, rotation, lens, [sensor_width], [track]
+    light:  name, light_type, location, energy, [color], [track]
+"""
+
+import bpy
+
+TARGET_NAME = "DeviceCenter"
+
+# Values closer than this count as unchanged (Euler/matrix round trips).
+EPSILON = 1e-6
+
+
+# ============================================================================
+# SPECS
+# ============================================================================
+
+def camera_spec(name, location, rotation, lens=50, sensor_width=None, track=False):
+    spec = {"kind": "CAMERA", "name": name, "location": tuple(location),
+            "rotation": tuple(rotation), "lens": lens, "track": track}
+    if sensor_width is not None:
+        spec["sensor_width"] = sensor_width
+    return spec
+
+
+def light_spec(name, light_type, location, energy, color=(1, 1, 1), track=False):
+    return {"kind": "LIGHT", "name": name, "light_type": light_type, "location": tuple(location),
+            "rotation": (0, 0, 0), "energy": energy, "color": tuple(color), "track": track}
+
+
+# ============================================================================
+# PROPERTY DIFFING
+# ============================================================================
+
+def _differs(current, wanted):
+    if isinstance(wanted, (int, float)):
+        return abs(current - wanted) > EPSILON
+    if wanted is None or isinstance(wanted, str):
+        return current != wanted
+    current, wanted = tuple(current), tuple(wanted)
+    return len(current) != len(wanted) or any(abs(a - b) > EPSILON for a, b in zip(current, wanted))
+
+
+def set_if_changed(owner, attr, value):
+    """Assign owner.attr = value only if it differs; returns True if written."""
+    if _differs(getattr(owner, attr), value):
+        setattr(owner, attr, value)
+        return True
+    return False
+
+
+# ============================================================================
+# RECONCILE
+# ============================================================================
+
+def _collection(kind):
+    return bpy.data.cameras if kind == "CAMERA" else bpy.data.lights
+
+
+def _managed(name, prefixes):
+    return name.startswith(tuple(prefixes))
+
+
+def ensure_target(location):
+    """The shared DeviceCenter empty every TRACK_TO constraint points at."""
+    empty = bpy.data.objects.get(TARGET_NAME)
+    if empty is None:
+        empty = bpy.data.objects.new(TARGET_NAME, None)
+        bpy.context.collection.objects.link(empty)
+    elif bpy.context.scene.objects.get(TARGET_NAME) is None:
+        bpy.context.collection.objects.link(empty)
+    set_if_changed(empty, "location", location)
+    return empty
+
+
+def _ensure_object(spec):
+    """Existing object for spec (or a new one); returns (obj, created)."""
+    kind = spec["kind"]
+    obj = bpy.data.objects.get(spec["name"])
+    if obj is not None and obj.type != kind:
+        remove_object(obj)
+        obj = None
+    if obj is not None:
+        return obj, False
+
+    data = _collection(kind).get(spec["name"])
+    if data is not None and data.users:
+        data = None  # belongs to some other object
+    if data is None:
+        if kind == "CAMERA":
+            data = bpy.data.cameras.new(name=spec["name"])
+        else:
+            data = bpy.data.lights.new(name=spec["name"], type=spec["light_type"])
+    obj = bpy.data.objects.new(spec["name"], data)
+    bpy.context.collection.objects.link(obj)
+    return obj, True
+
+
+def _reconcile_track(obj, target):
+    """Keep exactly one TRACK_TO constraint aimed at target (or none if target is None)."""
+    changed = False
+    tracks = [c for c in obj.constraints if c.type == 'TRACK_TO']
+    for extra in tracks[1 if target is not None else 0:]:
+        obj.constraints.remove(extra)
+        changed = True
+    if target is None:
+        return changed
+    if tracks:
+        constraint = tracks[0]
+    else:
+        constraint = obj.constraints.new(type='TRACK_TO')
+        changed = True
+    if constraint.target != target:
+        constraint.target = target
+        changed = True
+    changed |= set_if_changed(constraint, "track_axis", 'TRACK_NEGATIVE_Z')
+    changed |= set_if_changed(constraint, "up_axis", 'UP_Y')
+    return changed
+
+
+def reconcile_object(spec, target):
+    """Bring one camera/light in line with its spec; returns (obj, 'created'|'updated'|'unchanged')."""
+    obj, created = _ensure_object(spec)
+    data = obj.data
+    changed = False
+    if bpy.context.scene.objects.get(obj.name) is None:
+        bpy.context.collection.objects.link(obj)
+        changed = True
+    changed |= set_if_changed(obj, "location", spec["location"])
+    changed |= set_if_changed(obj, "rotation_euler", spec["rotation"])
+    if spec["kind"] == "CAMERA":
+        changed |= set_if_changed(data, "lens", spec["lens"])
+        if "sensor_width" in spec:
+            changed |= set_if_changed(data, "sensor_width", spec["sensor_width"])
+    else:
+        changed |= set_if_changed(data, "type", spec["light_type"])
+        changed |= set_if_changed(data, "energy", spec["energy"])
+        changed |= set_if_changed(data, "color", spec["color"])
+    changed |= _reconcile_track(obj, target if spec.get("track") else None)
+    return obj, "created" if created else ("updated" if changed else "unchanged")
+
+
+def remove_object(obj):
+    """Remove an object and its camera/light data if nothing else uses it."""
+    data, kind = obj.data, obj.type
+    bpy.data.objects.remove(obj, do_unlink=True)
+    if data is not None and kind in ('CAMERA', 'LIGHT') and data.users == 0:
+        _collection(kind).remove(data)
+
+
+def purge_orphans(prefixes):
+    """Remove zero-user camera/light data under the managed prefixes; returns the count."""
+    removed = 0
+    for collection in (bpy.data.cameras, bpy.data.lights):
+        for data in list(collection):
+            if data.users == 0 and _managed(data.name, prefixes):
+                collection.remove(data)
+                removed += 1
+    return removed
+
+
+def reconcile_rig(specs, prefixes, target_location=(0, 0, 0)):
+    """
+    Make the cameras/lights under `prefixes` match `specs` exactly.
+    Returns {name: object} for every spec.
+    """
+    names = {spec["name"] for spec in specs}
+    stats = {"created": 0, "updated": 0, "unchanged": 0, "removed": 0}
+
+    for obj in list(bpy.data.objects):
+        if obj.type in ('CAMERA', 'LIGHT') and _managed(obj.name, prefixes) and obj.name not in names:
+            remove_object(obj)
+            stats["removed"] += 1
+
+    target = ensure_target(target_location) if any(spec.get("track") for spec in specs) else None
+    objects = {}
+    for spec in specs:
+        objects[spec["name"]], state = reconcile_object(spec, target)
+        stats[state] += 1
+
+    orphans = purge_orphans(prefixes)
+    print(f"✓ Rig reconciled: {stats['created']} created, {stats['updated']} updated, "
+          f"{stats['unchanged']} unchanged, {stats['removed']} removed, {orphans} orphan datablocks purged")
+    return objects
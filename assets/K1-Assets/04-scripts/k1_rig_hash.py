@@ -0,0 +1,190 @@
+"""
+K1 Lightwave - Camera Rig Hashing
+=================================
+
+Deterministic content hashes of the scene as the setup scripts leave it, so
+a render pipeline can tell which views actually changed even though
+blender-setup-automation.py deletes and recreates every camera and light.
+
+- rig_hash(camera): the camera (location, rotation, lens, sensor, TRACK_TO
+  target) plus the lights of its category, i.e. lights sharing the
+  camera's name prefix (CAT1_KeyLight and CAT1_RimLight for
+  CAT1_HeroRotation_Camera).
+- isolate_category(camera): hides every other category's lights from the
+  render, so a view really depends only on what rig_hash covers. The setup
+  scripts leave all of CAT1-CAT5 and HERO lit in one scene; renderers must
+  call this before each camera's render.
+- shared_hash(): what every view sees: lights without a category prefix,
+  the world background, mesh objects (transform + vertex data) and their
+  K1_LED_* materials (node types, input values, image paths, links).
+
+Values are rounded before hashing so float noise from Euler/matrix round
+trips doesn't change the hash. Datablock names are hashed only where they
+carry meaning (camera/light/target names), never memory addresses.
+
+USAGE (Blender Scripting workspace, after running the setup scripts):
+    Run this script to print every camera's rig hash.
+k1_render_batch.py imports it inside its `blender -b` workers.
+"""
+
+import hashlib
+import json
+
+import bpy
+
+CATEGORIES = ("CAT1", "CAT2", "CAT3", "CAT4", "CAT5", "HERO")
+
+LED_MATERIAL_PREFIX = "K1_LED_"
+
+DIGITS = 6
+
+
+def _round(value):
+    try:
+        return [round(float(v), DIGITS) for v in value]
+    except TypeError:
+        return round(float(value), DIGITS)
+
+
+def _digest(state) -> str:
+    blob = json.dumps(state, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.sha256(blob).hexdigest()[:16]
+
+
+def category_of(name: str):
+    prefix = name.split("_", 1)[0]
+    return prefix if prefix in CATEGORIES else None
+
+
+def constraint_state(obj):
+    state = []
+    for c in obj.constraints:
+        target = getattr(c, "target", None)
+        state.append({
+            "type": c.type,
+            "target": target.name if target else None,
+            "targetLocation": _round(target.location) if target else None,
+            "track": getattr(c, "track_axis", None),
+            "up": getattr(c, "up_axis", None),
+        })
+    return state
+
+
+def camera_state(obj):
+    return {
+        "name": obj.name,
+        "location": _round(obj.location),
+        "rotation": _round(obj.rotation_euler),
+        "lens": _round(obj.data.lens),
+        "sensor": _round(obj.data.sensor_width),
+        "constraints": constraint_state(obj),
+    }
+
+
+def light_state(obj):
+    return {
+        "name": obj.name,
+        "type": obj.data.type,
+        "energy": _round(obj.data.energy),
+        "color": _round(obj.data.color),
+        "location": _round(obj.location),
+        "rotation": _round(obj.rotation_euler),
+        "constraints": constraint_state(obj),
+    }
+
+
+def material_state(mat):
+    if not mat.use_nodes or mat.node_tree is None:
+        return {"name": mat.name, "nodes": None}
+    nodes = []
+    for node in sorted(mat.node_tree.nodes, key=lambda n: n.name):
+        inputs = {}
+        for socket in node.inputs:
+            if hasattr(socket, "default_value"):
+                try:
+                    inputs[socket.identifier] = _round(socket.default_value)
+                except (TypeError, ValueError):
+                    inputs[socket.identifier] = str(socket.default_value)
+        image = getattr(node, "image", None)
+        nodes.append({
+            "name": node.name,
+            "type": node.bl_idname,
+            "inputs": inputs,
+            "image": image.filepath if image else None,
+        })
+    links = sorted(
+        f"{l.from_node.name}.{l.from_socket.identifier}->{l.to_node.name}.{l.to_socket.identifier}"
+        for l in mat.node_tree.links
+    )
+    return {"name": mat.name, "nodes": nodes, "links": links}
+
+
+def mesh_state(obj):
+    mesh = obj.data
+    coords = [0.0] * (len(mesh.vertices) * 3)
+    mesh.vertices.foreach_get("co", coords)
+    materials = [slot.material.name if slot.material else None for slot in obj.material_slots]
+    return {
+        "name": obj.name,
+        "matrix": [_round(row) for row in obj.matrix_world],
+        "vertices": hashlib.sha256(json.dumps(_round(coords)).encode()).hexdigest(),
+        "materials": materials,
+    }
+
+
+def world_state(scene):
+    world = scene.world
+    if world is None or not world.use_nodes:
+        return None
+    bg = world.node_tree.nodes.get("Background")
+    if bg is None:
+        return None
+    return {"color": _round(bg.inputs[0].default_value), "strength": _round(bg.inputs[1].default_value)}
+
+
+def shared_hash(scene=None) -> str:
+    scene = scene or bpy.context.scene
+    objects = sorted(scene.objects, key=lambda o: o.name)
+    meshes = [mesh_state(o) for o in objects if o.type == "MESH"]
+    led_materials = sorted({
+        slot.material.name
+        for o in objects if o.type == "MESH"
+        for slot in o.material_slots
+        if slot.material and slot.material.name.startswith(LED_MATERIAL_PREFIX)
+    })
+    return _digest({
+        "meshes": meshes,
+        "ledMaterials": [material_state(bpy.data.materials[name]) for name in led_materials],
+        "lights": [light_state(o) for o in objects if o.type == "LIGHT" and category_of(o.name) is None],
+        "world": world_state(scene),
+    })
+
+
+def rig_hash(camera, scene=None) -> str:
+    scene = scene or bpy.context.scene
+    category = category_of(camera.name)
+    lights = sorted((o for o in scene.objects
+                     if o.type == "LIGHT" and category and category_of(o.name) == category),
+                    key=lambda o: o.name)
+    return _digest({"camera": camera_state(camera), "lights": [light_state(o) for o in lights]})
+
+
+def isolate_category(camera, scene=None) -> None:
+    """Render only the camera's own category lights (plus uncategorized ones)."""
+    scene = scene or bpy.context.scene
+    category = category_of(camera.name)
+    for o in scene.objects:
+        if o.type == "LIGHT" and category_of(o.name) is not None:
+            o.hide_render = category_of(o.name) != category
+
+
+def rig_hashes(scene=None):
+    """{camera name: rig hash} for every camera in the scene."""
+    scene = scene or bpy.context.scene
+    return {o.name: rig_hash(o, scene) for o in scene.objects if o.type == "CAMERA"}
+
+
+if __name__ == "__main__":
+    print(f"Shared scene hash: {shared_hash()}")
+    for name, h in sorted(rig_hashes().items()):
+        print(f"  {h}  {name}")
@@ -7,37 +7,40 @@ Hardware specs: 32cm light guide plate, dual edge-lit design
 
 USAGE:
 1. Open K1_Final.blend
-2. Copy this entire script to Blender's Scripting workspace
+2. Open this script in Blender's Scripting workspace (k1_rig.py must be in the same folder)
 3. Run the script (Alt+P or click Run)
 4. Cameras will be created and positioned automatically
+
+Re-running updates existing HERO_* cameras in place (k1_rig.py) instead of
+deleting and recreating them, so no orphan camera data piles up.
 """
 
-import bpy
+import os
+import sys
 import math
+
+import bpy
 from mathutils import Vector, Euler
 
-def clear_existing_hero_cameras():
-    """Remove any existing HERO_* cameras to start fresh"""
-    cameras_to_remove = [obj for obj in bpy.data.objects if obj.name.startswith("HERO_")]
-    for cam in cameras_to_remove:
-        bpy.data.objects.remove(cam, do_unlink=True)
-    print(f"✓ Cleared {len(cameras_to_remove)} existing hero cameras")
 
-def create_camera(name, location, rotation, focal_length=35):
-    """Create and configure a camera with given parameters"""
-    # Create camera data and object
-    cam_data = bpy.data.cameras.new(name=name)
-    cam_data.lens = focal_length
-    cam_data.sensor_width = 36  # Full frame sensor
+def _script_dir():
+    """
+    Folder this script lives in. From the Text Editor's Run Script, __file__
+    is <blend>/<text name>, so use the text block's own file path there.
+    """
+    text = getattr(getattr(bpy.context, "space_data", None), "text", None)
+    if text is None and not os.path.isfile(__file__):
+        text = bpy.data.texts.get(os.path.basename(__file__))
+    if text is not None and text.filepath:
+        return os.path.dirname(bpy.path.abspath(text.filepath))
+    return os.path.dirname(os.path.abspath(__file__))  # blender -b --python
 
-    cam_object = bpy.data.objects.new(name, cam_data)
-    bpy.context.collection.objects.link(cam_object)
 
-    # Set position and rotation
-    cam_object.location = location
-    cam_object.rotation_euler = rotation
+sys.path.insert(0, _script_dir())
+import k1_rig  # noqa: E402
 
-    return cam_object
+MANAGED_PREFIXES = ("HERO_",)
+SENSOR_WIDTH = 36  # Full frame sensor
 
 def setup_hero_cameras():
     """
@@ -54,9 +57,6 @@ def setup_hero_cameras():
     print("\n🎬 K1 LIGHTWAVE - HERO CAMERA SETUP")
     print("=" * 50)
 
-    # Clear any existing hero cameras
-    clear_existing_hero_cameras()
-
     # Define camera positions (x, y, z) and rotations (rx, ry, rz in radians)
     # K1 is 32cm wide, positioned at origin
 
@@ -143,17 +143,21 @@ def setup_hero_cameras():
         }
     ]
 
-    # Create all cameras
-    created_cameras = []
-    for i, cam_config in enumerate(cameras, 1):
-        cam = create_camera(
+    # Reconcile the scene with the camera specs (only changed properties are written)
+    rig = [
+        k1_rig.camera_spec(
             name=cam_config["name"],
             location=cam_config["location"],
             rotation=cam_config["rotation"],
-            focal_length=cam_config["focal"]
+            lens=cam_config["focal"],
+            sensor_width=SENSOR_WIDTH
         )
-        created_cameras.append(cam)
+        for cam_config in cameras
+    ]
+    objects = k1_rig.reconcile_rig(rig, MANAGED_PREFIXES)
+    created_cameras = [objects[cam_config["name"]] for cam_config in cameras]
 
+    for i, cam_config in enumerate(cameras, 1):
         print(f"\n{i:02d}. {cam_config['name']}")
         print(f"    📝 {cam_config['desc']}")
         print(f"    🎯 {cam_config['priority']}")
@@ -161,10 +165,11 @@ def setup_hero_cameras():
         print(f"    🔄 Focal: {cam_config['focal']}mm")
 
     # Set HERO_01 as active camera (primary hero shot)
-    bpy.context.scene.camera = created_cameras[0]
+    if bpy.context.scene.camera != created_cameras[0]:
+        bpy.context.scene.camera = created_cameras[0]
 
     print("\n" + "=" * 50)
-    print(f"✅ Created {len(created_cameras)} hero cameras")
+    print(f"✅ {len(created_cameras)} hero cameras ready")
     print(f"📷 Active camera: {created_cameras[0].name}")
     print("\n🎬 NEXT STEPS:")
     print("1. Select camera from Scene Collection")
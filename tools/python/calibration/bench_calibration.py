@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+bench_calibration.py
+
+Speed and accuracy benchmark for the calibration pipeline on synthetic
+captures with known ground truth.
+
+For each resolution the four calibration photos are synthesized by rendering
+the edge-lit model (edge_lit_render.py) with a preset's optics, placing the
+plate inside the default ROI of a larger frame, and adding vignetting and
+sensor noise before JPEG encoding. The pipeline is then timed stage by stage
+(load_gray, crop_roi, peak detection, each analysis, map_optics) and end to
+end through calibrate_optics.main(), and each fitting engine's answer is
+compared against the optics that produced the images.
+
+Per stage the report has the min/median wall time over --repeats runs, the
+peak Python-heap allocation (tracemalloc) and the peak resident-memory growth,
+which also counts OpenCV's and NumPy's native buffers (each stage runs in a
+forked child; null where fork or /proc is unavailable). Memory is measured in
+separate passes so it doesn't skew the timings. With --baseline, stages that got slower than
+--tolerance are listed under "regressions" and the exit code is 1.
+
+Usage:
+    python bench_calibration.py
+    python bench_calibration.py --resolutions 1080p,4k,8k --noise 0.02 --output bench.json
+    python bench_calibration.py --engines heuristic,optimize --repeats 3
+    python bench_calibration.py --baseline bench.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, fields
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+import calibrate_optics as co
+from edge_lit_render import PATTERNS, PRESETS, RenderSettings, pattern_strips, render_frame, to_gray
+from peak_detect import find_peak
+
+
+RESOLUTION_ALIASES = {
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+    "8k": (7680, 4320),
+}
+
+ENGINES = ("heuristic", "optimize")
+
+
+@dataclass
+class SynthConfig:
+    width: int = 1920
+    height: int = 1080
+    preset: str = "HERO_V1"
+    noise: float = 0.01          # Gaussian sensor noise, fraction of full scale
+    vignette: float = 0.3        # brightness loss at the frame corners
+    peak_level: float = 0.9      # brightest plate pixel before noise (0-1)
+    jpeg_quality: int = 95
+    seed: int = 0
+
+
+# ---------- SYNTHETIC CAPTURES ------------------------------------------------
+
+def ground_truth(preset: str) -> Tuple[co.OpticsResult, RenderSettings]:
+    optics, settings = PRESETS[preset]
+    return co.OpticsResult(**asdict(optics)), settings
+
+
+def synthesize_unit(out_dir: str, cfg: SynthConfig) -> co.OpticsResult:
+    """Write the four capture JPEGs for cfg into out_dir; returns the true optics."""
+    optics, settings = ground_truth(cfg.preset)
+    rng = np.random.default_rng(cfg.seed)
+    w, h = cfg.width, cfg.height
+    roi = co.ROI
+    x0, x1 = int(roi["x_min"] * w), int(roi["x_max"] * w)
+    y0, y1 = int(roi["y_min"] * h), int(roi["y_max"] * h)
+
+    yy, xx = np.mgrid[0:h, 0:w].astype(np.float32)
+    r2 = ((xx - 0.5 * w) / (0.5 * w)) ** 2 + ((yy - 0.5 * h) / (0.5 * h)) ** 2
+    vignette = (1.0 - 0.5 * cfg.vignette * r2).astype(np.float32)
+    del xx, yy, r2
+
+    # One exposure for the whole set (like a locked camera), set by the brightest pattern.
+    plates = {}
+    for pattern in PATTERNS:
+        bottom, top = pattern_strips(pattern)
+        plates[pattern] = to_gray(render_frame(bottom, top, optics, settings, width=x1 - x0, height=y1 - y0))
+    exposure = cfg.peak_level / max(float(max(p.max() for p in plates.values())), 1e-6)
+
+    os.makedirs(out_dir, exist_ok=True)
+    for pattern, filename in zip(PATTERNS, co.CAPTURE_FILENAMES):
+        frame = np.zeros((h, w), dtype=np.float32)
+        frame[y0:y1, x0:x1] = plates.pop(pattern) * exposure
+        frame *= vignette
+        frame += rng.normal(0.0, cfg.noise, frame.shape).astype(np.float32)
+        img = np.clip(frame * 255.0 + 0.5, 0, 255).astype(np.uint8)
+        cv2.imwrite(os.path.join(out_dir, filename), img, [cv2.IMWRITE_JPEG_QUALITY, cfg.jpeg_quality])
+    return optics
+
+
+# ---------- STAGES ------------------------------------------------------------
+
+def pipeline_stages(cal_dir: str) -> List[Tuple[str, Callable[[], object]]]:
+    """(name, fn) for each pipeline stage; later stages reuse earlier outputs."""
+    state: Dict[str, object] = {}
+    paths = [os.path.join(cal_dir, name) for name in co.CAPTURE_FILENAMES]
+
+    def load():
+        state["raw"] = [co.load_gray(p) for p in paths]
+
+    def crop():
+        state["imgs"] = [co.crop_roi(img) for img in state["raw"]]
+
+    def peaks():
+        top, bottom = state["imgs"][:2]
+        return find_peak(top), find_peak(bottom)
+
+    def impulse_top():
+        state["top"] = co.analyse_impulse_top(state["imgs"][0])
+
+    def impulse_bottom():
+        state["bottom"] = co.analyse_impulse_bottom(state["imgs"][1])
+
+    def collision():
+        state["collision"] = co.analyse_collision(*state["imgs"][:3])
+
+    def edges():
+        state["edges"] = co.analyse_edge_hotspots(state["imgs"][3])
+
+    def mapping():
+        (tv, tn, tf), (bv, bn, bf) = state["top"], state["bottom"]
+        return co.map_optics(tv, tn, tf, bv, bn, bf, *state["collision"], *state["edges"])
+
+    def full_main():
+        with contextlib.redirect_stdout(io.StringIO()):
+            co.main(["--cal-dir", cal_dir, "--no-cache"])
+
+    return [
+        ("load_gray", load),
+        ("crop_roi", crop),
+        ("find_peak", peaks),
+        ("analyse_impulse_top", impulse_top),
+        ("analyse_impulse_bottom", impulse_bottom),
+        ("analyse_collision", collision),
+        ("analyse_edge_hotspots", edges),
+        ("map_optics", mapping),
+        ("main", full_main),
+    ]
+
+
+def current_rss_kb() -> Optional[int]:
+    """Resident set size of this process in KiB (Linux /proc), or None."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_growth_mb(fn: Callable[[], object]) -> Optional[float]:
+    """
+    Peak RSS growth while fn() runs, native allocations included.
+
+    fn runs in a forked child: its ru_maxrss starts from the RSS inherited at
+    fork rather than the benchmark's own high-water mark, so the difference is
+    what the stage itself needed.
+    """
+    if not hasattr(os, "fork") or current_rss_kb() is None:
+        return None
+    import resource
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            os.close(read_fd)
+            base = current_rss_kb()
+            with contextlib.redirect_stdout(io.StringIO()):
+                fn()
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB on Linux
+            os.write(write_fd, str(max(peak - base, 0)).encode())
+            status = 0
+        finally:
+            os._exit(status)
+    os.close(write_fd)
+    with os.fdopen(read_fd, "rb") as f:
+        data = f.read()
+    os.waitpid(pid, 0)
+    return int(data) / 1024 if data else None
+
+
+def time_stages(cal_dir: str, repeats: int) -> Dict[str, Dict[str, float]]:
+    timings: Dict[str, List[float]] = {}
+    for _ in range(repeats):
+        for name, fn in pipeline_stages(cal_dir):
+            t0 = time.perf_counter()
+            fn()
+            timings.setdefault(name, []).append((time.perf_counter() - t0) * 1e3)
+
+    # Separate passes for memory: tracemalloc slows allocation-heavy code down,
+    # and it only sees Python-heap allocations, not OpenCV's native buffers.
+    rss: Dict[str, Optional[float]] = {}
+    for name, fn in pipeline_stages(cal_dir):
+        rss[name] = peak_rss_growth_mb(fn)
+        fn()  # the child's results are lost; later stages need them here
+    peaks: Dict[str, float] = {}
+    tracemalloc.start()
+    try:
+        for name, fn in pipeline_stages(cal_dir):
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            fn()
+            peaks[name] = (tracemalloc.get_traced_memory()[1] - base) / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+    return {
+        name: {
+            "min_ms": round(min(ts), 3),
+            "median_ms": round(statistics.median(ts), 3),
+            "py_heap_mb": round(peaks[name], 2),
+            "rss_mb": None if rss[name] is None else round(rss[name], 2),
+        }
+        for name, ts in timings.items()
+    }
+
+
+# ---------- ACCURACY ----------------------------------------------------------
+
+def run_engine(engine: str, cal_dir: str) -> Tuple[co.OpticsResult, float]:
+    t0 = time.perf_counter()
+    images = co.load_unit_images(cal_dir)
+    optics = co.calibrate_images(*images)
+    if engine == "optimize":
+        from optimize_optics import fit_optics
+        fit = fit_optics(images, initial=optics)
+        # Score what calibrate_optics --optimize would print, fallback included.
+        if not fit.fallback_reason:
+            optics = fit.optics
+    elif engine != "heuristic":
+        raise ValueError(f"Unknown engine {engine!r}; expected one of {ENGINES}")
+    return optics, (time.perf_counter() - t0) * 1e3
+
+
+def recovery_error(estimate: co.OpticsResult, truth: co.OpticsResult) -> Dict[str, object]:
+    abs_err, rel_err = {}, {}
+    for f in fields(co.OpticsResult):
+        est, true = getattr(estimate, f.name), getattr(truth, f.name)
+        abs_err[f.name] = round(abs(est - true), 6)
+        rel_err[f.name] = round(abs(est - true) / max(abs(true), co.EPS), 6)
+    return {
+        "estimate": co.optics_to_dict(estimate),
+        "abs_error": abs_err,
+        "rel_error": rel_err,
+        "mean_rel_error": round(float(np.mean(list(rel_err.values()))), 6),
+    }
+
+
+# ---------- DRIVER ------------------------------------------------------------
+
+def parse_resolution(text: str) -> Tuple[int, int]:
+    key = text.strip().lower()
+    if key in RESOLUTION_ALIASES:
+        return RESOLUTION_ALIASES[key]
+    try:
+        w, h = key.split("x")
+        return int(w), int(h)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Bad resolution {text!r}; use WxH or one of {sorted(RESOLUTION_ALIASES)}")
+
+
+def run_benchmark(
+    resolutions: List[Tuple[int, int]],
+    base: SynthConfig,
+    engines: List[str],
+    repeats: int,
+) -> Dict[str, object]:
+    runs = []
+    for width, height in resolutions:
+        cfg = SynthConfig(**{**asdict(base), "width": width, "height": height})
+        with tempfile.TemporaryDirectory(prefix="k1_bench_") as cal_dir:
+            t0 = time.perf_counter()
+            truth = synthesize_unit(cal_dir, cfg)
+            synth_s = time.perf_counter() - t0
+            print(f"[{width}x{height}] synthesized in {synth_s:.1f}s, timing...", file=sys.stderr)
+
+            stages = time_stages(cal_dir, repeats)
+            recovery = {}
+            for engine in engines:
+                optics, ms = run_engine(engine, cal_dir)
+                recovery[engine] = {**recovery_error(optics, truth), "wall_ms": round(ms, 3)}
+
+        runs.append({
+            "resolution": f"{width}x{height}",
+            "stages": stages,
+            "recovery": recovery,
+        })
+    return {"runs": runs}
+
+
+def find_regressions(report: Dict[str, object], baseline: Dict[str, object], tolerance: float,
+                     min_ms: float = 1.0) -> List[Dict[str, object]]:
+    """Stages whose median time grew by more than tolerance (and min_ms) vs baseline."""
+    old = {run["resolution"]: run["stages"] for run in baseline.get("runs", [])}
+    regressions = []
+    for run in report["runs"]:
+        for stage, stats in run["stages"].items():
+            before = old.get(run["resolution"], {}).get(stage)
+            if before is None:
+                continue
+            was, now = before["median_ms"], stats["median_ms"]
+            if now > was * (1.0 + tolerance) and now - was > min_ms:
+                regressions.append({
+                    "resolution": run["resolution"],
+                    "stage": stage,
+                    "baseline_ms": was,
+                    "median_ms": now,
+                    "ratio": round(now / max(was, 1e-9), 3),
+                })
+    return regressions
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark K1 calibration speed and accuracy on synthetic captures.")
+    parser.add_argument("--resolutions", default="1080p",
+                        help="Comma-separated WxH or aliases (720p, 1080p, 4k, 8k).")
+    parser.add_argument("--preset", default="HERO_V1", choices=sorted(PRESETS),
+                        help="Ground-truth optics used to synthesize the captures.")
+    parser.add_argument("--noise", type=float, default=0.01, help="Sensor noise sigma (fraction of full scale).")
+    parser.add_argument("--vignette", type=float, default=0.3, help="Corner brightness loss (0-1).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per stage.")
+    parser.add_argument("--engines", default="heuristic",
+                        help=f"Comma-separated fitting engines to score: {', '.join(ENGINES)}.")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout).")
+    parser.add_argument("--baseline", help="Earlier report to compare timings against.")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed slowdown vs baseline before a stage counts as regressed.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    resolutions = [parse_resolution(r) for r in args.resolutions.split(",") if r.strip()]
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+    for engine in engines:
+        if engine not in ENGINES:
+            print(f"Unknown engine {engine!r}; expected one of {ENGINES}", file=sys.stderr)
+            return 2
+
+    base = SynthConfig(preset=args.preset, noise=args.noise, vignette=args.vignette, seed=args.seed)
+    report: Dict[str, object] = {
+        "config": {**asdict(base), "repeats": args.repeats, "engines": engines},
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "cpu_count": os.cpu_count(),
+            "platform": platform.platform(),
+        },
+    }
+    report.update(run_benchmark(resolutions, base, engines, max(1, args.repeats)))
+
+    regressions: Optional[List[Dict[str, object]]] = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = find_regressions(report, json.load(f), args.tolerance)
+        report["regressions"] = regressions
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if regressions:
+        for r in regressions:
+            print(f"REGRESSION {r['resolution']} {r['stage']}: {r['baseline_ms']:.1f} -> "
+                  f"{r['median_ms']:.1f} ms (x{r['ratio']})", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
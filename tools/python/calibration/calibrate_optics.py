@@ -11,6 +11,14 @@ Input:
     ./cal/collision_center.jpg
     ./cal/edges_only.jpg
 
+    or, with --batch ROOT, one folder per unit under ROOT, each holding the
+    same four files (e.g. ROOT/K1-0001/top_impulse_center.jpg, ...).
+
+    or, with --stream SOURCE, a video file / camera index (stream_calibrate.py).
+
+    With --export-lut PATH, also writes per-column falloff and per-depth
+    spread curves as a small texture (optics_lut.py).
+
 Output:
     Prints a JSON block with recommended values for:
 
@@ -22,29 +30,61 @@ Output:
 
 You can paste these into K1_HERO_PRESET.optics in K1Engine.tsx.
 
+In batch mode the per-unit analysis is fanned out over a process pool and
+one row per unit is written to --output (.csv for CSV, anything else for
+JSON Lines).
+
 This is deliberately conservative and heuristic: it won’t be “scientific paper
 perfect”, but it’ll get you much closer to reality than guessing in Leva.
 """
 
+import argparse
+import csv
 import json
 import math
 import os
-from dataclasses import dataclass
-from typing import Tuple, Optional
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, fields
+from typing import Dict, List, Tuple, Optional
 
 import cv2
 import numpy as np
-from scipy.optimize import curve_fit
+
+from image_cache import DEFAULT_CACHE_DIR, get_cache
+from peak_detect import MIN_CONFIDENCE, find_peak, sample_column
+from profile_fit import (
+    REFINE_RMS,
+    ExpDecayMap,
+    GaussianMap,
+    fit_column_decay,
+    fit_exp_decay,
+    fit_gaussian,
+    fit_row_gaussians,
+)
 
 
 # ---------- CONFIG -----------------------------------------------------------
 
 CAL_DIR = os.path.join(os.path.dirname(__file__), "cal")
 
-TOP_IMPULSE_PATH = os.path.join(CAL_DIR, "top_impulse_center.jpg")
-BOTTOM_IMPULSE_PATH = os.path.join(CAL_DIR, "bottom_impulse_center.jpg")
-COLLISION_PATH = os.path.join(CAL_DIR, "collision_center.jpg")
-EDGES_ONLY_PATH = os.path.join(CAL_DIR, "edges_only.jpg")
+TOP_IMPULSE_FILENAME = "top_impulse_center.jpg"
+BOTTOM_IMPULSE_FILENAME = "bottom_impulse_center.jpg"
+COLLISION_FILENAME = "collision_center.jpg"
+EDGES_ONLY_FILENAME = "edges_only.jpg"
+
+TOP_IMPULSE_PATH = os.path.join(CAL_DIR, TOP_IMPULSE_FILENAME)
+BOTTOM_IMPULSE_PATH = os.path.join(CAL_DIR, BOTTOM_IMPULSE_FILENAME)
+COLLISION_PATH = os.path.join(CAL_DIR, COLLISION_FILENAME)
+EDGES_ONLY_PATH = os.path.join(CAL_DIR, EDGES_ONLY_FILENAME)
+
+CAPTURE_FILENAMES = (
+    TOP_IMPULSE_FILENAME,
+    BOTTOM_IMPULSE_FILENAME,
+    COLLISION_FILENAME,
+    EDGES_ONLY_FILENAME,
+)
 
 # If your photos include a lot of background around the K1,
 # set these ROIs (in normalized [0–1] coords) to roughly isolate the bar.
@@ -59,6 +99,17 @@ ROI = {
 # Small epsilon to avoid divide-by-zero etc.
 EPS = 1e-6
 
+# Shader-space clamps for fitted falloff / spread values.
+FALLOFF_RANGE = (0.5, 10.0)
+SPREAD_RANGE = (0.0005, 0.1)
+
+# Gaussian sigma -> shader spread factors (near, far) per strip. "Near" is
+# sampled SPREAD_NEAR_DEPTH of the way into the plate from the lit edge,
+# "far" at SPREAD_FAR_DEPTH (mid-plate).
+SPREAD_SCALE = {"top": (0.6, 0.9), "bottom": (0.8, 1.0)}
+SPREAD_NEAR_DEPTH = 0.05
+SPREAD_FAR_DEPTH = 0.5
+
 
 @dataclass
 class ProfileFit:
@@ -100,12 +151,13 @@ def load_gray(path: str) -> np.ndarray:
     return img
 
 
-def crop_roi(img: np.ndarray) -> np.ndarray:
+def crop_roi(img: np.ndarray, roi: Optional[Dict[str, float]] = None) -> np.ndarray:
+    roi = roi or ROI
     h, w = img.shape
-    x0 = int(ROI["x_min"] * w)
-    x1 = int(ROI["x_max"] * w)
-    y0 = int(ROI["y_min"] * h)
-    y1 = int(ROI["y_max"] * h)
+    x0 = int(roi["x_min"] * w)
+    x1 = int(roi["x_max"] * w)
+    y0 = int(roi["y_min"] * h)
+    y1 = int(roi["y_max"] * h)
     x0 = max(0, min(w - 1, x0))
     x1 = max(x0 + 1, min(w, x1))
     y0 = max(0, min(h - 1, y0))
@@ -115,22 +167,22 @@ def crop_roi(img: np.ndarray) -> np.ndarray:
 
 
 def find_brightest_coord(img: np.ndarray) -> Tuple[int, int]:
-    """Return (y, x) of brightest pixel."""
-    idx = np.argmax(img)
-    y, x = np.unravel_index(idx, img.shape)
-    return int(y), int(x)
-
+    """
+    Return (y, x) of the brightest light blob, rounded to whole pixels.
 
-# ---------- FITTING HELPERS --------------------------------------------------
+    Box-filtered so hot pixels and glints don't win; see peak_detect.find_peak
+    for the sub-pixel position and a confidence score.
+    """
+    peak = find_peak(img)
+    return int(round(peak.y)), int(round(peak.x))
 
-def exp_decay(y, k, a):
-    # y in [0, 1]; brightness ~ a * exp(-k * y)
-    return a * np.exp(-k * y)
 
+def peak_confidence(top_img: np.ndarray, bottom_img: np.ndarray) -> float:
+    """Lower of the two impulse peak confidences; low values mean re-check the capture."""
+    return min(find_peak(top_img).confidence, find_peak(bottom_img).confidence)
 
-def gaussian(x, amp, mu, sigma):
-    return amp * np.exp(-0.5 * ((x - mu) / (sigma + EPS)) ** 2)
 
+# ---------- FITTING HELPERS --------------------------------------------------
 
 def fit_vertical_profile(profile: np.ndarray, from_top: bool = True) -> Optional[ProfileFit]:
     """
@@ -140,66 +192,28 @@ def fit_vertical_profile(profile: np.ndarray, from_top: bool = True) -> Optional
     from_top:
         True  -> interpret y=0 at top, grow downward
         False -> interpret y=0 at bottom, so we flip.
+
+    Closed-form log-linear fit (see profile_fit.py), refined with
+    Levenberg-Marquardt only when the residual is large.
     """
-    prof = profile.copy()
-    n = prof.size
-    if not from_top:
-        prof = prof[::-1]
-
-    # Normalise to [0,1]
-    prof = prof - prof.min()
-    if prof.max() < EPS:
+    prof = profile if from_top else profile[::-1]
+    fit = fit_exp_decay(prof, refine_rms=REFINE_RMS)
+    if not fit.valid[0]:
         return None
-    prof = prof / (prof.max() + EPS)
+    return ProfileFit(k=float(fit.k[0]), k_err=float(fit.k_err[0]), amplitude=float(fit.amplitude[0]))
 
-    y = np.linspace(0.0, 1.0, n, dtype=np.float32)
 
-    # Only fit where signal is above a small threshold
-    mask = prof > 0.1
-    if mask.sum() < max(5, n // 10):
-        # Too few points above threshold, bail out
-        return None
-
-    y_fit = y[mask]
-    p_fit = prof[mask]
-
-    try:
-        popt, pcov = curve_fit(exp_decay, y_fit, p_fit, p0=(3.0, 1.0), maxfev=10000)
-        k, a = popt
-        k_err = float(np.sqrt(np.diag(pcov))[0]) if pcov is not None else 0.0
-        return ProfileFit(k=float(k), k_err=k_err, amplitude=float(a))
-    except Exception:
-        return None
+def _gaussian_fits(fit: GaussianMap) -> List[Optional[GaussianFit]]:
+    return [
+        GaussianFit(sigma=float(fit.sigma[i]), mu=float(fit.mu[i]), amplitude=float(fit.amplitude[i]))
+        if fit.valid[i] else None
+        for i in range(fit.valid.size)
+    ]
 
 
 def fit_horizontal_gaussian(profile: np.ndarray) -> Optional[GaussianFit]:
     """Fit a Gaussian to a horizontal 1D brightness profile."""
-    p = profile.copy()
-    x = np.linspace(0.0, 1.0, p.size, dtype=np.float32)
-
-    p = p - p.min()
-    if p.max() < EPS:
-        return None
-    p = p / (p.max() + EPS)
-
-    # Focus on central region where brightness is significant
-    mask = p > 0.1
-    if mask.sum() < max(5, p.size // 10):
-        return None
-
-    x_fit = x[mask]
-    p_fit = p[mask]
-    # Initial guess: peak ~ centre of mass
-    mu0 = float(np.sum(x_fit * p_fit) / (np.sum(p_fit) + EPS))
-    sigma0 = 0.05
-    amp0 = 1.0
-
-    try:
-        popt, _ = curve_fit(gaussian, x_fit, p_fit, p0=(amp0, mu0, sigma0), maxfev=10000)
-        amp, mu, sigma = popt
-        return GaussianFit(sigma=float(abs(sigma)), mu=float(mu), amplitude=float(amp))
-    except Exception:
-        return None
+    return _gaussian_fits(fit_gaussian(profile, refine_rms=REFINE_RMS))[0]
 
 
 # ---------- ANALYSIS ROUTINES ------------------------------------------------
@@ -212,21 +226,19 @@ def analyse_impulse_top(img: np.ndarray) -> Tuple[Optional[ProfileFit], Optional
         - horizontal spread mid-plate (GaussianFit)
     """
     h, w = img.shape
-    y_center, x_center = find_brightest_coord(img)
+    peak = find_peak(img)
 
-    # Vertical profile through brightest column
-    col = img[:, x_center]
+    # Vertical profile through the (sub-pixel) peak column
+    col = sample_column(img, peak.x)
     vert_fit = fit_vertical_profile(col, from_top=True)
 
     # Horizontal profiles: near top (5% down) and mid-height
-    y_top_slice = max(0, min(h - 1, int(0.05 * h)))
-    y_mid_slice = max(0, min(h - 1, int(0.5 * h)))
-
-    horiz_top = img[y_top_slice, :]
-    horiz_mid = img[y_mid_slice, :]
+    y_top_slice = max(0, min(h - 1, int(SPREAD_NEAR_DEPTH * h)))
+    y_mid_slice = max(0, min(h - 1, int(SPREAD_FAR_DEPTH * h)))
 
-    gauss_top = fit_horizontal_gaussian(horiz_top)
-    gauss_mid = fit_horizontal_gaussian(horiz_mid)
+    gauss_top, gauss_mid = _gaussian_fits(
+        fit_row_gaussians(img[[y_top_slice, y_mid_slice], :], refine_rms=REFINE_RMS)
+    )
 
     return vert_fit, gauss_top, gauss_mid
 
@@ -237,22 +249,32 @@ def analyse_impulse_bottom(img: np.ndarray) -> Tuple[Optional[ProfileFit], Optio
     Vertical profile is interpreted from bottom upwards.
     """
     h, w = img.shape
-    y_center, x_center = find_brightest_coord(img)
+    peak = find_peak(img)
 
-    col = img[:, x_center]
+    col = sample_column(img, peak.x)
     vert_fit = fit_vertical_profile(col, from_top=False)
 
-    y_bottom_slice = max(0, min(h - 1, int(0.95 * h)))
-    y_mid_slice = max(0, min(h - 1, int(0.5 * h)))
-
-    horiz_bottom = img[y_bottom_slice, :]
-    horiz_mid = img[y_mid_slice, :]
+    y_bottom_slice = max(0, min(h - 1, int((1.0 - SPREAD_NEAR_DEPTH) * h)))
+    y_mid_slice = max(0, min(h - 1, int((1.0 - SPREAD_FAR_DEPTH) * h)))
 
-    gauss_bottom = fit_horizontal_gaussian(horiz_bottom)
-    gauss_mid = fit_horizontal_gaussian(horiz_mid)
+    gauss_bottom, gauss_mid = _gaussian_fits(
+        fit_row_gaussians(img[[y_bottom_slice, y_mid_slice], :], refine_rms=REFINE_RMS)
+    )
 
     return vert_fit, gauss_bottom, gauss_mid
 
+
+def analyse_impulse_maps(img: np.ndarray, from_top: bool = True) -> Tuple[ExpDecayMap, GaussianMap]:
+    """
+    Spatially resolved version of analyse_impulse_top/bottom.
+
+    Fits an exponential decay to every column and a Gaussian to every row of
+    the cropped impulse image in one vectorized pass (closed form, no LM
+    refinement), so falloff and spread can be inspected across the plate
+    instead of at a single sample.
+    """
+    return fit_column_decay(img, from_top=from_top), fit_row_gaussians(img)
+
 def analyse_collision(top_img: np.ndarray, bottom_img: np.ndarray, coll_img: np.ndarray) -> Tuple[float, float]:
     """
     Estimate columnBoostStrength / columnBoostExponent by comparing
@@ -366,13 +388,13 @@ def map_optics(
         if sigma is None or sigma <= 0.0 or not math.isfinite(sigma):
             return default
         # sigma typically ~0.02–0.1, we map to a spread ~sigma*scale
-        return max(0.0005, min(0.1, sigma * scale))
+        return max(SPREAD_RANGE[0], min(SPREAD_RANGE[1], sigma * scale))
 
-    # Falloff from fitted k; clamp to [0.5, 10]
+    # Falloff from fitted k; clamp to FALLOFF_RANGE
     def k_to_falloff(fit: Optional[ProfileFit], default: float) -> float:
         if fit is None or not math.isfinite(fit.k) or fit.k <= 0.0:
             return default
-        return float(max(0.5, min(10.0, fit.k)))
+        return float(max(FALLOFF_RANGE[0], min(FALLOFF_RANGE[1], fit.k)))
 
     top_falloff = k_to_falloff(top_vert, DEFAULT.topFalloff)
     bottom_falloff = k_to_falloff(bottom_vert, DEFAULT.bottomFalloff)
@@ -382,10 +404,12 @@ def map_optics(
     bottom_sigma_near = bottom_gauss_near.sigma if bottom_gauss_near else None
     bottom_sigma_far = bottom_gauss_far.sigma if bottom_gauss_far else None
 
-    top_spread_near = sigma_to_spread(top_sigma_near, scale=0.6, default=DEFAULT.topSpreadNear)
-    top_spread_far = sigma_to_spread(top_sigma_far, scale=0.9, default=DEFAULT.topSpreadFar)
-    bottom_spread_near = sigma_to_spread(bottom_sigma_near, scale=0.8, default=DEFAULT.bottomSpreadNear)
-    bottom_spread_far = sigma_to_spread(bottom_sigma_far, scale=1.0, default=DEFAULT.bottomSpreadFar)
+    top_near_scale, top_far_scale = SPREAD_SCALE["top"]
+    bottom_near_scale, bottom_far_scale = SPREAD_SCALE["bottom"]
+    top_spread_near = sigma_to_spread(top_sigma_near, scale=top_near_scale, default=DEFAULT.topSpreadNear)
+    top_spread_far = sigma_to_spread(top_sigma_far, scale=top_far_scale, default=DEFAULT.topSpreadFar)
+    bottom_spread_near = sigma_to_spread(bottom_sigma_near, scale=bottom_near_scale, default=DEFAULT.bottomSpreadNear)
+    bottom_spread_far = sigma_to_spread(bottom_sigma_far, scale=bottom_far_scale, default=DEFAULT.bottomSpreadFar)
 
     # Column & edge parameters already in roughly the right range, clamp softly
     col_strength = float(max(0.0, min(5.0, column_strength)))
@@ -407,39 +431,26 @@ def map_optics(
     )
 
 
-# ---------- MAIN -------------------------------------------------------------
-
-def main():
-    print("=== K1 Optics Calibration ===")
-    print(f"Calibration directory: {CAL_DIR}")
+# ---------- PIPELINE ---------------------------------------------------------
 
-    # 1) Load & crop images
-    top_img_full = load_gray(TOP_IMPULSE_PATH)
-    bottom_img_full = load_gray(BOTTOM_IMPULSE_PATH)
-    coll_img_full = load_gray(COLLISION_PATH)
-    edges_img_full = load_gray(EDGES_ONLY_PATH)
-
-    top_img = crop_roi(top_img_full)
-    bottom_img = crop_roi(bottom_img_full)
-    coll_img = crop_roi(coll_img_full)
-    edges_img = crop_roi(edges_img_full)
-
-    # 2) Analyse impulse responses
-    top_vert, top_gauss_near, top_gauss_mid = analyse_impulse_top(top_img)
-    bottom_vert, bottom_gauss_near, bottom_gauss_mid = analyse_impulse_bottom(bottom_img)
-
-    # Use mid Gaussian as "far" spread
-    top_gauss_far = top_gauss_mid
-    bottom_gauss_far = bottom_gauss_mid
+def calibrate_images(
+    top_img: np.ndarray,
+    bottom_img: np.ndarray,
+    coll_img: np.ndarray,
+    edges_img: np.ndarray,
+) -> OpticsResult:
+    """Run the full analysis on four ROI-cropped grayscale images."""
+    # Analyse impulse responses; the mid Gaussian is used as the "far" spread
+    top_vert, top_gauss_near, top_gauss_far = analyse_impulse_top(top_img)
+    bottom_vert, bottom_gauss_near, bottom_gauss_far = analyse_impulse_bottom(bottom_img)
 
-    # 3) Collision-based column boost
+    # Collision-based column boost
     col_strength, col_exponent = analyse_collision(top_img, bottom_img, coll_img)
 
-    # 4) Edge hotspots
+    # Edge hotspots
     edge_strength, edge_width = analyse_edge_hotspots(edges_img)
 
-    # 5) Map into shader params
-    optics = map_optics(
+    return map_optics(
         top_vert=top_vert,
         top_gauss_near=top_gauss_near,
         top_gauss_far=top_gauss_far,
@@ -452,20 +463,250 @@ def main():
         edge_width=edge_width,
     )
 
-    # 6) Print JSON block to paste into K1_HERO_PRESET.optics
+
+def load_unit_images(cal_dir: str, cache_dir: Optional[str] = None, level: int = 0) -> List[np.ndarray]:
+    """
+    Load and crop the four calibration photos in CAPTURE_FILENAMES order.
+
+    With a cache_dir the cropped frames come from the memory-mapped pyramid
+    cache in image_cache.py (read-only arrays; `level` picks 1/2**level scale).
+    """
+    paths = [os.path.join(cal_dir, name) for name in CAPTURE_FILENAMES]
+    if cache_dir is None:
+        if level:
+            raise ValueError("Pyramid levels require the image cache (cache_dir)")
+        return [crop_roi(load_gray(p)) for p in paths]
+
+    cache = get_cache(cache_dir)
+    for p in paths:
+        if not os.path.exists(p):
+            raise FileNotFoundError(f"Missing calibration image: {p}")
+    return [cache.load(p, ROI, level) for p in paths]
+
+
+def calibrate_unit(cal_dir: str, cache_dir: Optional[str] = None) -> OpticsResult:
+    """Load the four calibration photos in cal_dir and estimate optics."""
+    return calibrate_images(*load_unit_images(cal_dir, cache_dir))
+
+
+def optics_to_dict(optics: OpticsResult) -> Dict[str, float]:
+    return {k: float(v) for k, v in asdict(optics).items()}
+
+
+# ---------- BATCH MODE -------------------------------------------------------
+
+def find_unit_dirs(root: str) -> List[str]:
+    """
+    Return sorted sub-directories of root that contain calibration captures.
+
+    Folders with only some of the four files are kept so they surface as a
+    failed row instead of silently dropping out of the batch.
+    """
+    if not os.path.isdir(root):
+        raise FileNotFoundError(f"Batch root is not a directory: {root}")
+    units = []
+    for entry in sorted(os.scandir(root), key=lambda e: e.name):
+        if not entry.is_dir():
+            continue
+        if any(os.path.isfile(os.path.join(entry.path, name)) for name in CAPTURE_FILENAMES):
+            units.append(entry.path)
+    return units
+
+
+def _init_batch_worker() -> None:
+    # Each worker already owns a core; stop OpenCV from spawning its own
+    # thread pool on top of ours.
+    cv2.setNumThreads(1)
+
+
+def _calibrate_unit_row(unit_dir: str, optimize: bool = False, cache_dir: Optional[str] = None) -> Dict[str, object]:
+    """Worker entry point: never raises, so one bad unit can't sink the batch."""
+    t0 = time.perf_counter()
+    row: Dict[str, object] = {"unit": os.path.basename(os.path.normpath(unit_dir))}
+    try:
+        images = load_unit_images(unit_dir, cache_dir)
+        optics = calibrate_images(*images)
+        if optimize:
+            from optimize_optics import fit_optics
+            # Units are already spread over the pool; keep the starts in-process.
+            fit = fit_optics(images, initial=optics, workers=1)
+            # A fit pinned to its bounds keeps the heuristic optics (no rail columns).
+            row.update(optics_to_dict(optics) if fit.fallback_reason else fit.to_dict())
+            row["loss"] = fit.loss
+            row["optimizerFallback"] = fit.fallback_reason
+        else:
+            row.update(optics_to_dict(optics))
+        row["peakConfidence"] = round(peak_confidence(images[0], images[1]), 4)
+        row["error"] = ""
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["seconds"] = round(time.perf_counter() - t0, 4)
+    return row
+
+
+BATCH_COLUMNS = ["unit"] + [f.name for f in fields(OpticsResult)] + ["peakConfidence", "error", "seconds"]
+OPTIMIZE_COLUMNS = ["railInner", "railOuter", "railSigma", "loss", "optimizerFallback"]
+
+
+def run_batch(
+    root: str,
+    output: str,
+    workers: Optional[int] = None,
+    optimize: bool = False,
+    cache_dir: Optional[str] = None,
+) -> List[Dict[str, object]]:
+    """
+    Calibrate every unit folder under root in parallel.
+
+    Rows are written to output as units complete (CSV if output ends in
+    .csv, JSON Lines otherwise) and also returned, sorted by unit name.
+    With optimize=True each unit is refined by optimize_optics.fit_optics.
+    """
+    unit_dirs = find_unit_dirs(root)
+    if not unit_dirs:
+        raise FileNotFoundError(f"No unit folders with calibration images under {root}")
+
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(unit_dirs)))
+    as_csv = output.lower().endswith(".csv")
+
+    out_dir = os.path.dirname(os.path.abspath(output))
+    os.makedirs(out_dir, exist_ok=True)
+
+    rows: List[Dict[str, object]] = []
+    t0 = time.perf_counter()
+    with open(output, "w", newline="", encoding="utf-8") as f:
+        columns = BATCH_COLUMNS[:-3] + OPTIMIZE_COLUMNS + BATCH_COLUMNS[-3:] if optimize else BATCH_COLUMNS
+        writer = csv.DictWriter(f, fieldnames=columns) if as_csv else None
+        if writer:
+            writer.writeheader()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker) as pool:
+            futures = [pool.submit(_calibrate_unit_row, d, optimize, cache_dir) for d in unit_dirs]
+            for fut in as_completed(futures):
+                row = fut.result()
+                rows.append(row)
+                if writer:
+                    writer.writerow(row)
+                else:
+                    f.write(json.dumps(row) + "\n")
+                f.flush()
+                status = "FAILED " + str(row["error"]) if row["error"] else "ok"
+                print(f"[{len(rows)}/{len(unit_dirs)}] {row['unit']}: {status}", flush=True)
+
+    failed = sum(1 for r in rows if r["error"])
+    elapsed = time.perf_counter() - t0
+    print(f"\nCalibrated {len(rows) - failed}/{len(rows)} units in {elapsed:.2f}s "
+          f"with {workers} workers -> {output}")
+    rows.sort(key=lambda r: str(r["unit"]))
+    return rows
+
+
+# ---------- MAIN -------------------------------------------------------------
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Estimate K1 edge-lit optics from calibration photos.")
+    parser.add_argument("--cal-dir", default=CAL_DIR,
+                        help="Directory holding the four calibration photos (single-unit mode).")
+    parser.add_argument("--batch", metavar="ROOT",
+                        help="Root directory with one capture folder per unit; enables batch mode.")
+    parser.add_argument("--output", default="calibration_results.csv",
+                        help="Batch output file (.csv for CSV, otherwise JSON Lines).")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes for batch mode / optimizer starts (default: all cores).")
+    parser.add_argument("--optimize", action="store_true",
+                        help="Refine the heuristic result by fitting a CPU render of the shader to the photos.")
+    parser.add_argument("--starts", type=int, default=8,
+                        help="Optimizer multi-start count (single-unit mode).")
+    parser.add_argument("--stream", metavar="SOURCE",
+                        help="Calibrate from a video file or camera index instead of photos "
+                             "(see stream_calibrate.py for more options).")
+    parser.add_argument("--export-lut", metavar="PATH",
+                        help="Also write per-column falloff / per-depth spread LUT (.bin float16 or .png 16-bit).")
+    parser.add_argument("--lut-width", type=int, default=160,
+                        help="Samples per LUT row (default: one per LED).")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Decoded-image cache location (default: .cache next to this script).")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always decode the JPEGs instead of using the memory-mapped cache.")
+    args = parser.parse_args(argv)
+
+    # --stream and --batch hand off before the single-unit steps, so refuse
+    # options they would otherwise drop on the floor.
+    if args.stream is not None:
+        ignored = [flag for flag, value in (("--batch", args.batch), ("--optimize", args.optimize),
+                                            ("--export-lut", args.export_lut),
+                                            ("--cache-dir", args.cache_dir), ("--no-cache", args.no_cache))
+                   if value]
+        if ignored:
+            parser.error(f"--stream cannot be combined with {', '.join(ignored)}")
+    if args.starts < 1:
+        parser.error(f"--starts must be at least 1, got {args.starts}")
+    if args.batch and args.export_lut:
+        parser.error("--export-lut is single-unit only; it cannot be combined with --batch")
+    return args
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    cache_dir = None if args.no_cache else (args.cache_dir or DEFAULT_CACHE_DIR)
+
+    if args.stream is not None:
+        from stream_calibrate import main as stream_main
+
+        print("=== K1 Optics Calibration (stream) ===")
+        sys.exit(stream_main(["--source", args.stream]))
+
+    if args.batch:
+        print("=== K1 Optics Calibration (batch) ===")
+        print(f"Batch root: {args.batch}")
+        rows = run_batch(args.batch, args.output, workers=args.workers, optimize=args.optimize,
+                         cache_dir=cache_dir)
+        if any(r["error"] for r in rows):
+            sys.exit(1)
+        return
+
+    print("=== K1 Optics Calibration ===")
+    print(f"Calibration directory: {args.cal_dir}")
+
+    images = load_unit_images(args.cal_dir, cache_dir)
+    if cache_dir is not None:
+        cache = get_cache(cache_dir)
+        print(f"Image cache: {cache.hits} hit(s), {cache.misses} miss(es) in {cache.cache_dir}")
+    optics = calibrate_images(*images)
+    measured = optics
+
+    confidence = peak_confidence(images[0], images[1])
+    if confidence < MIN_CONFIDENCE:
+        print(f"WARNING: impulse peak confidence is low ({confidence:.2f}); check the "
+              f"top/bottom impulse photos for glare, stray light or a dim LED.")
+    optics_dict = optics_to_dict(optics)
+
+    if args.optimize:
+        from optimize_optics import fit_optics
+
+        fit = fit_optics(images, initial=optics, starts=args.starts, workers=args.workers)
+        print(f"Optimizer: loss {fit.loss:.4f} (heuristic {fit.initial_loss:.4f}) after "
+              f"{fit.starts_run} start(s) in {fit.seconds:.2f}s")
+        if fit.fallback_reason:
+            print(f"WARNING: not using the optimizer result ({fit.fallback_reason}); "
+                  f"keeping the heuristic optics.")
+        else:
+            optics_dict = fit.to_dict()
+            optics = fit.optics
+
+    if args.export_lut:
+        from optics_lut import check_lut, compute_optics_lut, write_lut
+
+        # The LUT is the per-column/per-depth version of the heuristic
+        # estimate, so it is filled from and checked against that one.
+        lut = compute_optics_lut(images[0], images[1], measured, width=args.lut_width)
+        for mismatch in check_lut(lut, measured):
+            print(f"WARNING: optics LUT disagrees with the scalar estimate ({mismatch}).")
+        size = write_lut(args.export_lut, lut)
+        print(f"Wrote {lut.shape[0]}x{lut.shape[1]} optics LUT ({size} bytes) -> {args.export_lut}")
+
+    # Print JSON block to paste into K1_HERO_PRESET.optics
     print("\nSuggested optics block for K1_HERO_PRESET (K1Engine.tsx):\n")
-    optics_dict = {
-        "topSpreadNear": optics.topSpreadNear,
-        "topSpreadFar": optics.topSpreadFar,
-        "bottomSpreadNear": optics.bottomSpreadNear,
-        "bottomSpreadFar": optics.bottomSpreadFar,
-        "topFalloff": optics.topFalloff,
-        "bottomFalloff": optics.bottomFalloff,
-        "columnBoostStrength": optics.columnBoostStrength,
-        "columnBoostExponent": optics.columnBoostExponent,
-        "edgeHotspotStrength": optics.edgeHotspotStrength,
-        "edgeHotspotWidth": optics.edgeHotspotWidth,
-    }
     print(json.dumps(optics_dict, indent=2))
     print("\nPaste this into your K1_HERO_PRESET.optics and tweak if needed.\n")
 
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+capture_sequencer.py
+
+Automatic capture sequence for the K1_Calibration firmware
+(tools/firmware/K1_Calibration): selects each CalPattern over serial, waits
+for the camera image to settle, averages a burst of frames and runs the
+calibration analysis in memory. No photos to take, rename or copy.
+
+Per pattern:
+    1. send the firmware command ('1'..'4') and wait for its "Selected: N" reply
+    2. wait until the frame visibly changes from the previous pattern
+       (skipped if it never does, e.g. the board already shows it)
+    3. wait until the frame-to-frame delta stays below --settle-delta for
+       --settle-frames consecutive frames (LED, auto-exposure and rolling
+       shutter transients die out) instead of sleeping a fixed time
+    4. average --frames frames into a StreamingCalibrator (stream_calibrate.py)
+
+Requires pyserial for a real board (pip install pyserial).
+
+Usage:
+    python capture_sequencer.py --port /dev/ttyACM0 --camera 0
+    python capture_sequencer.py --port COM5 --camera 1 --save-dir cal/
+    python capture_sequencer.py --simulate        # pty board + rendered camera
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from calibrate_optics import CAPTURE_FILENAMES, ROI, OpticsResult, optics_to_dict
+from edge_lit_render import PATTERNS, PRESETS, pattern_strips, render_frame, to_gray
+from stream_calibrate import UNCERTAIN, StreamingCalibrator, classify_frame, open_capture
+
+
+# Serial command per pattern, in CalPattern order.
+PATTERN_COMMANDS: Dict[str, bytes] = dict(zip(PATTERNS, (b"1", b"2", b"3", b"4")))
+
+BAUD_RATE = 115200
+
+# Thumbnail used for frame deltas; small enough that sensor noise averages out.
+_DELTA_SIZE = (80, 45)
+
+
+@dataclass
+class PatternCapture:
+    pattern: str
+    settle_frames: int
+    settle_seconds: float
+    classified_as: Optional[str]
+
+
+@dataclass
+class SequenceResult:
+    optics: OpticsResult
+    captures: List[PatternCapture] = field(default_factory=list)
+    seconds: float = 0.0
+
+
+# ---------- FIRMWARE LINK ----------------------------------------------------
+
+class FirmwareLink:
+    """
+    Command channel to the calibration firmware.
+
+    `port` is any pyserial-like object (write / readline / reset_input_buffer)
+    opened with a read timeout; open_serial() builds one for a device path.
+    """
+
+    def __init__(self, port, ack_timeout: float = 2.0, retries: int = 2):
+        self.port = port
+        self.ack_timeout = ack_timeout
+        self.retries = retries
+
+    def select(self, pattern: str) -> None:
+        """Select a pattern and block until the firmware acknowledges it."""
+        command = PATTERN_COMMANDS[pattern]
+        expected = f"Selected: {command.decode()}"
+        for _ in range(self.retries + 1):
+            self.port.reset_input_buffer()
+            self.port.write(command + b"\n")
+            self.port.flush()
+            deadline = time.monotonic() + self.ack_timeout
+            while time.monotonic() < deadline:
+                line = self.port.readline().decode("utf-8", errors="replace").strip()
+                if line.startswith(expected):
+                    return
+        raise RuntimeError(f"No acknowledgement from firmware for pattern {pattern!r} "
+                           f"(sent {command!r}, waited for {expected!r})")
+
+    def close(self) -> None:
+        self.port.close()
+
+
+def open_serial(device: str, baud: int = BAUD_RATE, boot_wait: float = 1.5):
+    """Open the board's serial port; waits out the reset most boards do on open."""
+    try:
+        import serial
+    except ImportError:
+        raise RuntimeError("pyserial is required for serial capture: pip install pyserial") from None
+    port = serial.Serial(device, baud, timeout=0.1)
+    time.sleep(boot_wait)
+    port.reset_input_buffer()
+    return port
+
+
+# ---------- FRAME SOURCES ----------------------------------------------------
+
+class CameraSource:
+    """cv2.VideoCapture wrapper that decodes into one reused buffer."""
+
+    def __init__(self, source):
+        self.cap = open_capture(source)
+        self._frame = None
+
+    def read(self) -> np.ndarray:
+        ok, self._frame = self.cap.read(self._frame)
+        if not ok:
+            raise RuntimeError("Camera stopped delivering frames")
+        return self._frame
+
+    def close(self) -> None:
+        self.cap.release()
+
+
+# ---------- SETTLE DETECTION -------------------------------------------------
+
+def _thumb(frame: np.ndarray) -> np.ndarray:
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    return cv2.resize(gray, _DELTA_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32) / 255.0
+
+
+def frame_delta(a: np.ndarray, b: np.ndarray) -> float:
+    """Mean absolute difference between two thumbnails, in [0, 1]."""
+    return float(cv2.norm(a, b, cv2.NORM_L1)) / a.size
+
+
+def wait_for_settle(
+    source,
+    reference: Optional[np.ndarray] = None,
+    change_delta: float = 0.01,
+    change_frames: int = 20,
+    settle_delta: float = 0.002,
+    settle_frames: int = 4,
+    max_frames: int = 600,
+) -> int:
+    """
+    Read frames until the image is stable; returns the number of frames read.
+
+    With a reference thumbnail (the last frame of the previous pattern) first
+    waits for the image to move away from it by change_delta, so camera
+    latency can't make the old pattern look "settled". If it never moves
+    within change_frames frames the pattern is assumed to be showing already.
+    """
+    n = 0
+    prev = _thumb(source.read())
+    n += 1
+    if reference is not None:
+        while frame_delta(prev, reference) < change_delta and n < change_frames:
+            prev = _thumb(source.read())
+            n += 1
+
+    stable = 0
+    while stable < settle_frames:
+        if n >= max_frames:
+            raise RuntimeError(f"Image did not settle within {max_frames} frames")
+        cur = _thumb(source.read())
+        n += 1
+        stable = stable + 1 if frame_delta(cur, prev) < settle_delta else 0
+        prev = cur
+    return n
+
+
+# ---------- SEQUENCER --------------------------------------------------------
+
+def run_sequence(
+    link: FirmwareLink,
+    source,
+    frames_per_pattern: int = 30,
+    settle_delta: float = 0.002,
+    settle_frames: int = 4,
+    save_dir: Optional[str] = None,
+    log=print,
+) -> SequenceResult:
+    """
+    Step the firmware through every pattern and calibrate from the captures.
+
+    Frames go straight into a StreamingCalibrator; nothing touches disk unless
+    save_dir is given, in which case the last frame of each burst is written
+    under the file name calibrate_optics.py expects.
+    """
+    if frames_per_pattern < 1:
+        raise ValueError(f"frames_per_pattern must be at least 1, got {frames_per_pattern}")
+    t0 = time.perf_counter()
+    calibrator = StreamingCalibrator(alpha=1.0 / frames_per_pattern, min_frames=frames_per_pattern)
+    captures = []
+    reference = _thumb(source.read())
+
+    for pattern, filename in zip(PATTERNS, CAPTURE_FILENAMES):
+        t_pattern = time.perf_counter()
+        link.select(pattern)
+        settled = wait_for_settle(source, reference, settle_delta=settle_delta, settle_frames=settle_frames)
+        settle_seconds = time.perf_counter() - t_pattern
+
+        frame = None
+        for _ in range(frames_per_pattern):
+            frame = source.read()
+            calibrator.push(frame, pattern)
+        reference = _thumb(frame)
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        h, w = gray.shape
+        seen = classify_frame(gray[int(ROI["y_min"] * h):int(ROI["y_max"] * h),
+                                   int(ROI["x_min"] * w):int(ROI["x_max"] * w)])
+        captures.append(PatternCapture(pattern, settled, settle_seconds, seen))
+        if seen == pattern:
+            note = ""
+        elif seen is None or seen == UNCERTAIN:
+            note = f"  (WARNING: frame looks {'dark' if seen is None else 'like no known pattern'})"
+        else:
+            note = f"  (WARNING: looks like {seen})"
+        log(f"[{pattern}] settled after {settled} frames ({settle_seconds:.2f}s){note}")
+
+        if save_dir:
+            os.makedirs(save_dir, exist_ok=True)
+            cv2.imwrite(os.path.join(save_dir, filename), frame)
+
+    return SequenceResult(optics=calibrator.estimate(), captures=captures,
+                          seconds=time.perf_counter() - t0)
+
+
+# ---------- SIMULATION -------------------------------------------------------
+
+class SimulatedBoard:
+    """
+    Stand-in for the calibration firmware on the master side of a pty.
+
+    Understands the same single-byte commands and prints the same
+    "Selected: N (...)" replies; the selected pattern is exposed as
+    `pattern` for SimulatedCamera.
+    """
+
+    def __init__(self):
+        import pty
+
+        self.master, self.slave = pty.openpty()
+        self.device = os.ttyname(self.slave)
+        self.pattern: Optional[str] = PATTERNS[0]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self) -> None:
+        import select
+
+        commands = {c[0]: p for p, c in PATTERN_COMMANDS.items()}
+        while not self._stop.is_set():
+            ready, _, _ = select.select([self.master], [], [], 0.05)
+            if not ready:
+                continue
+            for byte in os.read(self.master, 64):
+                if byte in commands:
+                    self.pattern = commands[byte]
+                    os.write(self.master, f"Selected: {chr(byte)} ({self.pattern})\r\n".encode())
+                elif byte in b"nN":
+                    idx = (PATTERNS.index(self.pattern) + 1) % len(PATTERNS)
+                    self.pattern = PATTERNS[idx]
+                    os.write(self.master, f"Cycled to pattern: {idx + 1}\r\n".encode())
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        os.close(self.master)
+        os.close(self.slave)
+
+
+class SimulatedCamera:
+    """
+    Renders whatever SimulatedBoard shows, with a few frames of latency, an
+    exponential exposure transition and sensor noise, at `fps` frames/second.
+    """
+
+    def __init__(self, board: SimulatedBoard, width: int = 800, height: int = 600,
+                 latency: int = 3, response: float = 0.35, noise: float = 0.03,
+                 fps: Optional[float] = None, seed: int = 0):
+        optics, settings = PRESETS["HERO_V1"]
+        # Device fills the calibration ROI, background elsewhere.
+        x0, x1 = int(ROI["x_min"] * width), int(ROI["x_max"] * width)
+        y0, y1 = int(ROI["y_min"] * height), int(ROI["y_max"] * height)
+        self._images = {}
+        for pattern in PATTERNS:
+            bottom, top = pattern_strips(pattern)
+            plate = to_gray(render_frame(bottom, top, optics, settings, width=x1 - x0, height=y1 - y0))
+            img = np.zeros((height, width), dtype=np.float32)
+            img[y0:y1, x0:x1] = plate / max(float(plate.max()), 1e-6)
+            self._images[pattern] = img
+        self.board = board
+        self.latency = latency
+        self.response = response
+        self.noise = noise
+        self.period = 1.0 / fps if fps else 0.0
+        self._rng = np.random.default_rng(seed)
+        self._history: List[Optional[str]] = []
+        self._state = self._images[board.pattern].copy()
+        self._out = np.empty((height, width), dtype=np.uint8)
+        self._next = time.perf_counter()
+
+    def read(self) -> np.ndarray:
+        if self.period:
+            delay = self._next - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self._next = max(self._next, time.perf_counter()) + self.period
+        self._history.append(self.board.pattern)
+        shown = self._history[max(0, len(self._history) - 1 - self.latency)]
+        self._state += self.response * (self._images[shown] - self._state)
+        noisy = self._state + self._rng.normal(0.0, self.noise, self._state.shape).astype(np.float32)
+        np.clip(noisy * 255.0, 0, 255, out=noisy)
+        self._out[...] = noisy
+        return self._out
+
+    def close(self) -> None:
+        pass
+
+
+# ---------- MAIN -------------------------------------------------------------
+
+def positive_int(text: str) -> int:
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Not an integer: {text!r}")
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"Must be at least 1, got {value}")
+    return value
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Drive the K1 calibration firmware and calibrate from a camera.")
+    parser.add_argument("--port", help="Serial device of the board (e.g. /dev/ttyACM0, COM5).")
+    parser.add_argument("--camera", default="0", help="Camera index or video device path.")
+    parser.add_argument("--simulate", action="store_true",
+                        help="Use a pseudo-terminal board and a rendered camera instead of hardware.")
+    parser.add_argument("--frames", type=positive_int, default=30, help="Frames averaged per pattern.")
+    parser.add_argument("--settle-delta", type=float, default=0.002,
+                        help="Mean frame-to-frame change (0-1) below which the image counts as still.")
+    parser.add_argument("--settle-frames", type=int, default=4,
+                        help="Consecutive still frames required before capturing.")
+    parser.add_argument("--save-dir", help="Also write the captures here under calibrate_optics.py's file names.")
+    parser.add_argument("--output", help="Write the optics JSON to this file as well.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if not args.simulate and not args.port:
+        print("Either --port or --simulate is required.", file=sys.stderr)
+        return 2
+
+    board = None
+    if args.simulate:
+        board = SimulatedBoard()
+        port = open_serial(board.device, boot_wait=0.0)
+        source = SimulatedCamera(board, fps=60.0)
+    else:
+        port = open_serial(args.port)
+        source = CameraSource(args.camera)
+
+    link = FirmwareLink(port)
+    try:
+        print("=== K1 Optics Calibration (capture sequence) ===")
+        result = run_sequence(
+            link,
+            source,
+            frames_per_pattern=args.frames,
+            settle_delta=args.settle_delta,
+            settle_frames=args.settle_frames,
+            save_dir=args.save_dir,
+        )
+    finally:
+        link.close()
+        source.close()
+        if board is not None:
+            board.close()
+
+    optics_dict = optics_to_dict(result.optics)
+    print(f"\nCaptured {len(result.captures)} patterns in {result.seconds:.2f}s")
+    print("\nSuggested optics block for K1_HERO_PRESET (K1Engine.tsx):\n")
+    print(json.dumps(optics_dict, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(optics_dict, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+edge_lit_render.py
+
+NumPy reference renderer for the K1 edge-lit shader.
+
+Mirrors the GLSL in apps/web-main/app/k1/core/optics/edgeLitShader.ts
+(PHYSICAL and HERO/EXPERIMENTAL branches) and the 15-tap `sampleStrip`
+Gaussian from apps/web-main/app/engine/shaders/common.ts, so calibration
+photos can be compared against the model without a browser.
+
+Why it is fast:
+    - sampleStrip only depends on y (through the spread) and on which LED
+      texels the 15 taps land on, so the blur is a (H, 15) x (15, U, 3)
+      tensordot over the U unique tap patterns (U <= 160 for the usual
+      uResolution == LED count), not a per-pixel loop.
+    - Everything except the HERO edge hotspot is a function of (row, LED
+      column) and is composed at that size, then gathered out to the full
+      width once.
+
+Conventions:
+    - Strips are (160, 3) or (160, 4) float arrays, index 0 at the left,
+      exactly as uploaded to uLedStateBottom / uLedStateTop.
+    - The returned frame is (height, width, 3) float32 in image order
+      (row 0 at the top), un-clamped like the shader's HDR output.
+
+Usage:
+    python edge_lit_render.py --preset HERO_V1 --pattern collision --out frame.png
+"""
+
+import argparse
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from calibrate_optics import OpticsResult
+
+
+LED_COUNT = 160
+
+# sampleStrip: for (i = -7; i <= 7; i++)
+SAMPLE_TAPS = 7
+
+# uOpticsMode values
+OPTICS_MODES = {"PHYSICAL": 0.0, "HERO": 1.0, "EXPERIMENTAL": 2.0}
+
+# Calibration patterns, matching CalPattern in K1_Calibration.ino.
+PATTERNS = ("top_impulse", "bottom_impulse", "collision", "edges_only")
+
+
+@dataclass
+class RenderSettings:
+    """Non-calibrated shader uniforms (names follow the TS presets)."""
+    opticsMode: str = "HERO"
+    exposure: float = 4.0
+    baseLevel: float = 0.0
+    tint: Tuple[float, float, float] = (1.0, 1.0, 1.0)
+    railInner: float = 0.2
+    railOuter: float = 0.45
+    railSigma: float = 1.0
+
+
+@dataclass
+class _Optics:
+    """Stand-in with OpticsResult's fields, used for the built-in presets."""
+    topSpreadNear: float
+    topSpreadFar: float
+    bottomSpreadNear: float
+    bottomSpreadFar: float
+    topFalloff: float
+    bottomFalloff: float
+    columnBoostStrength: float
+    columnBoostExponent: float
+    edgeHotspotStrength: float
+    edgeHotspotWidth: float
+
+
+# Copies of apps/web-main/app/k1/core/optics/presets.ts (tint in linear RGB).
+PRESETS: Dict[str, Tuple[_Optics, RenderSettings]] = {
+    "PHYSICAL_V1": (
+        _Optics(0.015, 0.015, 0.015, 0.015, 1.5, 1.5, 0.0, 1.0, 0.0, 0.02),
+        RenderSettings("PHYSICAL", 4.0, 0.0, (1.0, 1.0, 1.0), 0.0, 0.0, 1.0),
+    ),
+    "HERO_V1": (
+        _Optics(0.0706, 0.0539, 0.0706, 0.0539, 2.61, 2.61, 0.0, 1.2, 5.0, 0.1),
+        RenderSettings("HERO", 4.0, 0.0, (1.0, 1.0, 1.0), 0.2, 0.45, 1.0),
+    ),
+    "HERO_V2": (
+        _Optics(0.012, 0.02, 0.012, 0.02, 1.6, 1.6, 0.4, 1.8, 0.3, 0.06),
+        RenderSettings("HERO", 1.3, 0.06, (1.0, 0.133, 0.791), 0.35, 0.7, 0.18),
+    ),
+}
+
+
+# ---------- GLSL HELPERS -------------------------------------------------------
+
+def smoothstep(edge0: float, edge1: float, x: np.ndarray) -> np.ndarray:
+    # GLSL definition; also used with edge0 > edge1 by the shader.
+    t = np.clip((x - edge0) / (edge1 - edge0), 0.0, 1.0)
+    return t * t * (3.0 - 2.0 * t)
+
+
+def pixel_uv(width: int, height: int) -> Tuple[np.ndarray, np.ndarray]:
+    """vUv at pixel centres; y is GL-style (0 at the bottom of the frame)."""
+    x = (np.arange(width, dtype=np.float32) + 0.5) / width
+    y = (np.arange(height, dtype=np.float32) + 0.5) / height
+    return x, y
+
+
+def _as_rgb(strip: np.ndarray) -> np.ndarray:
+    strip = np.asarray(strip, dtype=np.float32)
+    if strip.ndim != 2 or strip.shape[1] < 3:
+        raise ValueError(f"Expected a (leds, 3|4) strip buffer, got shape {strip.shape}")
+    return strip[:, :3]
+
+
+def tap_indices(x: np.ndarray, led_count: int, resolution: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Texel index hit by each sampleStrip tap, deduplicated across columns.
+
+    Returns (unique (U, 15) index patterns, (W,) inverse map into them).
+    """
+    offsets = np.arange(-SAMPLE_TAPS, SAMPLE_TAPS + 1, dtype=np.float32) / resolution
+    u = np.clip(x[:, None] + offsets[None, :], 0.0, 1.0)
+    # NearestFilter with clamp-to-edge
+    idx = np.minimum((u * led_count).astype(np.int32), led_count - 1)
+    unique, inverse = np.unique(idx, axis=0, return_inverse=True)
+    return unique, inverse.reshape(-1)
+
+
+@lru_cache(maxsize=32)
+def _frame_taps(width: int, led_count: int, resolution: float) -> Tuple[np.ndarray, np.ndarray]:
+    # Tap layout only depends on the frame width, so repeated renders at the
+    # same size (fitting loops, video frames) skip the np.unique.
+    x, _ = pixel_uv(width, 1)
+    taps, inverse = tap_indices(x, led_count, resolution)
+    taps.setflags(write=False)
+    inverse.setflags(write=False)
+    return taps, inverse
+
+
+def tap_weights(spread: np.ndarray, resolution: float) -> np.ndarray:
+    """Normalised sampleStrip weights, shape (len(spread), 15)."""
+    offsets = np.arange(-SAMPLE_TAPS, SAMPLE_TAPS + 1, dtype=np.float32) / resolution
+    sigma = np.maximum(np.asarray(spread, dtype=np.float32), 1e-12)[:, None]
+    w = np.exp(-(offsets[None, :] ** 2) / (2.0 * sigma * sigma))
+    return w / np.maximum(w.sum(axis=1, keepdims=True), 1e-5)
+
+
+def sample_strip(strip: np.ndarray, taps: np.ndarray, spread: np.ndarray, resolution: float) -> np.ndarray:
+    """sampleStrip for every (row, unique tap pattern): returns (H, U, 3)."""
+    rgb = _as_rgb(strip)
+    weights = tap_weights(spread, resolution)            # (H, 15)
+    texels = rgb[taps].transpose(1, 0, 2)                # (15, U, 3)
+    return np.tensordot(weights, texels, axes=(1, 0))
+
+
+# ---------- RENDERER -----------------------------------------------------------
+
+def render_frame(
+    bottom: np.ndarray,
+    top: np.ndarray,
+    optics: "OpticsResult",
+    settings: RenderSettings = RenderSettings(),
+    width: int = 1920,
+    height: int = 1080,
+    resolution: float = None,
+    rows: Tuple[int, int] = None,
+) -> np.ndarray:
+    """
+    Render one frame of the edge-lit shader.
+
+    `optics` is anything with OpticsResult's ten fields. `resolution` is
+    uResolution and defaults to the strip length, as in K1CoreScene.
+    `rows` = (start, stop) renders only that band of image rows, for
+    splitting a frame into tiles.
+    """
+    if settings.opticsMode not in OPTICS_MODES:
+        raise ValueError(f"Unknown opticsMode {settings.opticsMode!r}; expected one of {list(OPTICS_MODES)}")
+    led_count = _as_rgb(bottom).shape[0]
+    if _as_rgb(top).shape[0] != led_count:
+        raise ValueError("Top and bottom strips must have the same LED count")
+    resolution = float(resolution or led_count)
+
+    x, y = pixel_uv(width, height)
+    # Work in image row order (top row first) so no flip is needed at the end.
+    y = y[::-1].copy()
+    if rows is not None:
+        y = y[rows[0]:rows[1]]
+    taps, inverse = _frame_taps(width, led_count, resolution)
+    yc = y[:, None, None]
+
+    bottom_influence = np.power(1.0 - yc, optics.bottomFalloff)
+    top_influence = np.power(yc, optics.topFalloff)
+    scale = settings.exposure * np.asarray(settings.tint, dtype=np.float32)
+
+    # Everything below is computed at (H, U, 3) and gathered out to (H, W, 3)
+    # once; only the HERO edge hotspot needs the exact x.
+    if settings.opticsMode == "PHYSICAL":
+        bottom_spread = optics.bottomSpreadNear * (0.2 + y * 3.0)
+        top_spread = optics.topSpreadNear * (0.2 + (1.0 - y) * 3.0)
+        color_bottom = sample_strip(bottom, taps, bottom_spread, resolution)
+        color_top = sample_strip(top, taps, top_spread, resolution)
+
+        final = color_bottom * bottom_influence + color_top * top_influence
+
+        bottom_hotspot = smoothstep(0.02, 0.0, yc)
+        top_hotspot = smoothstep(0.98, 1.0, yc)
+        total_hotspot = (bottom_hotspot * np.linalg.norm(color_bottom, axis=2, keepdims=True) +
+                         top_hotspot * np.linalg.norm(color_top, axis=2, keepdims=True))
+
+        small = (final + settings.baseLevel) * settings.exposure + total_hotspot * 4.0
+        small *= np.asarray(settings.tint, dtype=np.float32)
+        return _gather_columns(small, inverse)
+
+    top_spread = optics.topSpreadNear + (optics.topSpreadFar - optics.topSpreadNear) * (1.0 - y)
+    bottom_spread = optics.bottomSpreadNear + (optics.bottomSpreadFar - optics.bottomSpreadNear) * y
+    color_bottom = sample_strip(bottom, taps, bottom_spread, resolution)
+    color_top = sample_strip(top, taps, top_spread, resolution)
+
+    interaction = color_bottom * color_top
+    boosted = np.power(interaction, optics.columnBoostExponent) * optics.columnBoostStrength
+    mid_plate_mask = 4.0 * yc * (1.0 - yc)
+
+    small = color_bottom * bottom_influence + color_top * top_influence + boosted * mid_plate_mask
+    small = (small + settings.baseLevel) * scale
+    frame = _gather_columns(small, inverse)
+
+    # Edge hotspots: separable rail(y) x edge(x) mask, non-zero only within
+    # edgeHotspotWidth of the left/right borders, so only those columns are touched.
+    dist_x = np.minimum(x, 1.0 - x)
+    edge_x = smoothstep(optics.edgeHotspotWidth, 0.0, dist_x)
+    cols = np.flatnonzero(edge_x)
+    if optics.edgeHotspotStrength != 0.0 and cols.size:
+        y_sym = np.abs(y - 0.5)
+        sigma_y = max(settings.railSigma, 1e-4)
+        inner = np.exp(-((y_sym - settings.railInner) / sigma_y) ** 2)
+        outer = np.exp(-((y_sym - settings.railOuter) / sigma_y) ** 2)
+        rail_y = np.maximum(inner, outer)
+        hotspot = (color_bottom + color_top) * scale
+        # The non-zero columns form one run at each border; use slices so the
+        # update is in place on views of the frame.
+        for run in (cols[cols < width // 2], cols[cols >= width // 2]):
+            if not run.size:
+                continue
+            sl = slice(int(run[0]), int(run[-1]) + 1)
+            block = _gather_columns(hotspot, inverse[sl])
+            block *= (rail_y[:, None] * (edge_x[sl] * optics.edgeHotspotStrength)[None, :])[..., None]
+            frame[:, sl] += block
+
+    return frame
+
+
+def _gather_columns(small: np.ndarray, inverse: np.ndarray) -> np.ndarray:
+    small = small.astype(np.float32, copy=False)
+    # Tap patterns are sorted and monotone in x, so each unique pattern covers
+    # one contiguous run of columns and a repeat is enough (about twice as
+    # fast as a fancy-index gather).
+    if np.all(np.diff(inverse) >= 0):
+        return np.repeat(small, np.bincount(inverse, minlength=small.shape[1]), axis=1)
+    return small[:, inverse]
+
+
+def to_gray(frame: np.ndarray) -> np.ndarray:
+    """Luma with OpenCV's RGB->GRAY weights, for comparison with load_gray()."""
+    return frame @ np.asarray([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def to_uint8(frame: np.ndarray) -> np.ndarray:
+    return (np.clip(frame, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+
+
+def pattern_strips(pattern: str, led_count: int = LED_COUNT) -> Tuple[np.ndarray, np.ndarray]:
+    """(bottom, top) RGBA buffers for a calibration pattern, as lit by the firmware."""
+    if pattern not in PATTERNS:
+        raise ValueError(f"Unknown pattern {pattern!r}; expected one of {PATTERNS}")
+    bottom = np.zeros((led_count, 4), dtype=np.float32)
+    top = np.zeros((led_count, 4), dtype=np.float32)
+    centre = led_count // 2
+    if pattern in ("top_impulse", "collision"):
+        top[centre] = 1.0
+    if pattern in ("bottom_impulse", "collision"):
+        bottom[centre] = 1.0
+    if pattern == "edges_only":
+        for strip in (bottom, top):
+            strip[[0, led_count - 1]] = 1.0
+    return bottom, top
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the K1 edge-lit shader on the CPU.")
+    parser.add_argument("--preset", default="HERO_V1", choices=sorted(PRESETS))
+    parser.add_argument("--mode", choices=sorted(OPTICS_MODES), help="Override the preset's optics mode.")
+    parser.add_argument("--pattern", default="collision", choices=PATTERNS)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--out", default="edge_lit_render.png")
+    args = parser.parse_args()
+
+    import time
+    import cv2
+
+    optics, settings = PRESETS[args.preset]
+    if args.mode:
+        settings = replace(settings, opticsMode=args.mode)
+    bottom, top = pattern_strips(args.pattern)
+
+    t0 = time.perf_counter()
+    frame = render_frame(bottom, top, optics, settings, args.width, args.height)
+    elapsed = time.perf_counter() - t0
+
+    cv2.imwrite(args.out, cv2.cvtColor(to_uint8(frame), cv2.COLOR_RGB2BGR))
+    print(f"Rendered {args.width}x{args.height} {settings.opticsMode} frame in {elapsed * 1000:.1f} ms -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+image_cache.py
+
+On-disk cache of decoded calibration frames for calibrate_optics.py.
+
+Decoding a large JPEG and converting it to float32 dominates a calibration
+run once the fitting itself is vectorized, and the same four photos are
+decoded again every time a parameter is tweaked. This module stores, per
+photo and ROI, the cropped float32 grayscale frame plus a 2x/4x/8x
+area-averaged pyramid as .npy files and reads them back with
+np.load(mmap_mode="r"), so a warm run touches only the pages it actually
+reads and coarse-to-fine fitting can start at low resolution.
+
+Layout (flat, one file per level):
+    <cache_dir>/<content hash>_<roi hash>_L0.npy   full resolution ROI
+    <cache_dir>/<content hash>_<roi hash>_L1.npy   1/2
+    <cache_dir>/<content hash>_<roi hash>_L2.npy   1/4
+    <cache_dir>/<content hash>_<roi hash>_L3.npy   1/8
+
+Entries are keyed by the file's content hash (not its path or mtime) and by
+the ROI, so renamed/copied captures still hit and a changed ROI misses. A
+hit refreshes the entry's mtime; once the cache grows past max_bytes the
+least recently used entries are deleted, all levels together. Eviction
+only ever touches files named like the above (and this module's own stale
+temp files), never subfolders, so pointing --cache-dir at a folder holding
+other data is safe. Arrays are returned read-only.
+"""
+
+import hashlib
+import os
+import re
+import time
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+
+# A 24 MP capture's default ROI is ~60 MB with its pyramid, so ~16 units.
+DEFAULT_MAX_BYTES = 1 << 30
+
+PYRAMID_LEVELS = 4  # full, 1/2, 1/4, 1/8
+
+_HASH_CHUNK = 1 << 20
+
+# Only files matching these are ever read or deleted by eviction.
+_ENTRY_RE = re.compile(r"^([0-9a-f]{32}_[0-9a-f]{16})_L[0-9]\.npy$")
+_TMP_RE = re.compile(r"^[0-9a-f]{32}_[0-9a-f]{16}_L[0-9]\.npy\.tmp\.[0-9]+\.npy$")
+
+# Temp files older than this belong to a writer that died mid-save.
+_STALE_TMP_SECONDS = 3600
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def roi_key(roi: Dict[str, float]) -> str:
+    text = ",".join(f"{roi[k]:.6f}" for k in ("x_min", "x_max", "y_min", "y_max"))
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+def build_pyramid(img: np.ndarray, levels: int = PYRAMID_LEVELS) -> List[np.ndarray]:
+    """[img, img/2, img/4, ...] by 2x2 area averaging."""
+    pyramid = [np.ascontiguousarray(img, dtype=np.float32)]
+    for _ in range(1, levels):
+        h, w = pyramid[-1].shape
+        size = (max(1, w // 2), max(1, h // 2))
+        pyramid.append(cv2.resize(pyramid[-1], size, interpolation=cv2.INTER_AREA))
+    return pyramid
+
+
+def _save_atomic(path: str, arr: np.ndarray) -> None:
+    tmp = f"{path}.tmp.{os.getpid()}.npy"
+    np.save(tmp, arr)
+    os.replace(tmp, path)
+
+
+class ImageCache:
+    """ROI-cropped grayscale pyramid cache, see module docstring."""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _entry_paths(self, digest: str, key: str) -> List[str]:
+        return [os.path.join(self.cache_dir, f"{digest}_{key}_L{level}.npy") for level in range(PYRAMID_LEVELS)]
+
+    def load_pyramid(self, path: str, roi: Dict[str, float]) -> List[np.ndarray]:
+        """Return the memory-mapped pyramid for path and roi, building it on a miss."""
+        # Imported here: calibrate_optics imports this module.
+        from calibrate_optics import crop_roi, load_gray
+
+        paths = self._entry_paths(file_digest(path), roi_key(roi))
+        if all(os.path.exists(p) for p in paths):
+            try:
+                pyramid = [np.load(p, mmap_mode="r") for p in paths]
+                self.hits += 1
+                for p in paths:
+                    os.utime(p)
+                return pyramid
+            except (OSError, ValueError):
+                pass  # Corrupt or concurrently evicted entry: rebuild below.
+
+        self.misses += 1
+        pyramid = build_pyramid(crop_roi(load_gray(path), roi))
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for level_path, arr in zip(paths, pyramid):
+            _save_atomic(level_path, arr)
+        self.evict(keep=os.path.basename(paths[0]).rsplit("_L", 1)[0])
+        return [np.load(p, mmap_mode="r") for p in paths]
+
+    def load(self, path: str, roi: Dict[str, float], level: int = 0) -> np.ndarray:
+        """Cropped grayscale frame at a pyramid level (0 = full resolution)."""
+        if not 0 <= level < PYRAMID_LEVELS:
+            raise ValueError(f"Pyramid level must be in [0, {PYRAMID_LEVELS - 1}], got {level}")
+        return self.load_pyramid(path, roi)[level]
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """
+        Delete least recently used entries until under max_bytes; returns bytes freed.
+
+        keep is an entry key (<content hash>_<roi hash>) that is never deleted.
+        Files that don't match the cache's own naming are left alone.
+        """
+        entries: Dict[str, List] = {}  # key -> [mtime, size, paths]
+        now = time.time()
+        with os.scandir(self.cache_dir) as it:
+            for e in it:
+                try:
+                    if not e.is_file(follow_symlinks=False):
+                        continue
+                    st = e.stat(follow_symlinks=False)
+                except OSError:
+                    continue  # Removed by a concurrent evict.
+                if _TMP_RE.match(e.name):
+                    if now - st.st_mtime > _STALE_TMP_SECONDS:
+                        try:
+                            os.remove(e.path)
+                        except OSError:
+                            pass
+                    continue
+                m = _ENTRY_RE.match(e.name)
+                if m is None:
+                    continue
+                entry = entries.setdefault(m.group(1), [0.0, 0, []])
+                entry[0] = max(entry[0], st.st_mtime)
+                entry[1] += st.st_size
+                entry[2].append(e.path)
+
+        total = sum(size for _, size, _ in entries.values())
+        freed = 0
+        for key, (_, size, paths) in sorted(entries.items(), key=lambda kv: kv[1][0]):
+            if total - freed <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            for p in paths:
+                try:
+                    os.remove(p)  # Open memory maps elsewhere stay valid.
+                except OSError:
+                    pass
+            freed += size
+        return freed
+
+
+_caches: Dict[str, ImageCache] = {}
+
+
+def get_cache(cache_dir: Optional[str] = None) -> ImageCache:
+    """Process-wide ImageCache for cache_dir (default DEFAULT_CACHE_DIR), so hit/miss counts accumulate."""
+    key = os.path.abspath(cache_dir or DEFAULT_CACHE_DIR)
+    if key not in _caches:
+        _caches[key] = ImageCache(key)
+    return _caches[key]
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+optics_lut.py
+
+Spatially resolved optics maps exported as a small lookup texture for the
+web engine.
+
+calibrate_optics.py boils each impulse photo down to a handful of scalars;
+the real plate's falloff varies across x and its spread varies with depth.
+This module fits every column and every row of the top/bottom impulse photos
+in one vectorized pass (profile_fit.py) and maps them into the same shader
+units as map_optics:
+
+    row 0  topFalloff      per column across the plate  (x = 0..1)
+    row 1  bottomFalloff   per column across the plate  (x = 0..1)
+    row 2  topSpread       per depth from the top edge  (0 = edge, 1 = far side)
+    row 3  bottomSpread    per depth from the bottom edge
+
+Each row has `width` samples (160 by default, one per LED). In
+edgeLitShader.ts terms, falloff replaces uTopFalloff / uBottomFalloff sampled
+at vUv.x, and spread replaces mix(uTopSpreadNear, uTopSpreadFar, 1.0 - vUv.y)
+sampled at 1.0 - vUv.y (top) / vUv.y (bottom).
+
+Every column and row goes through the same estimator as the scalar fit
+(closed form plus the REFINE_RMS Levenberg-Marquardt pass). Columns or rows
+whose fit fails are filled by linear interpolation from their neighbours;
+falloff columns outside the lit span, and whole curves that failed, take the
+scalar estimate. check_lut reports rows that disagree with the scalars.
+
+File formats (pick by extension):
+
+    .bin   12-byte little-endian header  "K1LT" | u16 version | u16 width |
+           u16 rows | u16 reserved, then rows x width float16 in row order.
+           Load as a THREE.DataTexture (RedFormat, HalfFloatType).
+
+    .png   16-bit grayscale, rows x width; row r is
+           LUT_RANGES[r][0] + v / 65535 * (LUT_RANGES[r][1] - LUT_RANGES[r][0]).
+"""
+
+import os
+import struct
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from calibrate_optics import (
+    EPS,
+    FALLOFF_RANGE,
+    SPREAD_FAR_DEPTH,
+    SPREAD_NEAR_DEPTH,
+    SPREAD_RANGE,
+    SPREAD_SCALE,
+    OpticsResult,
+)
+from profile_fit import REFINE_RMS, fit_column_decay, fit_row_gaussians
+
+
+LUT_WIDTH = 160
+
+LUT_ROWS = ("topFalloff", "bottomFalloff", "topSpread", "bottomSpread")
+
+# Columns with less brightness range than this fraction of the best column
+# are treated as unlit in falloff_curve.
+MIN_COLUMN_SIGNAL = 0.25
+
+# Columns whose falloff fit is looser than this (k_err / k) are treated as
+# unmeasured in falloff_curve.
+MAX_FALLOFF_REL_ERR = 0.25
+
+# check_lut: allowed relative deviation of a LUT row from the scalar estimate.
+LUT_TOLERANCE = 0.15
+
+# Value range per row, used for the 16-bit PNG encoding.
+LUT_RANGES = (FALLOFF_RANGE, FALLOFF_RANGE, SPREAD_RANGE, SPREAD_RANGE)
+
+LUT_MAGIC = b"K1LT"
+LUT_VERSION = 1
+_HEADER = struct.Struct("<4sHHHH")
+
+
+# ---------- MAPS --------------------------------------------------------------
+
+def _fill_invalid(values: np.ndarray, fallback: float, outside: Optional[float] = None) -> np.ndarray:
+    """
+    Linearly interpolate NaNs from valid neighbours; all-NaN -> fallback.
+
+    NaNs before the first / after the last valid value repeat it, or take
+    `outside` if given.
+    """
+    valid = np.isfinite(values)
+    if not valid.any():
+        return np.full_like(values, fallback)
+    idx = np.arange(values.size)
+    return np.interp(idx, idx[valid], values[valid], left=outside, right=outside)
+
+
+def _resample(values: np.ndarray, width: int) -> np.ndarray:
+    src = np.linspace(0.0, 1.0, values.size)
+    return np.interp(np.linspace(0.0, 1.0, width), src, values)
+
+
+def falloff_curve(
+    img: np.ndarray,
+    from_top: bool,
+    fallback: float,
+    width: int = LUT_WIDTH,
+    min_signal: float = MIN_COLUMN_SIGNAL,
+) -> np.ndarray:
+    """
+    Per-column falloff across the plate, `width` samples, shader units.
+
+    Columns whose brightness range is below min_signal of the brightest
+    column's carry no measurable light, and columns whose fit is not a clean
+    decay (k <= 0 or k_err above MAX_FALLOFF_REL_ERR of k) measure the cone's
+    flank rather than the plate. Gaps between measured columns are
+    interpolated; columns outside the measured span take `fallback`.
+    """
+    # Area-average down to one column per LED first: less noise, fewer fits.
+    h = img.shape[0]
+    cols = cv2.resize(np.asarray(img, dtype=np.float32), (width, h), interpolation=cv2.INTER_AREA)
+    signal = cols.max(axis=0) - cols.min(axis=0)
+    lit = signal >= min_signal * max(float(signal.max()), EPS)
+    fit = fit_column_decay(cols, from_top=from_top, refine_rms=REFINE_RMS)
+    measured = lit & fit.valid & (fit.k > 0.0) & (fit.k_err <= MAX_FALLOFF_REL_ERR * fit.k)
+    k = np.where(measured, fit.k, np.nan)
+    return np.clip(_fill_invalid(k, fallback, outside=fallback), *FALLOFF_RANGE)
+
+
+def spread_curve(img: np.ndarray, strip: str, fallback: Tuple[float, float], width: int = LUT_WIDTH) -> np.ndarray:
+    """
+    Per-depth spread from the lit edge of `strip` ("top"/"bottom"), shader units.
+
+    The sigma -> spread factor is interpolated between the near and far
+    factors of map_optics by depth, so the LUT agrees with the scalar
+    estimate at the two depths that one samples.
+    """
+    # Rows: one per output sample. Columns: enough resolution for narrow spreads.
+    h, w = img.shape
+    small = cv2.resize(np.asarray(img, dtype=np.float32), (min(w, 4 * width), min(h, width)),
+                       interpolation=cv2.INTER_AREA)
+    sigma = fit_row_gaussians(small, refine_rms=REFINE_RMS).sigma
+    if strip == "bottom":
+        sigma = sigma[::-1]
+    depth = np.linspace(0.0, 1.0, sigma.size)
+    near_scale, far_scale = SPREAD_SCALE[strip]
+    t = np.clip((depth - SPREAD_NEAR_DEPTH) / (SPREAD_FAR_DEPTH - SPREAD_NEAR_DEPTH), 0.0, 1.0)
+    spread = sigma * (near_scale + (far_scale - near_scale) * t)
+
+    valid = np.isfinite(spread) & (spread > 0.0)
+    if valid.any():
+        spread = _fill_invalid(np.where(valid, spread, np.nan), fallback[0])
+    else:
+        # No usable rows: fall back to the scalar near/far pair, linear in depth.
+        spread = fallback[0] + (fallback[1] - fallback[0]) * depth
+    return np.clip(_resample(spread, width), *SPREAD_RANGE)
+
+
+def compute_optics_lut(
+    top_img: np.ndarray,
+    bottom_img: np.ndarray,
+    optics: OpticsResult,
+    width: int = LUT_WIDTH,
+) -> np.ndarray:
+    """(len(LUT_ROWS), width) float32 LUT from ROI-cropped impulse photos."""
+    return np.stack([
+        falloff_curve(top_img, True, optics.topFalloff, width),
+        falloff_curve(bottom_img, False, optics.bottomFalloff, width),
+        spread_curve(top_img, "top", (optics.topSpreadNear, optics.topSpreadFar), width),
+        spread_curve(bottom_img, "bottom", (optics.bottomSpreadNear, optics.bottomSpreadFar), width),
+    ]).astype(np.float32)
+
+
+def check_lut(lut: np.ndarray, optics: OpticsResult, tolerance: float = LUT_TOLERANCE) -> List[str]:
+    """
+    Rows of `lut` that disagree with the scalar estimate `optics` (same
+    estimator, so they should match), as human-readable messages.
+
+    Falloff rows are compared by their mean, spread rows at the near and
+    far depths that map_optics samples.
+    """
+    width = lut.shape[1]
+    expected = [
+        ("topFalloff", float(lut[0].mean()), optics.topFalloff),
+        ("bottomFalloff", float(lut[1].mean()), optics.bottomFalloff),
+    ]
+    for row, strip in ((2, "top"), (3, "bottom")):
+        for depth, label in ((SPREAD_NEAR_DEPTH, "Near"), (SPREAD_FAR_DEPTH, "Far")):
+            name = f"{strip}Spread{label}"
+            value = float(np.interp(depth, np.linspace(0.0, 1.0, width), lut[row]))
+            expected.append((name, value, getattr(optics, name)))
+    return [
+        f"{name}: LUT {value:.4g} vs scalar {scalar:.4g}"
+        for name, value, scalar in expected
+        if abs(value - scalar) > tolerance * max(abs(scalar), EPS)
+    ]
+
+
+# ---------- FILE I/O ------------------------------------------------------------
+
+def _png_scale(rows: int) -> Tuple[np.ndarray, np.ndarray]:
+    lo = np.array([r[0] for r in LUT_RANGES[:rows]], dtype=np.float64)[:, None]
+    hi = np.array([r[1] for r in LUT_RANGES[:rows]], dtype=np.float64)[:, None]
+    return lo, hi - lo
+
+
+def write_lut(path: str, lut: np.ndarray) -> int:
+    """Write a LUT as .bin (float16) or .png (16-bit); returns the file size."""
+    rows, width = lut.shape
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".png":
+        lo, span = _png_scale(rows)
+        encoded = np.round(np.clip((lut - lo) / span, 0.0, 1.0) * 65535.0).astype(np.uint16)
+        if not cv2.imwrite(path, encoded):
+            raise RuntimeError(f"Failed to write LUT PNG to {path}")
+    elif ext == ".bin":
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(LUT_MAGIC, LUT_VERSION, width, rows, 0))
+            f.write(lut.astype("<f2").tobytes())
+    else:
+        raise ValueError(f"Unsupported LUT extension {ext!r}; use .bin or .png")
+    return os.path.getsize(path)
+
+
+def read_lut(path: str) -> np.ndarray:
+    """Read a LUT written by write_lut back as float32 (rows, width)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".png":
+        encoded = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if encoded is None or encoded.dtype != np.uint16:
+            raise RuntimeError(f"Not a 16-bit LUT PNG: {path}")
+        lo, span = _png_scale(encoded.shape[0])
+        return (lo + encoded / 65535.0 * span).astype(np.float32)
+    with open(path, "rb") as f:
+        magic, version, width, rows, _ = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != LUT_MAGIC or version != LUT_VERSION:
+            raise RuntimeError(f"Not a K1 optics LUT (v{LUT_VERSION}): {path}")
+        data = np.frombuffer(f.read(rows * width * 2), dtype="<f2")
+    return data.reshape(rows, width).astype(np.float32)
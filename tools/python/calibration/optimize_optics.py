@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+optimize_optics.py
+
+Closed-loop optics fit: instead of mapping fitted sigmas/k values through the
+hand-tuned factors in map_optics, search the shader parameters directly so a
+CPU render of the edge-lit model (edge_lit_render.py, HERO branch) matches the
+four calibration photos.
+
+Parameters fitted jointly (13):
+    the ten OpticsResult fields + railInner, railOuter, railSigma
+
+Objective:
+    Each photo is cut down to its plate band (plate.plate_rows;
+    wide shots also hold the stand, the desk and whatever is behind the bar,
+    which the render doesn't model and which would otherwise dominate the
+    residual) and downscaled to `fit_width` columns. For every pattern the
+    render is matched to the photo with a closed-form gain + offset (so camera
+    exposure and black level don't need to be known), and the residual is
+    normalised by the photo's variance so all four images weigh the same.
+
+Search:
+    Multi-start bounded L-BFGS-B in a [0, 1]-normalised parameter space. The
+    first start is the heuristic map_optics answer, the rest are a seeded Latin
+    hypercube over the bounds. Starts run on a process pool; as soon as
+    `converge_hits` starts land within `converge_rtol` of the best loss the
+    remaining queued starts are cancelled.
+
+Trust:
+    Several parameters are barely constrained by four photos and a fit can
+    run into its bounds without gaining anything. OpticsFit.fallback_reason
+    is non-empty when a parameter that still affects the render ended on a
+    bound or the fit did not beat the initial (heuristic) loss by
+    MIN_IMPROVEMENT; callers then keep the heuristic optics.
+
+Usage:
+    python calibrate_optics.py --optimize
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+from scipy.optimize import minimize
+
+from calibrate_optics import OpticsResult, optics_to_dict
+from edge_lit_render import PATTERNS, RenderSettings, pattern_strips, render_frame, to_gray
+from plate import plate_rows
+
+
+# (name, lower, upper). Ranges follow the clamps used by map_optics.
+PARAM_BOUNDS: Tuple[Tuple[str, float, float], ...] = (
+    ("topSpreadNear", 0.0005, 0.1),
+    ("topSpreadFar", 0.0005, 0.1),
+    ("bottomSpreadNear", 0.0005, 0.1),
+    ("bottomSpreadFar", 0.0005, 0.1),
+    ("topFalloff", 0.5, 10.0),
+    ("bottomFalloff", 0.5, 10.0),
+    ("columnBoostStrength", 0.0, 5.0),
+    ("columnBoostExponent", 0.5, 3.0),
+    ("edgeHotspotStrength", 0.0, 5.0),
+    ("edgeHotspotWidth", 0.01, 0.25),
+    ("railInner", 0.0, 0.5),
+    ("railOuter", 0.0, 0.75),
+    ("railSigma", 0.01, 1.0),
+)
+
+PARAM_NAMES = [name for name, _, _ in PARAM_BOUNDS]
+_LOWER = np.array([lo for _, lo, _ in PARAM_BOUNDS])
+_UPPER = np.array([hi for _, _, hi in PARAM_BOUNDS])
+
+DEFAULT_RAILS = {"railInner": 0.2, "railOuter": 0.45, "railSigma": 1.0}
+
+# A fitted value within this fraction of its range from a bound is "on" it.
+BOUND_TOL = 0.005
+
+# Relative loss improvement over the initial guess needed to use the fit.
+MIN_IMPROVEMENT = 0.05
+
+# Parameters that only matter while another one is non-zero.
+_DEPENDS_ON = {
+    "columnBoostExponent": "columnBoostStrength",
+    "edgeHotspotWidth": "edgeHotspotStrength",
+}
+
+
+@dataclass
+class OpticsFit:
+    optics: OpticsResult
+    railInner: float
+    railOuter: float
+    railSigma: float
+    loss: float
+    starts_run: int
+    seconds: float
+    initial_loss: Optional[float] = None
+    at_bounds: Tuple[str, ...] = ()
+
+    @property
+    def fallback_reason(self) -> str:
+        """Why the heuristic optics should be kept instead ("" if the fit is usable)."""
+        reasons = []
+        if self.at_bounds:
+            reasons.append(f"{', '.join(self.at_bounds)} ended on their bounds")
+        if self.initial_loss is not None and self.loss > self.initial_loss * (1.0 - MIN_IMPROVEMENT):
+            reasons.append(f"loss {self.loss:.4f} is not clearly below the initial {self.initial_loss:.4f}")
+        return "; ".join(reasons)
+
+    def to_dict(self) -> Dict[str, float]:
+        out = optics_to_dict(self.optics)
+        out.update(railInner=self.railInner, railOuter=self.railOuter, railSigma=self.railSigma)
+        return out
+
+
+# ---------- OBJECTIVE -------------------------------------------------------------
+
+def prepare_targets(images: Sequence[np.ndarray], fit_width: int = 64) -> List[np.ndarray]:
+    """Crop the four ROI-cropped photos (in PATTERNS order) to the plate and downscale them for fitting."""
+    if len(images) != len(PATTERNS):
+        raise ValueError(f"Expected {len(PATTERNS)} images ({', '.join(PATTERNS)}), got {len(images)}")
+    targets = []
+    for img in images:
+        y0, y1 = plate_rows(img)
+        img = img[y0:y1]
+        h, w = img.shape
+        width = min(fit_width, w)
+        height = max(2, int(round(h * width / w)))
+        small = cv2.resize(np.asarray(img, dtype=np.float32), (width, height), interpolation=cv2.INTER_AREA)
+        targets.append(small)
+    return targets
+
+
+def params_to_optics(values: np.ndarray) -> Tuple[OpticsResult, RenderSettings]:
+    named = dict(zip(PARAM_NAMES, (float(v) for v in values)))
+    settings = RenderSettings(
+        opticsMode="HERO",
+        exposure=1.0,
+        railInner=named.pop("railInner"),
+        railOuter=named.pop("railOuter"),
+        railSigma=named.pop("railSigma"),
+    )
+    return OpticsResult(**named), settings
+
+
+def optics_to_params(optics: OpticsResult, rails: Optional[Dict[str, float]] = None) -> np.ndarray:
+    named = optics_to_dict(optics)
+    named.update(rails or DEFAULT_RAILS)
+    return np.clip(np.array([named[n] for n in PARAM_NAMES]), _LOWER, _UPPER)
+
+
+_STRIPS = [pattern_strips(p) for p in PATTERNS]
+
+
+def _affine_residual(render: np.ndarray, target: np.ndarray) -> float:
+    # Best gain/offset in closed form: min ||g*r + c - t||^2 with g >= 0.
+    r = render.ravel().astype(np.float64)
+    t = target.ravel().astype(np.float64)
+    r_c = r - r.mean()
+    t_c = t - t.mean()
+    var_r = float(r_c @ r_c)
+    var_t = float(t_c @ t_c) or 1.0
+    gain = max(0.0, float(r_c @ t_c) / var_r) if var_r > 0.0 else 0.0
+    resid = t_c - gain * r_c
+    return float(resid @ resid) / var_t
+
+
+def render_loss(values: np.ndarray, targets: Sequence[np.ndarray]) -> float:
+    """Mean normalised residual between renders and targets (0 = perfect)."""
+    optics, settings = params_to_optics(values)
+    total = 0.0
+    for (bottom, top), target in zip(_STRIPS, targets):
+        h, w = target.shape
+        frame = render_frame(bottom, top, optics, settings, width=w, height=h)
+        total += _affine_residual(to_gray(frame), target)
+    return total / len(targets)
+
+
+# ---------- MULTI-START SEARCH ------------------------------------------------------
+
+_WORKER_TARGETS: Optional[List[np.ndarray]] = None
+
+
+def _init_worker(targets: List[np.ndarray]) -> None:
+    global _WORKER_TARGETS
+    _WORKER_TARGETS = targets
+    cv2.setNumThreads(1)
+
+
+def _run_start(x0_unit: np.ndarray, max_iter: int, targets: Optional[List[np.ndarray]] = None) -> Tuple[float, np.ndarray]:
+    targets = targets if targets is not None else _WORKER_TARGETS
+    span = _UPPER - _LOWER
+
+    def objective(u: np.ndarray) -> float:
+        return render_loss(_LOWER + u * span, targets)
+
+    res = minimize(
+        objective,
+        x0_unit,
+        method="L-BFGS-B",
+        bounds=[(0.0, 1.0)] * len(PARAM_NAMES),
+        options={"maxiter": max_iter, "ftol": 1e-6, "eps": 1e-3},
+    )
+    return float(res.fun), _LOWER + np.clip(res.x, 0.0, 1.0) * span
+
+
+def params_at_bounds(values: np.ndarray) -> Tuple[str, ...]:
+    """
+    Names of parameters that ended on a bound while still affecting the render.
+
+    A lower bound of 0 means "off" (no column boost, no rail) and is a valid
+    answer; a parameter in _DEPENDS_ON is ignored while its parent is off.
+    """
+    unit = (np.asarray(values) - _LOWER) / (_UPPER - _LOWER)
+    off = {name for name, u, lo in zip(PARAM_NAMES, unit, _LOWER) if lo == 0.0 and u <= BOUND_TOL}
+    pinned = []
+    for name, u in zip(PARAM_NAMES, unit):
+        if name in off or _DEPENDS_ON.get(name) in off:
+            continue
+        if u <= BOUND_TOL or u >= 1.0 - BOUND_TOL:
+            pinned.append(name)
+    return tuple(pinned)
+
+
+def latin_hypercube(n: int, dims: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    cut = (np.arange(n)[:, None] + rng.random((n, dims))) / n
+    for d in range(dims):
+        cut[:, d] = cut[rng.permutation(n), d]
+    return cut
+
+
+def fit_optics(
+    images: Sequence[np.ndarray],
+    initial: Optional[OpticsResult] = None,
+    starts: int = 8,
+    workers: Optional[int] = None,
+    fit_width: int = 64,
+    max_iter: int = 40,
+    converge_rtol: float = 0.01,
+    converge_hits: int = 3,
+    seed: int = 0,
+) -> OpticsFit:
+    """
+    Jointly fit all optics + rail parameters to the four calibration photos.
+
+    images: ROI-cropped grayscale photos in PATTERNS order (top impulse,
+    bottom impulse, collision, edges only). `initial` seeds the first start,
+    typically the heuristic map_optics result, and its loss is reported as
+    initial_loss. workers=1 runs in-process. Check fallback_reason before
+    using the result.
+    """
+    if starts < 1:
+        raise ValueError(f"starts must be at least 1, got {starts}")
+    t0 = time.perf_counter()
+    targets = prepare_targets(images, fit_width)
+
+    x0s = []
+    initial_loss = None
+    if initial is not None:
+        initial_params = optics_to_params(initial)
+        initial_loss = render_loss(initial_params, targets)
+        x0s.append((initial_params - _LOWER) / (_UPPER - _LOWER))
+    x0s.extend(latin_hypercube(max(0, starts - len(x0s)), len(PARAM_NAMES), seed))
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(x0s)))
+    best_loss, best_x, hits, run = np.inf, None, 0, 0
+
+    def consider(loss: float, x: np.ndarray) -> bool:
+        nonlocal best_loss, best_x, hits, run
+        run += 1
+        if loss < best_loss * (1.0 - converge_rtol):
+            best_loss, best_x, hits = loss, x, 1
+        elif loss <= best_loss * (1.0 + converge_rtol):
+            hits += 1
+            if loss < best_loss:
+                best_loss, best_x = loss, x
+        return hits >= converge_hits
+
+    if workers == 1:
+        for x0 in x0s:
+            if consider(*_run_start(x0, max_iter, targets)):
+                break
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(targets,)) as pool:
+            futures = [pool.submit(_run_start, x0, max_iter) for x0 in x0s]
+            for fut in as_completed(futures):
+                if consider(*fut.result()):
+                    for pending in futures:
+                        pending.cancel()
+                    break
+
+    optics, settings = params_to_optics(best_x)
+    return OpticsFit(
+        optics=optics,
+        railInner=settings.railInner,
+        railOuter=settings.railOuter,
+        railSigma=settings.railSigma,
+        loss=float(best_loss),
+        starts_run=run,
+        seconds=time.perf_counter() - t0,
+        initial_loss=initial_loss,
+        at_bounds=params_at_bounds(best_x),
+    )
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+peak_detect.py
+
+Noise-robust, sub-pixel peak localisation for calibrate_optics.py.
+
+A raw argmax over the ROI latches onto the single brightest pixel, so one hot
+pixel or specular glint moves the "LED column" anywhere on the plate. Here
+the image is first box-filtered through an integral image (every window sum
+is four lookups, independent of window size), which averages a glint away
+while an LED's light blob survives. The peak of the filtered image is then
+refined to sub-pixel precision with a 3-point parabola in x and y, falling
+back to an intensity-weighted centroid where the top is flat (saturation).
+
+Each peak comes with a confidence in [0, 1]:
+
+    snr         (peak - median) / robust noise (MAD) of the filtered image
+    uniqueness  1 - (brightest other blob above half height / peak), both
+                above background; 1 when the peak's blob is the only one.
+                Blobs cut off by an ROI side the peak's own blob doesn't
+                reach are scenery outside the plate (a monitor, a lamp)
+                and don't count.
+    confidence  (1 - exp(-snr / SNR_SCALE)) * uniqueness
+
+so a faint capture or one with a second bright spot (reflection, wrong LED)
+scores low and can be flagged before the unit leaves the bench.
+"""
+
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+from scipy import ndimage
+
+
+# SNR at which the SNR term reaches 1 - 1/e.
+SNR_SCALE = 10.0
+
+# Below this, calibrate_optics.py warns that the capture should be checked.
+MIN_CONFIDENCE = 0.5
+
+
+@dataclass
+class Peak:
+    y: float
+    x: float
+    value: float
+    snr: float
+    uniqueness: float
+    confidence: float
+
+
+def default_window(shape: Tuple[int, int]) -> int:
+    """Odd box size of ~2.5% of the shorter side (at least 3 px)."""
+    size = max(3, min(shape) // 40)
+    return size | 1
+
+
+def box_mean(img: np.ndarray, window: int) -> np.ndarray:
+    """Mean over a window x window box around every pixel, via an integral image."""
+    h, w = img.shape
+    r = window // 2
+    ii = cv2.integral(np.asarray(img, dtype=np.float32), sdepth=cv2.CV_64F)
+    # Edge-padding the integral image by r clamps the window to the image, so
+    # every corner lookup becomes a plain slice: ii_pad[k] == ii[clip(k - r)].
+    ii = cv2.copyMakeBorder(ii, r, r, r, r, cv2.BORDER_REPLICATE)
+    n = 2 * r + 1
+    sums = ii[n:n + h, n:n + w] - ii[:h, n:n + w]
+    sums -= ii[n:n + h, :w]
+    sums += ii[:h, :w]
+    ys, xs = np.arange(h), np.arange(w)
+    rows = np.minimum(ys + r + 1, h) - np.maximum(ys - r, 0)
+    cols = np.minimum(xs + r + 1, w) - np.maximum(xs - r, 0)
+    sums *= (1.0 / rows)[:, None]
+    sums *= (1.0 / cols)[None, :]
+    return sums.astype(np.float32)
+
+
+def _parabolic_offset(profile: np.ndarray, i: int, step: int) -> Optional[float]:
+    """
+    Vertex offset of the parabola through profile[i - step], [i], [i + step].
+
+    Sampling `step` pixels apart (half the box) instead of the direct
+    neighbours keeps a broad, flat-topped LED blob from being noise dominated.
+    """
+    n = profile.shape[0]
+    step = min(step, i, n - 1 - i)
+    if step < 1:
+        return 0.0
+    left, centre, right = float(profile[i - step]), float(profile[i]), float(profile[i + step])
+    curvature = left - 2.0 * centre + right
+    if curvature >= 0.0:
+        return None  # flat (saturated) or not a maximum
+    return float(np.clip(0.5 * step * (left - right) / curvature, -step, step))
+
+
+def _centroid(img: np.ndarray, y: int, x: int, r: int, background: float) -> Tuple[float, float]:
+    h, w = img.shape
+    ys, xs = slice(max(0, y - r), min(h, y + r + 1)), slice(max(0, x - r), min(w, x + r + 1))
+    patch = np.clip(np.asarray(img[ys, xs], dtype=np.float64) - background, 0.0, None)
+    total = patch.sum()
+    if total <= 0.0:
+        return float(y), float(x)
+    gy, gx = np.mgrid[ys, xs]
+    return float((gy * patch).sum() / total), float((gx * patch).sum() / total)
+
+
+def _touched_sides(stats: np.ndarray, shape: Tuple[int, int]) -> np.ndarray:
+    """(n, 4) bool: whether each component's bounding box touches the top, bottom, left, right image side."""
+    x, y, w, h = (stats[:, i] for i in range(4))
+    return np.stack([y == 0, y + h == shape[0], x == 0, x + w == shape[1]], axis=1)
+
+
+def find_peak(img: np.ndarray, window: Optional[int] = None) -> Peak:
+    """Locate the brightest light blob in a grayscale image (see module docstring)."""
+    window = window or default_window(img.shape)
+    r = window // 2
+    smooth = box_mean(img, window)
+    iy, ix = np.unravel_index(int(np.argmax(smooth)), smooth.shape)
+    peak = float(smooth[iy, ix])
+
+    # Robust background / noise from a subsample (the statistics don't need every pixel).
+    sample = smooth[::4, ::4]
+    background = float(np.median(sample))
+    noise = 1.4826 * float(np.median(np.abs(sample - background)))
+    height = peak - background
+    if height <= 0.0:
+        return Peak(y=float(iy), x=float(ix), value=peak, snr=0.0, uniqueness=0.0, confidence=0.0)
+    snr = height / noise if noise > 0.0 else float("inf")
+
+    # Sub-pixel refinement on the filtered surface.
+    dy = _parabolic_offset(smooth[:, ix], iy, r)
+    dx = _parabolic_offset(smooth[iy, :], ix, r)
+    if dy is None or dx is None:
+        y, x = _centroid(img, iy, ix, r, background + 0.5 * height)
+    else:
+        y, x = iy + dy, ix + dx
+
+    # Brightest point of any other blob above half height (a reflection or a
+    # second LED). Sub-threshold ripples in the background (label 0) are plate
+    # texture and falloff, not a second light source.
+    # Specks smaller than a quarter of the box can't be a light blob and are
+    # dropped from the stats before any per-pixel work; the surviving
+    # candidates' maxima come from one labelled pass over the image.
+    blob = (smooth > background + 0.5 * height).astype(np.uint8)
+    n, labels, stats, _ = cv2.connectedComponentsWithStats(blob)
+    own = labels[iy, ix]
+    sides = _touched_sides(stats, smooth.shape)
+    candidates = np.flatnonzero(
+        (stats[:, cv2.CC_STAT_AREA] >= max(1, r * r))
+        & ~(sides & ~sides[own]).any(axis=1)
+    )
+    candidates = candidates[(candidates != 0) & (candidates != own)]
+    rival = background
+    if candidates.size:
+        rival = max(rival, float(np.max(ndimage.maximum(smooth, labels, index=candidates))))
+    uniqueness = float(np.clip(1.0 - (rival - background) / height, 0.0, 1.0))
+
+    confidence = (1.0 - float(np.exp(-snr / SNR_SCALE))) * uniqueness
+    return Peak(y=float(y), x=float(x), value=peak, snr=float(snr),
+                uniqueness=uniqueness, confidence=float(confidence))
+
+
+def sample_column(img: np.ndarray, x: float) -> np.ndarray:
+    """Linearly interpolated column at fractional x."""
+    w = img.shape[1]
+    x = float(np.clip(x, 0.0, w - 1))
+    x0 = int(np.floor(x))
+    x1 = min(x0 + 1, w - 1)
+    f = x - x0
+    col = np.asarray(img[:, x0], dtype=np.float32)
+    if f == 0.0 or x1 == x0:
+        return col
+    return (1.0 - f) * col + f * np.asarray(img[:, x1], dtype=np.float32)
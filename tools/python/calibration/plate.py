@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+plate.py
+
+Locate the light guide plate inside a cropped calibration frame.
+
+The ROI usually holds scenery above and below the bar, so the plate's rows
+are found from the light itself: on a small area-averaged thumbnail, the
+run of rows around the brightest point that stays lit in its column. Used
+by stream_calibrate.py to classify frames and by optimize_optics.py to fit
+only the plate.
+"""
+
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+
+# Rows around the peak whose light (in the peak's column) stays above this
+# fraction of the peak are taken as the plate band.
+BAND_LEVEL = 0.08
+
+# Thumbnail (width, height) the band is searched on.
+THUMB_SIZE = (128, 64)
+
+
+def plate_band(column: np.ndarray, iy: int, level: float = BAND_LEVEL) -> Tuple[int, int]:
+    """Rows [y0, y1) around iy over which column stays at or above level."""
+    above = column >= level
+    y0, y1 = iy, iy + 1
+    while y0 > 0 and above[y0 - 1]:
+        y0 -= 1
+    while y1 < column.shape[0] and above[y1]:
+        y1 += 1
+    return y0, y1
+
+
+def peak_column(thumb: np.ndarray, ix: int) -> np.ndarray:
+    """Brightest value per row in a narrow strip of columns around ix."""
+    cw = max(1, thumb.shape[1] // 40)
+    return thumb[:, max(0, ix - cw):ix + cw + 1].max(axis=1)
+
+
+def plate_rows(roi_gray: np.ndarray) -> Tuple[int, int]:
+    """
+    Image rows [y0, y1) of the plate band in a cropped frame, at full
+    resolution; the whole frame if the band is too thin to trust.
+    """
+    h = roi_gray.shape[0]
+    thumb = cv2.resize(np.asarray(roi_gray, dtype=np.float32), THUMB_SIZE, interpolation=cv2.INTER_AREA)
+    iy, ix = np.unravel_index(int(np.argmax(thumb)), thumb.shape)
+    peak = float(thumb[iy, ix])
+    if peak <= 0.0:
+        return 0, h
+    y0, y1 = plate_band(peak_column(thumb / peak, ix), iy)
+    if y1 - y0 < 4:
+        return 0, h
+    th = thumb.shape[0]
+    return int(y0) * h // th, -(-int(y1) * h // th)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+profile_fit.py
+
+Batched closed-form profile fitting for calibrate_optics.py.
+
+Instead of one scipy curve_fit per 1D slice, every profile of an ROI is fitted
+at once with weighted log-linear least squares:
+
+    exponential   p(y) = a * exp(-k * y)
+                  ln p = ln a - k * y                     (straight line)
+
+    Gaussian      p(x) = amp * exp(-(x - mu)^2 / (2 sigma^2))
+                  ln p = A + B x + C x^2                  (Caruana's parabola)
+
+Taking logs amplifies noise in the dim tails, so each point is weighted by
+p^2 (Guo's correction), which makes the log-domain fit approximate an ordinary
+least-squares fit of the original curve. The normal equations are summed with
+broadcasting and solved for all profiles in one go, so an ROI with thousands of
+columns costs a few array passes.
+
+Profiles whose closed-form fit still leaves a large residual can optionally be
+polished with a Levenberg-Marquardt curve_fit seeded from the closed-form
+answer; that usually converges in a handful of iterations and only runs where
+it is needed.
+
+All inputs use the same conventions as calibrate_optics.py: each profile is
+normalised to [0, 1], the coordinate runs over linspace(0, 1, n) and only
+points above `threshold` take part in the fit.
+"""
+
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+from scipy.optimize import curve_fit
+
+
+EPS = 1e-6
+
+# Relative RMS residual (on the normalised profile) above which the
+# single-profile wrappers in calibrate_optics.py refine a closed-form fit.
+REFINE_RMS = 0.05
+
+
+@dataclass
+class ExpDecayMap:
+    """Per-profile exponential decay fits; invalid entries are NaN."""
+    k: np.ndarray
+    k_err: np.ndarray
+    amplitude: np.ndarray
+    rms: np.ndarray
+    valid: np.ndarray
+
+
+@dataclass
+class GaussianMap:
+    """Per-profile Gaussian fits; invalid entries are NaN."""
+    sigma: np.ndarray
+    mu: np.ndarray
+    amplitude: np.ndarray
+    rms: np.ndarray
+    valid: np.ndarray
+
+
+def _exp_decay(y, k, a):
+    return a * np.exp(-k * y)
+
+
+def _gaussian(x, amp, mu, sigma):
+    return amp * np.exp(-0.5 * ((x - mu) / (sigma + EPS)) ** 2)
+
+
+def normalise_profiles(profiles: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Shift/scale each row of a (m, n) array to [0, 1].
+
+    Returns (normalised float64 profiles, bool mask of rows with any signal).
+    """
+    p = np.asarray(profiles, dtype=np.float64)
+    if p.ndim == 1:
+        p = p[None, :]
+    p = p - p.min(axis=1, keepdims=True)
+    peak = p.max(axis=1, keepdims=True)
+    has_signal = peak[:, 0] >= EPS
+    p = p / (peak + EPS)
+    return p, has_signal
+
+
+def _fit_mask(p: np.ndarray, has_signal: np.ndarray, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+    n = p.shape[1]
+    mask = (p > threshold) & has_signal[:, None]
+    enough = mask.sum(axis=1) >= max(5, n // 10)
+    return mask, enough
+
+
+def _rms(p: np.ndarray, model: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    count = np.maximum(mask.sum(axis=1), 1)
+    return np.sqrt(np.sum(np.where(mask, (p - model) ** 2, 0.0), axis=1) / count)
+
+
+def fit_exp_decay(
+    profiles: np.ndarray,
+    threshold: float = 0.1,
+    refine_rms: Optional[float] = None,
+) -> ExpDecayMap:
+    """
+    Fit a * exp(-k * y) to every row of `profiles` (shape (m, n) or (n,)).
+
+    y = 0 is the first sample of each row. Rows whose relative RMS residual
+    exceeds refine_rms get a Levenberg-Marquardt pass; None (the default)
+    keeps the pure closed-form answer.
+    """
+    p, has_signal = normalise_profiles(profiles)
+    m, n = p.shape
+    y = np.linspace(0.0, 1.0, n)
+    mask, enough = _fit_mask(p, has_signal, threshold)
+
+    # Weighted straight-line fit of ln p against y, weights p^2.
+    w = np.where(mask, p * p, 0.0)
+    ln_p = np.log(np.where(mask, p, 1.0))
+    s0 = w.sum(axis=1)
+    sy = w @ y
+    syy = w @ (y * y)
+    sl = np.sum(w * ln_p, axis=1)
+    syl = np.sum(w * ln_p * y, axis=1)
+    det = s0 * syy - sy * sy
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = (s0 * syl - sy * sl) / det
+        intercept = (sl - slope * sy) / s0
+        k = -slope
+        a = np.exp(intercept)
+        resid = np.where(mask, ln_p - (intercept[:, None] + slope[:, None] * y), 0.0)
+        dof = np.maximum(mask.sum(axis=1) - 2, 1)
+        k_err = np.sqrt(np.sum(w * resid * resid, axis=1) / dof * s0 / det)
+
+    valid = enough & np.isfinite(k) & np.isfinite(a) & (det > 0)
+    model = a[:, None] * np.exp(-k[:, None] * y)
+    rms = _rms(p, np.nan_to_num(model), mask)
+
+    if refine_rms is not None:
+        for i in np.flatnonzero(valid & (rms > refine_rms)):
+            sel = mask[i]
+            try:
+                popt, pcov = curve_fit(_exp_decay, y[sel], p[i, sel], p0=(k[i], a[i]), maxfev=400)
+            except Exception:
+                continue
+            model_i = _exp_decay(y, *popt)
+            rms_i = _rms(p[i:i + 1], model_i[None, :], mask[i:i + 1])[0]
+            if np.all(np.isfinite(popt)) and rms_i < rms[i]:
+                k[i], a[i] = popt
+                rms[i] = rms_i
+                if pcov is not None and np.all(np.isfinite(pcov)):
+                    k_err[i] = float(np.sqrt(pcov[0, 0]))
+
+    nan = np.where(valid, 1.0, np.nan)
+    return ExpDecayMap(k=k * nan, k_err=k_err * nan, amplitude=a * nan, rms=rms * nan, valid=valid)
+
+
+def fit_gaussian(
+    profiles: np.ndarray,
+    threshold: float = 0.1,
+    refine_rms: Optional[float] = None,
+) -> GaussianMap:
+    """
+    Fit amp * exp(-(x - mu)^2 / (2 sigma^2)) to every row of `profiles`.
+
+    Uses Caruana's log-parabola with p^2 weights; rows whose parabola opens
+    upwards (no peak) are marked invalid. refine_rms works as in fit_exp_decay.
+    """
+    p, has_signal = normalise_profiles(profiles)
+    m, n = p.shape
+    x = np.linspace(0.0, 1.0, n)
+    mask, enough = _fit_mask(p, has_signal, threshold)
+
+    w = np.where(mask, p * p, 0.0)
+    ln_p = np.log(np.where(mask, p, 1.0))
+
+    # Normal equations for ln p = A + B x + C x^2, one 3x3 system per row.
+    xp = np.stack([np.ones_like(x), x, x * x, x ** 3, x ** 4])
+    moments = w @ xp.T                                   # (m, 5): sum w x^j
+    rhs = np.stack([np.sum(w * ln_p, axis=1),
+                    w * ln_p @ x,
+                    w * ln_p @ (x * x)], axis=1)         # (m, 3)
+    idx = np.arange(3)
+    lhs = moments[:, idx[:, None] + idx[None, :]]        # (m, 3, 3) Hankel
+
+    solvable = enough & (np.abs(np.linalg.det(lhs)) > 1e-300)
+    coeffs = np.full((m, 3), np.nan)
+    if solvable.any():
+        coeffs[solvable] = np.linalg.solve(lhs[solvable], rhs[solvable][..., None])[..., 0]
+    A, B, C = coeffs.T
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigma = np.sqrt(-1.0 / (2.0 * C))
+        mu = -B / (2.0 * C)
+        amp = np.exp(A - B * B / (4.0 * C))
+
+    valid = solvable & (C < 0) & np.isfinite(sigma) & np.isfinite(mu) & np.isfinite(amp)
+    model = amp[:, None] * np.exp(-0.5 * ((x - mu[:, None]) / (sigma[:, None] + EPS)) ** 2)
+    rms = _rms(p, np.nan_to_num(model), mask)
+
+    if refine_rms is not None:
+        for i in np.flatnonzero(valid & (rms > refine_rms)):
+            sel = mask[i]
+            try:
+                popt, _ = curve_fit(_gaussian, x[sel], p[i, sel], p0=(amp[i], mu[i], sigma[i]), maxfev=400)
+            except Exception:
+                continue
+            model_i = _gaussian(x, *popt)
+            rms_i = _rms(p[i:i + 1], model_i[None, :], mask[i:i + 1])[0]
+            if np.all(np.isfinite(popt)) and rms_i < rms[i]:
+                amp[i], mu[i], sigma[i] = popt[0], popt[1], abs(popt[2])
+                rms[i] = rms_i
+
+    nan = np.where(valid, 1.0, np.nan)
+    return GaussianMap(sigma=sigma * nan, mu=mu * nan, amplitude=amp * nan, rms=rms * nan, valid=valid)
+
+
+def fit_column_decay(
+    img: np.ndarray,
+    from_top: bool = True,
+    threshold: float = 0.1,
+    refine_rms: Optional[float] = None,
+) -> ExpDecayMap:
+    """Fit an exponential decay down (or, with from_top=False, up) every column of img."""
+    cols = np.asarray(img).T
+    if not from_top:
+        cols = cols[:, ::-1]
+    return fit_exp_decay(cols, threshold=threshold, refine_rms=refine_rms)
+
+
+def fit_row_gaussians(
+    img: np.ndarray,
+    threshold: float = 0.1,
+    refine_rms: Optional[float] = None,
+) -> GaussianMap:
+    """Fit a horizontal Gaussian to every row of img."""
+    return fit_gaussian(np.asarray(img), threshold=threshold, refine_rms=refine_rms)
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+stream_calibrate.py
+
+Streaming version of calibrate_optics.py: reads frames from a cv2.VideoCapture
+source (video file or camera/V4L2 device), keeps a running exponential average
+of the ROI per calibration pattern to suppress sensor noise, and prints an
+updated optics estimate as frames arrive.
+
+Frames are assigned to a pattern either automatically from where the light
+is (see classify_frame), so a single recording of the firmware cycling
+through 1-4 with 'n' works, or by pairing each --source with a --pattern
+(one clip per pattern, all feeding the same estimate). Frames
+with the LEDs off are ignored, and frames that can't be told apart with
+confidence (mid-transition, partly occluded) are rejected and counted rather
+than averaged into the wrong pattern.
+
+Averaging is done in place on one preallocated float32 buffer per pattern
+(cv2.accumulateWeighted), so the per-frame cost is a colour conversion and one
+accumulate. The fitting only runs every --emit-every frames and only for the
+patterns whose average changed since the last estimate.
+
+Usage:
+    python stream_calibrate.py --source capture.mp4
+    python stream_calibrate.py --source 0 --emit-every 30
+    python stream_calibrate.py --source top.mp4 --pattern top_impulse \
+        --source bottom.mp4 --pattern bottom_impulse \
+        --source both.mp4 --pattern collision --source edges.mp4 --pattern edges_only
+    python calibrate_optics.py --stream capture.mp4
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from calibrate_optics import (
+    ROI,
+    GaussianFit,
+    OpticsResult,
+    ProfileFit,
+    analyse_collision,
+    analyse_edge_hotspots,
+    analyse_impulse_bottom,
+    analyse_impulse_top,
+    map_optics,
+    optics_to_dict,
+)
+from edge_lit_render import PATTERNS
+from plate import THUMB_SIZE, peak_column, plate_band
+
+
+# Frames whose brightest (downscaled) ROI pixel is below this fraction of
+# full scale are treated as "LEDs off" and skipped.
+DARK_LEVEL = 0.08
+
+# Light at the dim end of the plate band relative to the lit end, in the
+# peak's column: up to IMPULSE_MAX_RATIO the frame is a single impulse, from
+# COLLISION_MIN_RATIO both edges are lit; in between it is rejected.
+IMPULSE_MAX_RATIO = 0.4
+COLLISION_MIN_RATIO = 0.5
+
+# classify_frame's answer for a lit frame that matches no pattern clearly.
+UNCERTAIN = "uncertain"
+
+_ImpulseFits = Tuple[Optional[ProfileFit], Optional[GaussianFit], Optional[GaussianFit]]
+
+
+# ---------- FRAME CLASSIFICATION ---------------------------------------------
+
+def classify_frame(roi_gray: np.ndarray, dark_level: float = DARK_LEVEL) -> Optional[str]:
+    """
+    Guess which calibration pattern a cropped grayscale frame shows.
+
+    Works on a small area-averaged thumbnail, relative to the plate band
+    (plate.py): the run of rows around the brightest point that stays lit in
+    its column (the ROI usually holds scenery above and below the bar, so
+    fixed bands at the ROI's top and bottom don't line up with the plate's
+    edges).
+        - band edges clearly brighter than its centre columns -> edges_only
+        - both ends of the band lit in the peak column        -> collision
+        - one end lit, the other dim                          -> top/bottom_impulse
+    Returns None for dark frames (LEDs off / between patterns) and UNCERTAIN
+    when the end ratio falls between IMPULSE_MAX_RATIO and COLLISION_MIN_RATIO
+    or the band is too thin to have two ends.
+    """
+    thumb = cv2.resize(roi_gray, THUMB_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32)
+    full_scale = 255.0 if roi_gray.dtype == np.uint8 else 1.0
+    iy, ix = np.unravel_index(int(np.argmax(thumb)), thumb.shape)
+    peak = float(thumb[iy, ix])
+    if peak < dark_level * full_scale:
+        return None
+    thumb /= peak
+
+    h, w = thumb.shape
+    column = peak_column(thumb, ix)
+    y0, y1 = plate_band(column, iy)
+    plate = thumb[y0:y1]
+
+    ew = max(1, w // 10)
+    centre = float(plate[:, 2 * w // 5:3 * w // 5].mean())
+    edges = 0.5 * float(plate[:, :ew].mean() + plate[:, w - ew:].mean())
+    if edges > 1.5 * centre:
+        return "edges_only"
+
+    n = y1 - y0
+    if n < 4:
+        return UNCERTAIN
+    end = max(1, n // 10)
+    top = float(column[y0:y0 + end].max())
+    bottom = float(column[y1 - end:y1].max())
+    ratio = min(top, bottom) / max(top, bottom)
+    if ratio >= COLLISION_MIN_RATIO:
+        return "collision"
+    if ratio <= IMPULSE_MAX_RATIO:
+        return "top_impulse" if top > bottom else "bottom_impulse"
+    return UNCERTAIN
+
+
+# ---------- INCREMENTAL CALIBRATOR -------------------------------------------
+
+class StreamingCalibrator:
+    """
+    Running per-pattern frame averages plus cached per-pattern analyses.
+
+    push() costs one in-place accumulate; estimate() re-runs only the analysis
+    stages fed by patterns that received frames since the previous call and
+    returns None until every pattern has at least `min_frames` frames.
+
+    alpha is the EMA weight of a new frame once warmed up; the first 1/alpha
+    frames are a plain cumulative mean so early estimates aren't biased
+    towards the first frame.
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.1,
+        roi: Optional[Dict[str, float]] = None,
+        min_frames: int = 5,
+        dark_level: float = DARK_LEVEL,
+    ):
+        if not 0.0 < alpha <= 1.0:
+            raise ValueError(f"alpha must be in (0, 1], got {alpha}")
+        self.alpha = alpha
+        self.roi = roi or ROI
+        self.min_frames = min_frames
+        self.dark_level = dark_level
+
+        self.frames_seen = 0
+        self.counts: Dict[str, int] = {p: 0 for p in PATTERNS}
+        self.skipped: Dict[str, int] = {"dark": 0, UNCERTAIN: 0}
+        self._dirty = set()
+
+        # Allocated on the first frame, once the frame size is known.
+        self._shape: Optional[Tuple[int, int]] = None
+        self._gray: Optional[np.ndarray] = None
+        self._slices: Tuple[slice, slice] = (slice(None), slice(None))
+        self._avg: Dict[str, np.ndarray] = {}
+        self._scaled: Dict[str, np.ndarray] = {}
+
+        self._top: Optional[_ImpulseFits] = None
+        self._bottom: Optional[_ImpulseFits] = None
+        self._collision: Optional[Tuple[float, float]] = None
+        self._edges: Optional[Tuple[float, float]] = None
+        self._optics: Optional[OpticsResult] = None
+
+    def _allocate(self, shape: Tuple[int, int]) -> None:
+        h, w = shape
+        roi = self.roi
+        x0 = max(0, min(w - 1, int(roi["x_min"] * w)))
+        x1 = max(x0 + 1, min(w, int(roi["x_max"] * w)))
+        y0 = max(0, min(h - 1, int(roi["y_min"] * h)))
+        y1 = max(y0 + 1, min(h, int(roi["y_max"] * h)))
+        self._shape = shape
+        self._slices = (slice(y0, y1), slice(x0, x1))
+        self._gray = np.empty(shape, dtype=np.uint8)
+        roi_shape = (y1 - y0, x1 - x0)
+        self._avg = {p: np.zeros(roi_shape, dtype=np.float32) for p in PATTERNS}
+        self._scaled = {p: np.empty(roi_shape, dtype=np.float32) for p in PATTERNS}
+
+    def _to_gray_roi(self, frame: np.ndarray) -> np.ndarray:
+        shape = frame.shape[:2]
+        if self._shape is None:
+            self._allocate(shape)
+        elif shape != self._shape:
+            raise ValueError(f"Frame size changed mid-stream: {shape} vs {self._shape}")
+        if frame.ndim == 3:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray)
+            gray = self._gray
+        else:
+            gray = frame
+        return gray[self._slices]
+
+    def push(self, frame: np.ndarray, pattern: Optional[str] = None) -> Optional[str]:
+        """
+        Add one BGR or grayscale uint8 frame (full camera frame, not cropped).
+
+        pattern=None classifies the frame automatically. Returns the pattern
+        the frame was averaged into, or None if it was skipped as dark or
+        uncertain (tallied in self.skipped).
+        """
+        self.frames_seen += 1
+        roi = self._to_gray_roi(frame)
+        if pattern is None:
+            pattern = classify_frame(roi, self.dark_level)
+            if pattern is None or pattern == UNCERTAIN:
+                self.skipped["dark" if pattern is None else UNCERTAIN] += 1
+                return None
+        elif pattern not in self.counts:
+            raise ValueError(f"Unknown pattern {pattern!r}; expected one of {PATTERNS}")
+
+        self.counts[pattern] += 1
+        weight = max(self.alpha, 1.0 / self.counts[pattern])
+        cv2.accumulateWeighted(roi, self._avg[pattern], weight)
+        self._dirty.add(pattern)
+        return pattern
+
+    @property
+    def ready(self) -> bool:
+        return all(n >= self.min_frames for n in self.counts.values())
+
+    def average(self, pattern: str) -> np.ndarray:
+        """Current averaged ROI for a pattern, scaled to [0, 1] like load_gray."""
+        np.multiply(self._avg[pattern], 1.0 / 255.0, out=self._scaled[pattern])
+        return self._scaled[pattern]
+
+    def estimate(self) -> Optional[OpticsResult]:
+        """Refresh the optics estimate from the patterns that changed."""
+        if not self.ready:
+            return None
+        if not self._dirty and self._optics is not None:
+            return self._optics
+
+        dirty = self._dirty
+        if "top_impulse" in dirty or self._top is None:
+            self._top = analyse_impulse_top(self.average("top_impulse"))
+        if "bottom_impulse" in dirty or self._bottom is None:
+            self._bottom = analyse_impulse_bottom(self.average("bottom_impulse"))
+        if dirty & {"top_impulse", "bottom_impulse", "collision"} or self._collision is None:
+            self._collision = analyse_collision(
+                self._scaled["top_impulse"],
+                self._scaled["bottom_impulse"],
+                self.average("collision"),
+            )
+        if "edges_only" in dirty or self._edges is None:
+            self._edges = analyse_edge_hotspots(self.average("edges_only"))
+        self._dirty = set()
+
+        top_vert, top_near, top_far = self._top
+        bottom_vert, bottom_near, bottom_far = self._bottom
+        self._optics = map_optics(
+            top_vert=top_vert,
+            top_gauss_near=top_near,
+            top_gauss_far=top_far,
+            bottom_vert=bottom_vert,
+            bottom_gauss_near=bottom_near,
+            bottom_gauss_far=bottom_far,
+            column_strength=self._collision[0],
+            column_exponent=self._collision[1],
+            edge_strength=self._edges[0],
+            edge_width=self._edges[1],
+        )
+        return self._optics
+
+
+# ---------- CAPTURE LOOP -----------------------------------------------------
+
+def open_capture(source: Union[str, int]) -> cv2.VideoCapture:
+    """Open a video file path or a camera index ("0" -> device 0)."""
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise RuntimeError(f"Failed to open video source {source!r}")
+    return cap
+
+
+def iter_frames(cap: cv2.VideoCapture, max_frames: Optional[int] = None) -> Iterable[np.ndarray]:
+    """Yield frames from cap, decoding into the same buffer each time."""
+    frame = None
+    n = 0
+    while max_frames is None or n < max_frames:
+        ok, frame = cap.read(frame)
+        if not ok:
+            return
+        n += 1
+        yield frame
+
+
+def run_stream(
+    frames: Iterable[np.ndarray],
+    calibrator: Optional[StreamingCalibrator] = None,
+    pattern: Optional[str] = None,
+    emit_every: int = 30,
+    on_estimate: Optional[Callable[[int, OpticsResult], None]] = None,
+    start: int = 1,
+) -> Optional[OpticsResult]:
+    """
+    Feed frames into a StreamingCalibrator, calling on_estimate(frame_index,
+    optics) every `emit_every` frames once an estimate is available. Frames
+    are numbered from `start`, so several sources can share one count.
+    Returns the final estimate (None if some pattern never appeared).
+    """
+    calibrator = calibrator or StreamingCalibrator()
+    for i, frame in enumerate(frames, start=start):
+        calibrator.push(frame, pattern)
+        if i % emit_every == 0:
+            optics = calibrator.estimate()
+            if optics is not None and on_estimate is not None:
+                on_estimate(i, optics)
+    return calibrator.estimate()
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Estimate K1 optics from a live camera or video file.")
+    parser.add_argument("--source", required=True, action="append",
+                        help="Video file path or camera index (e.g. 0 for /dev/video0). "
+                             "Repeat to read several clips in order.")
+    parser.add_argument("--pattern", choices=PATTERNS, action="append",
+                        help="Treat every frame of the matching --source (by position) as this pattern "
+                             "instead of classifying it. Give one per --source or none.")
+    parser.add_argument("--alpha", type=float, default=0.1,
+                        help="Exponential averaging weight of each new frame.")
+    parser.add_argument("--emit-every", type=int, default=30,
+                        help="Re-estimate every N frames.")
+    parser.add_argument("--min-frames", type=int, default=5,
+                        help="Frames required per pattern before the first estimate.")
+    parser.add_argument("--max-frames", type=int, default=None,
+                        help="Stop each source after N frames (default: until it ends).")
+    args = parser.parse_args(argv)
+    if args.pattern and len(args.pattern) != len(args.source):
+        parser.error(f"got {len(args.pattern)} --pattern for {len(args.source)} --source; "
+                     "pair every --source with a --pattern or give none")
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    patterns = args.pattern or [None] * len(args.source)
+    calibrator = StreamingCalibrator(alpha=args.alpha, min_frames=args.min_frames)
+
+    def emit(frame_index: int, optics: OpticsResult) -> None:
+        line = {"frame": frame_index, "counts": calibrator.counts, "skipped": calibrator.skipped,
+                "optics": optics_to_dict(optics)}
+        print(json.dumps(line), flush=True)
+
+    t0 = time.perf_counter()
+    optics = None
+    for source, pattern in zip(args.source, patterns):
+        cap = open_capture(source)
+        try:
+            optics = run_stream(
+                iter_frames(cap, args.max_frames),
+                calibrator,
+                pattern=pattern,
+                emit_every=max(1, args.emit_every),
+                on_estimate=emit,
+                start=calibrator.frames_seen + 1,
+            )
+        finally:
+            cap.release()
+    elapsed = time.perf_counter() - t0
+
+    fps = calibrator.frames_seen / elapsed if elapsed > 0 else 0.0
+    print(f"\nProcessed {calibrator.frames_seen} frames in {elapsed:.2f}s ({fps:.0f} fps)", file=sys.stderr)
+    if any(calibrator.skipped.values()):
+        print(f"Skipped {calibrator.skipped['dark']} dark and {calibrator.skipped[UNCERTAIN]} "
+              f"unrecognised frame(s)", file=sys.stderr)
+    if optics is None:
+        missing = [p for p, n in calibrator.counts.items() if n < calibrator.min_frames]
+        print(f"Not enough frames for: {', '.join(missing)}", file=sys.stderr)
+        return 1
+
+    print("\nSuggested optics block for K1_HERO_PRESET (K1Engine.tsx):\n")
+    print(json.dumps(optics_to_dict(optics), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
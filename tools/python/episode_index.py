@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+episode_index.py
+
+Persistent approximate-nearest-neighbour index for PHALANX episode recall
+(phalanx.py recall --index). Default recall constructs the episode store and
+scans its embeddings per query; this index answers a query by probing a few
+inverted lists instead, so latency stays roughly flat as the archive grows
+into the tens of thousands.
+
+Episodes are embedded with signed feature hashing of their words and word
+bigrams (sublinear TF, L2-normalised), so the index needs nothing but NumPy
+and stays consistent across runs. Similarity is cosine over these lexical
+vectors, not the store's embeddings, so scores run lower than the store's
+and rankings can differ; that's why it is opt-in.
+
+Search is IVF (inverted file): spherical k-means splits the vectors into
+nlist clusters; a query scores the centroids, probes the nprobe closest
+lists and ranks only their members exactly. Below MIN_TRAIN vectors the
+index is not trained and every query is an exact scan.
+
+Directory layout (<episodes_db>/ann_index/):
+
+    meta.json       version, dim, count, capacity, nlist, trained_count,
+                    fingerprint (see fingerprint())
+    vectors.f32     capacity x dim float32 rows, memory-mapped
+    lists.i32       capacity int32: IVF list of each row (-1 = untrained)
+    offsets.u64     capacity uint64: byte offset of each row in docs.jsonl
+    centroids.npy   nlist x dim float32 (only once trained)
+    docs.jsonl      {"id", "task", "outcome"} per row, so results print
+                    without loading the episode store
+
+Inserts append a row to the memory-mapped files (grown by doubling), assign
+it to its nearest centroid and rewrite meta.json last, so a crash mid-insert
+leaves the previous count intact. Centroids are retrained automatically once
+the index has grown RETRAIN_GROWTH-fold since the last training (amortised
+O(1) per insert); rebuilds are never needed for correctness.
+
+Usage:
+    python episode_index.py bench                          # recall@k vs latency, synthetic archive
+    python episode_index.py bench --sizes 10000 50000 --k 5
+    python episode_index.py stats PHALANX/memory_db/ann_index
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+import time
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+INDEX_VERSION = 1
+DEFAULT_DIM = 768
+BIGRAM_WEIGHT = 0.5       # bigrams sharpen phrase matches; at full weight their noise swamps the clusters
+MIN_TRAIN = 10000         # below this many vectors an exact scan is already ~1 ms, so stay exact
+RETRAIN_GROWTH = 4        # retrain centroids when count reaches this multiple of trained_count
+KMEANS_ITERATIONS = 12
+KMEANS_SAMPLE = 40000     # rows used to fit centroids
+LISTS_PER_SQRT_N = 2      # nlist = 2 * sqrt(count)
+DEFAULT_NPROBE = 8
+INITIAL_CAPACITY = 1024
+ASSIGN_BLOCK = 8192
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+# ---------- EMBEDDING --------------------------------------------------------
+
+def embed(texts: Iterable[str], dim: int = DEFAULT_DIM) -> np.ndarray:
+    """(n, dim) float32 hashed bag-of-words (+ bigrams) vectors, L2-normalised."""
+    texts = list(texts)
+    out = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = _TOKEN.findall(text.lower())
+        for tokens, weight in ((words, 1.0), ([a + " " + b for a, b in zip(words, words[1:])], BIGRAM_WEIGHT)):
+            counts: Dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, n in counts.items():
+                h = zlib.crc32(token.encode("utf-8"))
+                out[row, h % dim] += weight * (1.0 + math.log(n)) * (1.0 if h & 0x80000000 else -1.0)
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    return out / np.maximum(norms, 1e-12)
+
+
+def episode_text(episode: Dict) -> str:
+    """The fields of an episode that recall matches against."""
+    parts = [episode.get(k) or "" for k in ("task", "context", "reasoning", "action", "outcome")]
+    for k in ("tags", "components", "next_steps", "open_questions"):
+        value = episode.get(k) or []
+        parts.append(" ".join(value) if isinstance(value, (list, tuple)) else str(value))
+    return " ".join(str(p) for p in parts)
+
+
+# ---------- CLUSTERING -------------------------------------------------------
+
+def spherical_kmeans(x: np.ndarray, k: int, iterations: int = KMEANS_ITERATIONS, seed: int = 0) -> np.ndarray:
+    """k unit-norm centroids for unit-norm rows x (cosine k-means)."""
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = np.argmax(x @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, x)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        empty = norms[:, 0] == 0
+        if empty.any():  # reseed empty clusters with random rows
+            sums[empty] = x[rng.choice(len(x), size=int(empty.sum()), replace=False)]
+            norms[empty] = 1.0
+        centroids = sums / norms
+    return centroids.astype(np.float32)
+
+
+# ---------- INDEX ------------------------------------------------------------
+
+def episode_digest(episode: Dict) -> int:
+    """64-bit digest of everything the index keeps of an episode: id, matched text, listed fields."""
+    blob = json.dumps([episode.get("id"), episode_text(episode), episode.get("task"), episode.get("outcome")],
+                      default=str)
+    return int.from_bytes(hashlib.blake2b(blob.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def fingerprint(episodes: Iterable[Dict]) -> int:
+    """Content fingerprint of a set of episodes: the sum of their digests mod 2**64, so order doesn't matter and an
+    append updates it without rehashing the rest. An edited, removed or replaced episode changes it."""
+    return sum(episode_digest(ep) for ep in episodes) % (1 << 64)
+
+
+class EpisodeIndex:
+    """IVF index over episode vectors, persisted in `index_dir` (see module docstring)."""
+
+    def __init__(self, index_dir: str, dim: int = DEFAULT_DIM):
+        self.index_dir = index_dir
+        os.makedirs(index_dir, exist_ok=True)
+        self.meta = {"version": INDEX_VERSION, "dim": dim, "count": 0, "capacity": 0, "nlist": 0, "trained_count": 0,
+                     "docs_bytes": 0, "fingerprint": 0}
+        meta_path = self._path("meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") == INDEX_VERSION:
+                self.meta = meta
+        self.dim = self.meta["dim"]
+        self.centroids = np.load(self._path("centroids.npy")) if self.meta["nlist"] else None
+        self._lists_cache = None  # (order, bounds) inverted lists, built on first search
+        self._map(max(self.meta["capacity"], INITIAL_CAPACITY))
+
+    @staticmethod
+    def exists(index_dir: str) -> bool:
+        return os.path.exists(os.path.join(index_dir, "meta.json"))
+
+    @property
+    def count(self) -> int:
+        return self.meta["count"]
+
+    @property
+    def content_fingerprint(self) -> Optional[int]:
+        """fingerprint() of the indexed episodes as they were added; None for an index written before it existed."""
+        return self.meta.get("fingerprint")
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def _map(self, capacity: int) -> None:
+        """(Re)open the memory-mapped row files, growing them to `capacity` rows."""
+        files = (("vectors.f32", np.float32, (capacity, self.dim)), ("lists.i32", np.int32, (capacity,)),
+                 ("offsets.u64", np.uint64, (capacity,)))
+        arrays = []
+        for name, dtype, shape in files:
+            path = self._path(name)
+            size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            with open(path, "ab") as f:
+                if f.tell() < size:
+                    f.truncate(size)
+            arrays.append(np.memmap(path, dtype=dtype, mode="r+", shape=shape))
+        self.vectors, self.lists, self.offsets = arrays
+        self.meta["capacity"] = capacity
+
+    def _write_meta(self) -> None:
+        tmp = self._path("meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(tmp, self._path("meta.json"))
+
+    # ----- inserts -----
+
+    def add_many(self, episodes: List[Dict]) -> None:
+        """Append episode dicts (needs "id"; text from episode_text()) without rebuilding."""
+        if not episodes:
+            return
+        vectors = embed((episode_text(ep) for ep in episodes), self.dim)
+        start, end = self.count, self.count + len(episodes)
+        if end > self.meta["capacity"]:
+            self.vectors.flush()
+            self._map(max(end, 2 * self.meta["capacity"]))
+
+        self.vectors[start:end] = vectors
+        self.lists[start:end] = self._assign(vectors) if self.centroids is not None else -1
+        docs_path = self._path("docs.jsonl")
+        with open(docs_path, "r+b" if os.path.exists(docs_path) else "w+b") as f:
+            f.truncate(self.meta["docs_bytes"])  # drop lines an interrupted insert left behind
+            f.seek(self.meta["docs_bytes"])
+            for i, ep in enumerate(episodes):
+                self.offsets[start + i] = f.tell()
+                f.write(json.dumps({"id": ep["id"], "task": ep.get("task"), "outcome": ep.get("outcome")}).encode("utf-8") + b"\n")
+            docs_bytes = f.tell()
+        for array in (self.vectors, self.lists, self.offsets):
+            array.flush()
+        old = self.content_fingerprint
+        self.meta.update(count=end, docs_bytes=docs_bytes,
+                         fingerprint=None if old is None else (old + fingerprint(episodes)) % (1 << 64))
+        self._lists_cache = None
+
+        trained = self.meta["trained_count"]
+        if (not trained and end >= MIN_TRAIN) or (trained and end >= RETRAIN_GROWTH * trained):
+            self.train()
+        else:
+            self._write_meta()
+
+    def add(self, episode: Dict) -> None:
+        self.add_many([episode])
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def train(self, nlist: Optional[int] = None, seed: int = 0) -> None:
+        """Fit centroids on (a sample of) the current vectors and reassign every row."""
+        n = self.count
+        if n < MIN_TRAIN:
+            return
+        nlist = nlist or int(min(4096, max(16, round(LISTS_PER_SQRT_N * math.sqrt(n)))))
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(n, size=min(n, KMEANS_SAMPLE), replace=False))
+        self.centroids = spherical_kmeans(np.asarray(self.vectors[sample]), nlist, seed=seed)
+        np.save(self._path("centroids.npy"), self.centroids)
+        for start in range(0, n, ASSIGN_BLOCK):
+            block = np.asarray(self.vectors[start:min(n, start + ASSIGN_BLOCK)])
+            self.lists[start:start + len(block)] = self._assign(block)
+        self.lists.flush()
+        self.meta.update(nlist=nlist, trained_count=n)
+        self._lists_cache = None
+        self._write_meta()
+
+    # ----- queries -----
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._lists_cache is None:
+            labels = np.asarray(self.lists[:self.count])
+            order = np.argsort(labels, kind="stable")
+            bounds = np.searchsorted(labels[order], np.arange(self.meta["nlist"] + 1))
+            self._lists_cache = (order, bounds)
+        return self._lists_cache
+
+    def search_vectors(self, q: np.ndarray, top_k: int, nprobe: int = DEFAULT_NPROBE) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, scores) of the top_k rows for one unit query vector, best first."""
+        n = self.count
+        if n == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        if self.centroids is None or nprobe >= self.meta["nlist"]:
+            rows = None
+            scores = np.asarray(self.vectors[:n]) @ q
+        else:
+            order, bounds = self._inverted_lists()
+            probe = np.argpartition(-(self.centroids @ q), nprobe)[:nprobe]
+            rows = np.sort(np.concatenate([order[bounds[c]:bounds[c + 1]] for c in probe]))
+            scores = self.vectors[rows] @ q
+        k = min(top_k, len(scores))
+        if k == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return (best if rows is None else rows[best]), scores[best]
+
+    def search(self, query: str, top_k: int = 3, similarity_threshold: float = 0.0,
+               nprobe: int = DEFAULT_NPROBE) -> List[Tuple[float, Dict]]:
+        """[(similarity, {"id", "task", "outcome"})] best first, like SimpleVectorStore.search()."""
+        rows, scores = self.search_vectors(embed([query], self.dim)[0], top_k, nprobe)
+        keep = scores >= similarity_threshold
+        return list(zip(scores[keep].astype(float).tolist(), self.docs(rows[keep])))
+
+    def docs(self, rows: Iterable[int]) -> List[Dict]:
+        rows = list(rows)
+        if not rows:
+            return []  # docs.jsonl doesn't exist until the first insert
+        with open(self._path("docs.jsonl"), "rb") as f:
+            out = []
+            for row in rows:
+                f.seek(int(self.offsets[row]))
+                out.append(json.loads(f.readline()))
+            return out
+
+    def iter_docs(self) -> Iterator[Dict]:
+        """Every indexed episode in insertion order, read lazily."""
+        if not self.count:
+            return
+        with open(self._path("docs.jsonl"), "rb") as f:
+            for _, line in zip(range(self.count), f):
+                yield json.loads(line)
+
+    def ids(self) -> set:
+        return {doc["id"] for doc in self.iter_docs()}
+
+    def stats(self) -> Dict:
+        sizes = np.bincount(np.asarray(self.lists[:self.count]), minlength=self.meta["nlist"]) if self.centroids is not None else []
+        return dict(self.meta, largest_list=int(max(sizes)) if len(sizes) else 0,
+                    disk_bytes=sum(os.path.getsize(self._path(name)) for name in os.listdir(self.index_dir)))
+
+
+def rebuild(index_dir: str, episodes: Iterable[Dict], dim: int = DEFAULT_DIM) -> EpisodeIndex:
+    """Replace the index in index_dir with one built from `episodes`."""
+    if os.path.isdir(index_dir):
+        for name in os.listdir(index_dir):
+            os.remove(os.path.join(index_dir, name))
+    index = EpisodeIndex(index_dir, dim)
+    index.add_many(list(episodes))
+    return index
+
+
+# ---------- BENCHMARK --------------------------------------------------------
+
+def synthetic_episodes(n: int, topics: int = 400, vocab: int = 8000, seed: int = 0) -> Tuple[List[Dict], List[str]]:
+    """n topic-clustered episodes plus one query per topic (words drawn from that topic)."""
+    rng = np.random.default_rng(seed)
+    words = np.array([f"w{i}" for i in range(vocab)])
+    topic_words = [rng.choice(vocab, size=40, replace=False) for _ in range(topics)]
+    episodes = []
+    for i in range(n):
+        t = topic_words[rng.integers(topics)]
+        picks = np.concatenate([rng.choice(t, size=24), rng.integers(vocab, size=12)])
+        text = " ".join(words[picks])
+        episodes.append({"id": f"ep{i:06d}", "task": text[:60], "outcome": "done", "context": text})
+    queries = [" ".join(words[rng.choice(t, size=8)]) for t in topic_words]
+    return episodes, queries
+
+
+def bench(sizes: List[int], k: int, nprobes: List[int], queries_per_size: int) -> None:
+    print(f"{'episodes':>9} {'nprobe':>7} {'recall@' + str(k):>9} {'p50 ms':>8} {'p95 ms':>8} {'vs exact':>9}")
+    for n in sizes:
+        episodes, queries = synthetic_episodes(n)
+        queries = (queries * (queries_per_size // len(queries) + 1))[:queries_per_size]
+        with tempfile.TemporaryDirectory() as tmp:
+            t0 = time.perf_counter()
+            index = rebuild(os.path.join(tmp, "ann_index"), episodes)
+            build = time.perf_counter() - t0
+            qv = embed(queries, index.dim)
+
+            def run(nprobe):
+                results, times = [], []
+                for q in qv:
+                    t = time.perf_counter()
+                    rows, _ = index.search_vectors(q, k, nprobe)
+                    times.append(time.perf_counter() - t)
+                    results.append(set(rows.tolist()))
+                return results, np.array(times) * 1000
+
+            exact, exact_ms = run(1 << 30)
+            print(f"{n:>9} {'exact':>7} {1.0:>9.3f} {np.median(exact_ms):>8.2f} {np.percentile(exact_ms, 95):>8.2f} {1.0:>8.1f}x"
+                  f"   (build {build:.1f}s, nlist {index.meta['nlist']})")
+            for nprobe in nprobes:
+                if index.centroids is None or nprobe >= index.meta["nlist"]:
+                    continue
+                found, ms = run(nprobe)
+                recall = np.mean([len(a & b) / max(1, len(b)) for a, b in zip(found, exact)])
+                print(f"{n:>9} {nprobe:>7} {recall:>9.3f} {np.median(ms):>8.2f} {np.percentile(ms, 95):>8.2f} "
+                      f"{np.median(exact_ms) / np.median(ms):>8.1f}x")
+
+
+# ---------- MAIN -------------------------------------------------------------
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="PHALANX episode ANN index tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("bench", help="Recall@k vs latency on a synthetic episode archive.")
+    b.add_argument("--sizes", type=int, nargs="+", default=[5000, 20000, 50000])
+    b.add_argument("--k", type=int, default=10)
+    b.add_argument("--nprobe", type=int, nargs="+", default=[2, 4, DEFAULT_NPROBE, 16, 32])
+    b.add_argument("--queries", type=int, default=400)
+    s = sub.add_parser("stats", help="Print an index's metadata.")
+    s.add_argument("index_dir")
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        bench(args.sizes, args.k, args.nprobe, args.queries)
+    else:
+        if not EpisodeIndex.exists(args.index_dir):
+            print(f"No index in {args.index_dir}", file=sys.stderr)
+            return 1
+        print(json.dumps(EpisodeIndex(args.index_dir).stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
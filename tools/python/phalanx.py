@@ -1,18 +1,48 @@
+import time # ensure time is imported (first, so the startup report covers the other imports)
+_startup_t0 = time.perf_counter()
 import sys
 import os
+import importlib # ensure importlib is imported
 import argparse # Ensure argparse is imported for the new class
 import json # ensure json is imported
 import re # ensure re is imported
 import datetime # ensure datetime is imported
 import uuid # ensure uuid is imported
-import requests # ensure requests is imported
-import time # ensure time is imported
 import hashlib # ensure hashlib is imported
+import sqlite3 # ensure sqlite3 is imported
+import threading # ensure threading is imported
+import zlib # ensure zlib is imported
 from typing import List, Tuple, Dict # ensure typing is imported
 from html import escape # ensure html is imported
 import unicodedata # ensure unicodedata is imported
-from pydantic import ValidationError # ensure pydantic is imported
 
+# requests, pydantic, concurrent.futures and the phalanx.llm / phalanx.core.episodic_memory / phalanx.cli modules are
+# imported on first use via lazy_import(), so commands that don't need them (create_doc, validate_workspace, ...) don't
+# pay for loading them. --startup_report (or PHALANX_STARTUP_REPORT=1) prints what startup spent its time on; the flag
+# runs the built-in CLI, the env var also reports on the phalanx.cli path (where "import phalanx.cli" is the big line).
+
+# --- Startup Timing & Lazy Imports ---
+_startup_events = [] # (label, seconds) in the order they happened
+
+def record_startup(label, seconds):
+    _startup_events.append((label, seconds))
+
+def lazy_import(module_name):
+    """Imports a module on first use, recording the time it took for the startup report."""
+    module = sys.modules.get(module_name)
+    if module is None:
+        t0 = time.perf_counter()
+        module = importlib.import_module(module_name)
+        record_startup(f"import {module_name}", time.perf_counter() - t0)
+    return module
+
+def print_startup_report():
+    print("\n--- PHALANX Startup Report (use python -X importtime for per-module detail) ---", file=sys.stderr)
+    for label, seconds in _startup_events:
+        print(f"  {seconds * 1000:8.1f} ms  {label}", file=sys.stderr)
+    print(f"  {(time.perf_counter() - _startup_t0) * 1000:8.1f} ms  total since phalanx.py started", file=sys.stderr)
+
+record_startup("import stdlib modules", time.perf_counter() - _startup_t0)
 
 # --- BEGIN PHALANX Modernization ---
 # Get the directory of this script (phalanx.py in project root)
@@ -28,7 +58,12 @@ if _phalanx_package_dir not in sys.path:
     sys.path.insert(0, _phalanx_package_dir)
     print(f"INFO: Added '{_phalanx_package_dir}' to sys.path.", flush=True)
 
-# Now import from the packaged PHALANX system
+# Now import from the packaged PHALANX system. Only the config is loaded here; the parser, episodic memory and the
+# package CLI are loaded on first use (load_perplexity_parser, load_episodic_memory, load_package_cli).
+PerplexityCoTParser = None
+Episode = None
+SimpleVectorStore = None
+_config_t0 = time.perf_counter()
 try:
     # ESSENTIAL_CONFIG is now dynamically configured based on PHALANX_INVOCATION_CWD
     from phalanx.core.config import ESSENTIAL_CONFIG
@@ -50,24 +85,62 @@ try:
     ESSENTIAL_CONFIG_LOADED = config_manager.get_config()
     
     print(f"INFO: Successfully initialized config from phalanx.core. PHALANX_ROOT: {config_manager.get_phalanx_root()}", flush=True)
-
-    # Import the new main entry point
-    from phalanx.cli import main as phalanx_cli_main
-    # Import other necessary components that were previously top-level in this script
-    from phalanx.llm.consultation import PerplexityCoTParser
-    from phalanx.core.episodic_memory import Episode, SimpleVectorStore
+    record_startup("load phalanx.core config", time.perf_counter() - _config_t0)
 
 
 except ImportError as e:
     print(f"ERROR: Could not import from packaged PHALANX. Ensure PHALANX_workspace/phalanx exists and is structured correctly: {e}", file=sys.stderr)
     print(f"Current sys.path: {sys.path}", file=sys.stderr)
     # Fallback for critical components if package loading fails, so script can still potentially run with internal defs
-    PerplexityCoTParser = None 
-    Episode = None
-    SimpleVectorStore = None
     print(f"WARNING: Falling back on internal definitions for some components due to ImportError: {e}", file=sys.stderr)
+    ESSENTIAL_CONFIG_LOADED = {} # main() reports the missing configuration instead of failing with a NameError
     # sys.exit(1) # Keep running for now, rely on later checks for missing components
 
+def load_perplexity_parser():
+    """PerplexityCoTParser from the phalanx package, imported on first use (None if unavailable)."""
+    global PerplexityCoTParser
+    if PerplexityCoTParser is None:
+        try: PerplexityCoTParser = lazy_import("phalanx.llm.consultation").PerplexityCoTParser
+        except ImportError as e: print(f"WARNING: PerplexityCoTParser unavailable: {e}", file=sys.stderr)
+    return PerplexityCoTParser
+
+def load_episodic_memory():
+    """(Episode, SimpleVectorStore) from the phalanx package, imported on first use ((None, None) if unavailable)."""
+    global Episode, SimpleVectorStore
+    if Episode is None or SimpleVectorStore is None:
+        try:
+            episodic_memory = lazy_import("phalanx.core.episodic_memory")
+            Episode, SimpleVectorStore = episodic_memory.Episode, episodic_memory.SimpleVectorStore
+        except ImportError as e: print(f"WARNING: Episodic memory unavailable: {e}", file=sys.stderr)
+    return Episode, SimpleVectorStore
+
+def load_package_cli():
+    """main() of the packaged CLI (phalanx.cli), or None if the package isn't importable."""
+    try: return lazy_import("phalanx.cli").main
+    except ImportError as e:
+        print(f"WARNING: phalanx.cli unavailable, using the built-in CLI: {e}", file=sys.stderr)
+        return None
+
+# Commands and options that only the built-in CLI (main() below) defines. phalanx.cli doesn't know them, so __main__
+# sends any invocation that uses one to main() instead of the package CLI (see wants_builtin_cli).
+BUILTIN_CLI_COMMANDS = {"consult_batch", "cache_stats"}
+BUILTIN_CLI_OPTIONS = {"--stream", "--index", "--reindex", "--nprobe", "--recheck", "--startup_report"}
+# Top-level options that take a separate value, which must not be mistaken for the command.
+TOP_LEVEL_VALUE_OPTIONS = {"--role"}
+
+def wants_builtin_cli(argv):
+    """True if argv's command (its first positional token) or one of its --options exists only in the built-in CLI."""
+    command, skip_value = None, False
+    for arg in argv:
+        if arg == "--": break  # Everything after "--" is a value.
+        if skip_value: skip_value = False; continue
+        if arg.startswith("--"):
+            name = arg.split("=", 1)[0]
+            if name in BUILTIN_CLI_OPTIONS: return True
+            skip_value = command is None and name in TOP_LEVEL_VALUE_OPTIONS and "=" not in arg
+        elif command is None and not arg.startswith("-"): command = arg
+    return command in BUILTIN_CLI_COMMANDS
+
 # --- END PHALANX Modernization ---
 
 # Definition of the custom Zsh-aware argument parser
@@ -205,50 +278,170 @@ def log_audit(role, action, details):
         print(f"ERROR (log_audit): Failed to write to actual audit log file '{audit_log_file_path if audit_log_file_path else 'Not Configured'}': {e}", file=sys.stderr)
 
 # --- LLM Caching Functions ---
-def get_cached_response(query_text, agent_profile_name):
+# All cached responses live in one SQLite store (<llm_cache>/llm_cache.sqlite3) instead of one JSON file per query:
+# payloads are zlib-compressed, lookups go through the primary key, each agent profile has its own TTL
+# (agent_profiles.<name>.cache_ttl_seconds, 0 disables caching), and once the payloads exceed
+# llm_cache_settings.max_bytes the least recently used entries are evicted. Hit/miss counters persist in the store.
+LLM_CACHE_DB_NAME = "llm_cache.sqlite3"
+LLM_CACHE_DEFAULT_TTL_SECONDS = 86400
+LLM_CACHE_DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+LLM_CACHE_EVICT_TO = 0.9 # Fraction of max_bytes to shrink to, so eviction doesn't run on every store
+
+class LLMResponseCache:
+    """SQLite-backed LLM response store. One connection per process, shared between threads under a lock."""
+    def __init__(self, db_path, max_bytes=LLM_CACHE_DEFAULT_MAX_BYTES):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL") # Readers don't block the writer (concurrent CLI runs)
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, profile TEXT NOT NULL, created REAL NOT NULL,
+                                                accessed REAL NOT NULL, size INTEGER NOT NULL, payload BLOB NOT NULL);
+            CREATE INDEX IF NOT EXISTS entries_by_access ON entries (accessed);
+            CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        """)
+
+    @staticmethod
+    def make_key(query_text, agent_profile_name):
+        # Same key as the old file-per-query cache, so migrated entries keep hitting.
+        return hashlib.md5(f"{query_text}_{agent_profile_name}".encode('utf-8')).hexdigest()
+
+    def _bump(self, name, amount=1):
+        self._conn.execute("INSERT INTO counters (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, amount))
+
+    def get(self, key, ttl_seconds):
+        """Returns (response, status); status is 'hit', 'miss' or 'stale' (expired entries are dropped)."""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT created, size, payload FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._bump("misses")
+                return None, "miss"
+            created, size, payload = row
+            if now - created >= ttl_seconds:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._bump("misses"); self._bump("stale"); self._bump("bytes", -size)
+                return None, "stale"
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self._bump("hits")
+        return json.loads(zlib.decompress(payload)), "hit"
+
+    def put(self, key, agent_profile_name, response, created=None):
+        """Stores a response; returns (compressed size, number of entries evicted to make room)."""
+        payload = zlib.compress(json.dumps(response, separators=(",", ":")).encode('utf-8'))
+        created = created if created is not None else time.time()
+        with self._lock, self._conn:
+            old = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute("INSERT OR REPLACE INTO entries (key, profile, created, accessed, size, payload) VALUES (?, ?, ?, ?, ?, ?)",
+                               (key, agent_profile_name, created, created, len(payload), payload))
+            self._bump("stores"); self._bump("bytes", len(payload) - (old[0] if old else 0))
+            evicted = self._evict()
+        return len(payload), evicted
+
+    def _evict(self):
+        total = self.counter("bytes")
+        if total <= self.max_bytes: return 0
+        excess, freed, victims = total - int(self.max_bytes * LLM_CACHE_EVICT_TO), 0, []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            if freed >= excess: break
+            victims.append((key,)); freed += size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+        self._bump("evictions", len(victims)); self._bump("bytes", -freed)
+        return len(victims)
+
+    def counter(self, name):
+        row = self._conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+            entries, profiles = self._conn.execute("SELECT COUNT(*), COUNT(DISTINCT profile) FROM entries").fetchone()
+        lookups = counters.get("hits", 0) + counters.get("misses", 0)
+        return {"entries": entries, "profiles": profiles, "bytes": counters.get("bytes", 0), "max_bytes": self.max_bytes,
+                "hits": counters.get("hits", 0), "misses": counters.get("misses", 0), "stale": counters.get("stale", 0),
+                "stores": counters.get("stores", 0), "evictions": counters.get("evictions", 0),
+                "hit_rate": counters.get("hits", 0) / lookups if lookups else 0.0}
+
+    def import_legacy_files(self, cache_dir):
+        """Moves <hash>.json files from the old file-per-query cache into the store; returns the count."""
+        imported = 0
+        for name in os.listdir(cache_dir):
+            if not name.endswith(".json"): continue
+            path = os.path.join(cache_dir, name)
+            try:
+                with open(path, 'r', encoding='utf-8') as f: response = json.load(f)
+                self.put(name[:-len(".json")], "", response, created=os.path.getmtime(path))
+                os.remove(path)
+                imported += 1
+            except Exception as e:
+                log_audit("CACHE_SYSTEM", "Cache Migration Error", f"Could not import {path}: {str(e)}")
+        return imported
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+def get_llm_cache(purpose="Cache Warning"):
+    """The process-wide LLMResponseCache, or None (after an audit note) if the cache can't be opened."""
+    global _llm_cache
     config = ESSENTIAL_CONFIG_LOADED
     phalanx_root = config.get("phalanx_root")
     if not phalanx_root:
-        log_audit("CACHE_SYSTEM", "Cache Warning", "phalanx_root not defined, LLM cache disabled.")
+        log_audit("CACHE_SYSTEM", purpose, "phalanx_root not defined, LLM cache disabled.")
         return None
     cache_dir_config = config.get("directories", {}).get("llm_cache")
     if not cache_dir_config:
-        log_audit("CACHE_SYSTEM", "Cache Warning", "llm_cache directory not configured, LLM cache disabled.")
+        log_audit("CACHE_SYSTEM", purpose, "llm_cache directory not configured, LLM cache disabled.")
         return None
-    cache_dir = os.path.join(phalanx_root, cache_dir_config)
-    query_hash = hashlib.md5(f"{query_text}_{agent_profile_name}".encode('utf-8')).hexdigest()
-    cache_path = os.path.join(cache_dir, f"{query_hash}.json")
-    if os.path.exists(cache_path):
-        if time.time() - os.path.getmtime(cache_path) < 86400:
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            cache_dir = os.path.join(phalanx_root, cache_dir_config)
+            max_bytes = config.get("llm_cache_settings", {}).get("max_bytes", LLM_CACHE_DEFAULT_MAX_BYTES)
             try:
-                with open(cache_path, 'r', encoding='utf-8') as f:
-                    log_audit("CACHE_SYSTEM", "Cache Hit", f"Query hash: {query_hash}, Profile: {agent_profile_name}")
-                    return json.load(f)
-            except Exception as e:
-                log_audit("CACHE_SYSTEM", "Cache Error", f"Read error for {cache_path}: {str(e)}")
-        else:
-            log_audit("CACHE_SYSTEM", "Cache Stale", f"Cache file {cache_path} too old.")
-    return None
+                os.makedirs(cache_dir, exist_ok=True)
+                _llm_cache = LLMResponseCache(os.path.join(cache_dir, LLM_CACHE_DB_NAME), max_bytes=max_bytes)
+            except (OSError, sqlite3.Error) as e:
+                log_audit("CACHE_SYSTEM", purpose, f"Could not open LLM cache in {cache_dir}: {str(e)}")
+                return None
+            imported = _llm_cache.import_legacy_files(cache_dir)
+            if imported: log_audit("CACHE_SYSTEM", "Cache Migrated", f"Imported {imported} legacy cache file(s) into {_llm_cache.db_path}")
+        return _llm_cache
+
+def get_llm_cache_ttl(agent_profile_name):
+    config = ESSENTIAL_CONFIG_LOADED
+    default_ttl = config.get("llm_cache_settings", {}).get("default_ttl_seconds", LLM_CACHE_DEFAULT_TTL_SECONDS)
+    return (config.get("agent_profiles", {}).get(agent_profile_name) or {}).get("cache_ttl_seconds", default_ttl)
+
+def get_cached_response(query_text, agent_profile_name):
+    ttl_seconds = get_llm_cache_ttl(agent_profile_name)
+    if ttl_seconds <= 0: return None
+    cache = get_llm_cache("Cache Warning")
+    if cache is None: return None
+    query_hash = LLMResponseCache.make_key(query_text, agent_profile_name)
+    try:
+        response, status = cache.get(query_hash, ttl_seconds)
+    except (sqlite3.Error, zlib.error, ValueError) as e:
+        log_audit("CACHE_SYSTEM", "Cache Error", f"Read error for {query_hash}: {str(e)}")
+        return None
+    if status == "hit":
+        log_audit("CACHE_SYSTEM", "Cache Hit", f"Query hash: {query_hash}, Profile: {agent_profile_name}")
+    elif status == "stale":
+        log_audit("CACHE_SYSTEM", "Cache Stale", f"Entry {query_hash} older than {ttl_seconds}s (profile {agent_profile_name}).")
+    return response
 
 def cache_response(query_text, agent_profile_name, response):
-    config = ESSENTIAL_CONFIG_LOADED
-    phalanx_root = config.get("phalanx_root")
-    if not phalanx_root:
-        log_audit("CACHE_SYSTEM", "Cache Store Warning", "phalanx_root not defined, LLM response not cached.")
-        return
-    cache_dir_config = config.get("directories", {}).get("llm_cache")
-    if not cache_dir_config:
-        log_audit("CACHE_SYSTEM", "Cache Store Warning", "llm_cache directory not configured, LLM response not cached.")
-        return
-    cache_dir = os.path.join(phalanx_root, cache_dir_config)
-    query_hash = hashlib.md5(f"{query_text}_{agent_profile_name}".encode('utf-8')).hexdigest()
-    cache_path = os.path.join(cache_dir, f"{query_hash}.json")
+    if get_llm_cache_ttl(agent_profile_name) <= 0: return
+    cache = get_llm_cache("Cache Store Warning")
+    if cache is None: return
+    query_hash = LLMResponseCache.make_key(query_text, agent_profile_name)
     try:
-        with open(cache_path, 'w', encoding='utf-8') as f:
-            json.dump(response, f, indent=2)
-        log_audit("CACHE_SYSTEM", "Cache Stored", f"Query hash: {query_hash}, Profile: {agent_profile_name}")
-    except Exception as e:
-        log_audit("CACHE_SYSTEM", "Cache Store Error", f"Failed to write to {cache_path}: {str(e)}")
+        size, evicted = cache.put(query_hash, agent_profile_name, response)
+        log_audit("CACHE_SYSTEM", "Cache Stored", f"Query hash: {query_hash}, Profile: {agent_profile_name}, Size: {size} bytes")
+        if evicted: log_audit("CACHE_SYSTEM", "Cache Evicted", f"{evicted} least recently used entr{'y' if evicted == 1 else 'ies'} removed (limit {cache.max_bytes} bytes)")
+    except (sqlite3.Error, TypeError, ValueError) as e:
+        log_audit("CACHE_SYSTEM", "Cache Store Error", f"Failed to store {query_hash}: {str(e)}")
 
 # --- LLM Context Preservation Functions ---
 def create_context_file(args, context_type: str, content: str) -> str:
@@ -378,6 +571,45 @@ def ensure_directories_exist(role_for_log="SYSTEM_SETUP"):
         raise PhalanxError("Failed to ensure all required directory structures.")
     return True
 
+STARTUP_CACHE_VERSION = 1
+STARTUP_CACHE_FILE = ".phalanx_startup_cache.json" # Under phalanx_root unless files.startup_cache says otherwise
+
+def config_fingerprint(config):
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def get_startup_cache_path():
+    config = ESSENTIAL_CONFIG_LOADED
+    phalanx_root = config.get("phalanx_root")
+    cache_file = config.get("files", {}).get("startup_cache", STARTUP_CACHE_FILE)
+    if os.path.isabs(cache_file): return cache_file
+    return os.path.join(phalanx_root, cache_file) if phalanx_root else None
+
+def run_startup_checks(role_for_log="SYSTEM_SETUP", use_cache=True):
+    """
+    validate_config() + ensure_directories_exist(), skipped when an earlier run already passed both for a config with the
+    same content hash. Any change to the loaded config (edited config module, different PHALANX_INVOCATION_CWD) reruns
+    them; --recheck forces a rerun, e.g. after deleting workspace directories.
+    """
+    config = ESSENTIAL_CONFIG_LOADED
+    t0 = time.perf_counter()
+    fingerprint = config_fingerprint(config)
+    cache_path = get_startup_cache_path()
+    if use_cache and cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "r", encoding='utf-8') as f: cached = json.load(f)
+            if cached.get("version") == STARTUP_CACHE_VERSION and cached.get("config_hash") == fingerprint:
+                record_startup("startup checks (cached)", time.perf_counter() - t0)
+                return True
+        except (OSError, ValueError): pass # Unreadable cache: fall through to the full checks
+
+    validate_config() # Validates ESSENTIAL_CONFIG_LOADED
+    ensure_directories_exist(role_for_log)
+    record_startup("validate config + ensure directories", time.perf_counter() - t0)
+    if cache_path:
+        try: write_safely(cache_path, json.dumps({"version": STARTUP_CACHE_VERSION, "config_hash": fingerprint, "checked_at": datetime.datetime.now().isoformat()}, indent=2))
+        except PhalanxError as e: print(f"WARNING: Could not write startup cache: {e}", file=sys.stderr)
+    return True
+
 def handle_create_doc(args):
     config = ESSENTIAL_CONFIG_LOADED
     doc_type = args.type
@@ -408,12 +640,13 @@ def handle_create_doc(args):
     log_audit(args.role, "Created document", f"Type: {doc_type}, Title: '{title}', File: {output_path}")
     print(f"Document created successfully: {output_path}")
 
-def log_structured_llm_consultation(args, raw_llm_json, raw_json_filename):
+def log_structured_llm_consultation(args, raw_llm_json, raw_json_filename, stream_metrics=None):
     config = ESSENTIAL_CONFIG_LOADED
-    if not PerplexityCoTParser:
+    parser_class = load_perplexity_parser()
+    if not parser_class:
         raise PhalanxError("PerplexityCoTParser not available for structured logging.")
 
-    parser = PerplexityCoTParser()
+    parser = parser_class()
     parsed_result = parser.parse_response(raw_llm_json)
     if parsed_result.get("error"):
         raise PhalanxError("Failed to parse LLM response JSON.", context={"parser_error": parsed_result['error']})
@@ -428,6 +661,9 @@ def log_structured_llm_consultation(args, raw_llm_json, raw_json_filename):
         "query_summary_slug": slugify(args.query[:30]),
         "raw_json_log_file": os.path.basename(raw_json_filename) if raw_json_filename else "N/A"
     }
+    if stream_metrics:
+        frontmatter.update({"streamed": True, "time_to_first_token_s": stream_metrics.get("time_to_first_token_s"),
+                            "tokens_per_second": stream_metrics.get("tokens_per_second"), "total_time_s": stream_metrics.get("total_time_s")})
     yaml_frontmatter_str = "---\n" + "".join([f"{k}: \"{v}\"\n" if isinstance(v, str) else f"{k}: {v if v is not None else 'null'}\n" for k, v in frontmatter.items()]) + "---\n\n"
     
     md_body = f"# LLM Consultation & Analysis ({args.role} via {args.agent_profile})\n\n"
@@ -466,33 +702,80 @@ def log_structured_llm_consultation(args, raw_llm_json, raw_json_filename):
     log_audit(args.role, "Saved structured LLM log", f"File: {output_path}")
     print(f"Structured LLM consultation log saved successfully: {output_path}")
 
-def send_to_perplexity(query_text, agent_profile_name):
-    config = ESSENTIAL_CONFIG_LOADED
+# --- LLM HTTP Transport ---
+PERPLEXITY_API_URL = "https://api.perplexity.ai/chat/completions" # Overridable via PERPLEXITY_API_URL (e.g. a local stub)
+LLM_HTTP_POOL_SIZE = 8
+
+_http_session = None
+_http_session_pool_size = 0
+_http_session_lock = threading.Lock()
+
+def get_http_session(pool_size=LLM_HTTP_POOL_SIZE):
+    """Process-wide requests.Session, so LLM calls reuse keep-alive connections; grows its pool to pool_size."""
+    global _http_session, _http_session_pool_size
+    requests = lazy_import("requests")
+    with _http_session_lock:
+        if _http_session is None:
+            _http_session = requests.Session()
+        if pool_size > _http_session_pool_size:
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+            _http_session.mount("https://", adapter); _http_session.mount("http://", adapter)
+            _http_session_pool_size = pool_size
+        return _http_session
+
+class TokenBucket:
+    """Thread-safe token bucket: acquire() blocks until a token is available (rate tokens/s, up to burst saved)."""
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = (1.0 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def get_perplexity_api_key():
     api_key = os.environ.get("PERPLEXITY_API_KEY")
-    key_source = "environment variable"
     if not api_key:
         mcp_json_path = os.path.join(".cursor", "mcp.json") 
         if os.path.exists(mcp_json_path):
             try:
                 with open(mcp_json_path, "r") as f: mcp_config = json.load(f)
                 api_key = mcp_config.get("mcoServers", {}).get("github.com/pashpashpash/perplexity-mcp", {}).get("env", {}).get("PERPLEXITY_API_KEY")
-                if api_key: key_source = ".cursor/mcp.json"
             except Exception: pass # Ignore errors reading mcp.json
     if not api_key: raise PhalanxError("Perplexity API key not found", context={"detail": "PERPLEXITY_API_KEY not found"})
-    
-    agent_config = config["agent_profiles"].get(agent_profile_name)
-    if not agent_config: raise PhalanxError(f"Agent profile '{agent_profile_name}' not found", context={"profile_name": agent_profile_name})
+    return api_key
 
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json", "Accept": "application/json"}
+def build_perplexity_payload(query_text, agent_config):
     payload = {
         "model": agent_config.get("model"), "messages": [{"role": "system", "content": agent_config.get("system_prompt", "Be precise.")}, {"role": "user", "content": query_text}],
         "temperature": agent_config.get("temperature"), "max_tokens": agent_config.get("max_tokens"),
     }
-    payload = {k: v for k, v in payload.items() if v is not None} # Remove None values
+    return {k: v for k, v in payload.items() if v is not None} # Remove None values
+
+def send_to_perplexity(query_text, agent_profile_name, api_url=None):
+    config = ESSENTIAL_CONFIG_LOADED
+    api_key = get_perplexity_api_key()
+    agent_config = config["agent_profiles"].get(agent_profile_name)
+    if not agent_config: raise PhalanxError(f"Agent profile '{agent_profile_name}' not found", context={"profile_name": agent_profile_name})
+
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json", "Accept": "application/json"}
+    payload = build_perplexity_payload(query_text, agent_config)
     
-    api_url = "https://api.perplexity.ai/chat/completions"
+    api_url = api_url or os.environ.get("PERPLEXITY_API_URL", PERPLEXITY_API_URL)
+    requests = lazy_import("requests")
     try:
-        response = requests.post(api_url, headers=headers, json=payload, timeout=60)
+        response = get_http_session().post(api_url, headers=headers, json=payload, timeout=60)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.HTTPError as e_http:
@@ -502,7 +785,75 @@ def send_to_perplexity(query_text, agent_profile_name):
     except json.JSONDecodeError as e_json:
         raise PhalanxError("Failed to decode JSON from Perplexity API", context={"error": str(e_json), "response_text": response.text if 'response' in locals() else 'N/A'})
 
-def send_to_perplexity_with_retry(query_text, agent_profile_name, max_retries=3, session_id=None):
+def stream_from_perplexity(query_text, agent_profile_name, on_token, raw_log=None, metrics=None, api_url=None):
+    """
+    Streamed chat completion: calls on_token(text) for each content delta as the server-sent events arrive and appends
+    every event payload to raw_log (one JSON object per line) as it is received. Returns the assembled response in the
+    same shape as send_to_perplexity(); fills `metrics` with time-to-first-token, tokens/sec and token counts.
+    """
+    config = ESSENTIAL_CONFIG_LOADED
+    api_key = get_perplexity_api_key()
+    agent_config = config["agent_profiles"].get(agent_profile_name)
+    if not agent_config: raise PhalanxError(f"Agent profile '{agent_profile_name}' not found", context={"profile_name": agent_profile_name})
+
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json", "Accept": "text/event-stream"}
+    payload = build_perplexity_payload(query_text, agent_config)
+    payload["stream"] = True
+    api_url = api_url or os.environ.get("PERPLEXITY_API_URL", PERPLEXITY_API_URL)
+    metrics = metrics if metrics is not None else {}
+    requests = lazy_import("requests")
+    final = {"object": "chat.completion"} # Last id/model/created/usage/citations seen; deltas are not kept
+    parts, chunks, finish_reason = [], 0, None
+    t_start = time.perf_counter()
+    t_first = None
+    try:
+        # Read timeout applies between chunks, so long answers aren't cut off as long as tokens keep coming.
+        with get_http_session().post(api_url, headers=headers, json=payload, timeout=(10, 60), stream=True) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"): continue # Blank separators, comments, event:/id: fields
+                data = line[len("data:"):].strip()
+                if data == "[DONE]": break
+                if raw_log:
+                    raw_log.write(data + "\n"); raw_log.flush()
+                event = json.loads(data)
+                for key in ("id", "model", "created", "usage", "citations"):
+                    if event.get(key) is not None: final[key] = event[key]
+                choice = (event.get("choices") or [{}])[0]
+                finish_reason = choice.get("finish_reason") or finish_reason
+                text = (choice.get("delta") or {}).get("content")
+                if text:
+                    if t_first is None: t_first = time.perf_counter()
+                    parts.append(text); chunks += 1
+                    on_token(text)
+    except requests.exceptions.HTTPError as e_http:
+        raise PhalanxError(f"Perplexity API HTTP error {e_http.response.status_code}", context={"status": e_http.response.status_code, "text": e_http.response.text, "streamed_tokens": chunks})
+    except requests.exceptions.RequestException as e_req:
+        raise PhalanxError("Perplexity API request error", context={"error": str(e_req), "streamed_tokens": chunks})
+    except json.JSONDecodeError as e_json:
+        raise PhalanxError("Failed to decode server-sent event from Perplexity API", context={"error": str(e_json), "streamed_tokens": chunks})
+
+    t_end = time.perf_counter()
+    completion_tokens = (final.get("usage") or {}).get("completion_tokens") or chunks # Chunk count if the server sends no usage
+    metrics.update({
+        "time_to_first_token_s": round(t_first - t_start, 3) if t_first is not None else None,
+        "total_time_s": round(t_end - t_start, 3),
+        "completion_tokens": completion_tokens,
+        "tokens_per_second": round(completion_tokens / (t_end - t_first), 1) if t_first is not None and t_end > t_first else None,
+    })
+    final["choices"] = [{"index": 0, "finish_reason": finish_reason, "message": {"role": "assistant", "content": "".join(parts)}}]
+    return final
+
+def is_retryable_llm_error(e):
+    error_str_lower = str(e).lower()
+    context_str_lower = json.dumps(e.context).lower() if e.context else ""
+    return "timeout" in error_str_lower or "timeout" in context_str_lower or \
+           "connect" in error_str_lower or "connect" in context_str_lower or \
+           (e.context and e.context.get("status") in [429, 500, 502, 503, 504]) # Rate limited or common server-side retryable errors
+
+def send_to_perplexity_with_retry(query_text, agent_profile_name, max_retries=3, session_id=None, api_url=None, rate_limiter=None,
+                                  on_token=None, raw_log=None, metrics=None):
+    """Cached, retried LLM call. With on_token the answer is streamed (see stream_from_perplexity); a cache hit returns without calling it."""
     cached = get_cached_response(query_text, agent_profile_name)
     if cached: return cached
     
@@ -515,17 +866,20 @@ def send_to_perplexity_with_retry(query_text, agent_profile_name, max_retries=3,
     last_error = None
     for attempt in range(max_retries):
         try:
-            response_data = send_to_perplexity(final_query_text, agent_profile_name)
+            if rate_limiter: rate_limiter.acquire()
+            if on_token:
+                # A retried stream starts over, so the raw log only ever holds the attempt that produced the answer
+                # (the failed attempts' errors are in the audit log).
+                if raw_log and attempt: raw_log.seek(0); raw_log.truncate()
+                response_data = stream_from_perplexity(final_query_text, agent_profile_name, on_token, raw_log=raw_log, metrics=metrics, api_url=api_url)
+            else:
+                response_data = send_to_perplexity(final_query_text, agent_profile_name, api_url=api_url)
             cache_response(query_text, agent_profile_name, response_data)
             return response_data
         except PhalanxError as e:
             last_error = e
-            error_str_lower = str(e).lower()
-            context_str_lower = json.dumps(e.context).lower() if e.context else ""
-            is_retryable = "timeout" in error_str_lower or "timeout" in context_str_lower or \
-                           "connect" in error_str_lower or "connect" in context_str_lower or \
-                           (e.context and e.context.get("status") in [500, 502, 503, 504]) # Common server-side retryable errors
-            if is_retryable and attempt < max_retries - 1:
+            # Once tokens have been printed a retry would repeat them, so a broken stream is final.
+            if is_retryable_llm_error(e) and not e.context.get("streamed_tokens") and attempt < max_retries - 1:
                 wait_time = 2 ** (attempt + 1)
                 log_audit("LLM_RETRY", f"Retry {attempt+1}/{max_retries}", f"Error: {str(e)[:100]}, Wait: {wait_time}s")
                 time.sleep(wait_time)
@@ -534,36 +888,144 @@ def send_to_perplexity_with_retry(query_text, agent_profile_name, max_retries=3,
     raise PhalanxError("LLM call failed after retries, no specific error captured.", context={"query": query_text, "profile": agent_profile_name})
 
 
-def handle_direct_consult_llm(args):
-    log_audit(args.role, "Initiated direct LLM consultation", f"Profile: {args.agent_profile}, Query: '{args.query[:50]}...'")
-    raw_llm_json_response = send_to_perplexity_with_retry(args.query, args.agent_profile, session_id=args.session_id)
-    
-    if raw_llm_json_response and raw_llm_json_response.get("choices") and raw_llm_json_response["choices"][0].get("message"):
-        print("\n--- LLM Response ---\n" + raw_llm_json_response["choices"][0]["message"].get("content", "No content.") + "\n--------------------\n")
-    
+def get_llm_qa_log_dir():
     config = ESSENTIAL_CONFIG_LOADED
     output_dir_str = config["directories"].get("llm_qa_logs")
+    if not output_dir_str: return None
+    phalanx_root = config.get("phalanx_root")
+    output_dir = os.path.join(phalanx_root, output_dir_str) if not os.path.isabs(output_dir_str) and phalanx_root else output_dir_str
+    return os.path.normpath(output_dir)
+
+def print_llm_token(text):
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+def handle_direct_consult_llm(args):
+    log_audit(args.role, "Initiated direct LLM consultation", f"Profile: {args.agent_profile}, Query: '{args.query[:50]}...'")
+    output_dir = get_llm_qa_log_dir()
+    timestamp_slug = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    query_slug = slugify(args.query[:30])
     raw_json_filename = None
-    if output_dir_str:
-        phalanx_root = config.get("phalanx_root")
-        output_dir = os.path.join(phalanx_root, output_dir_str) if not os.path.isabs(output_dir_str) and phalanx_root else output_dir_str
-        timestamp_slug = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        query_slug = slugify(args.query[:30])
-        raw_json_filename = f"mcp_raw_{timestamp_slug}_{query_slug}.json"
-        raw_json_output_path = os.path.join(os.path.normpath(output_dir), raw_json_filename)
+    stream_metrics = None
+
+    if getattr(args, "stream", False):
+        # Event payloads are appended to the raw log as they arrive, so it stays useful if the stream breaks off.
+        stream_metrics = {}
+        raw_log = None
+        if output_dir:
+            raw_json_filename = f"mcp_raw_{timestamp_slug}_{query_slug}.sse.jsonl"
+            raw_log = open(os.path.join(output_dir, raw_json_filename), "w", encoding='utf-8')
+        print("\n--- LLM Response ---")
         try:
-            write_safely(raw_json_output_path, json.dumps(raw_llm_json_response, indent=2))
-            log_audit(args.role, "Saved raw LLM JSON", f"File: {raw_json_output_path}")
-        except Exception as e_write_raw:
-            log_audit(args.role, "LLM Consult Error", f"Failed to save raw LLM JSON: {e_write_raw}")
-            raw_json_filename = None # Ensure it's None if save failed
+            raw_llm_json_response = send_to_perplexity_with_retry(args.query, args.agent_profile, session_id=args.session_id, on_token=print_llm_token, raw_log=raw_log, metrics=stream_metrics)
+        finally:
+            if raw_log: raw_log.close()
+        if not stream_metrics: # Cache hit, nothing was streamed
+            stream_metrics = None
+            if raw_log: os.remove(raw_log.name)
+            raw_json_filename = None
+            print(((raw_llm_json_response.get("choices") or [{}])[0].get("message") or {}).get("content", "No content."), end="")
+        print("\n--------------------\n")
+        if stream_metrics:
+            ttft, tps = stream_metrics["time_to_first_token_s"], stream_metrics["tokens_per_second"]
+            print(f"First token after {ttft if ttft is not None else 'N/A'}s, {stream_metrics['completion_tokens']} tokens at {tps if tps is not None else 'N/A'} tokens/s")
+            log_audit(args.role, "Saved raw LLM stream", f"File: {os.path.join(output_dir, raw_json_filename) if raw_json_filename else 'N/A'}, Metrics: {json.dumps(stream_metrics)}")
+    else:
+        raw_llm_json_response = send_to_perplexity_with_retry(args.query, args.agent_profile, session_id=args.session_id)
+        if raw_llm_json_response and raw_llm_json_response.get("choices") and raw_llm_json_response["choices"][0].get("message"):
+            print("\n--- LLM Response ---\n" + raw_llm_json_response["choices"][0]["message"].get("content", "No content.") + "\n--------------------\n")
+        if output_dir:
+            raw_json_filename = f"mcp_raw_{timestamp_slug}_{query_slug}.json"
+            raw_json_output_path = os.path.join(output_dir, raw_json_filename)
+            try:
+                write_safely(raw_json_output_path, json.dumps(raw_llm_json_response, indent=2))
+                log_audit(args.role, "Saved raw LLM JSON", f"File: {raw_json_output_path}")
+            except Exception as e_write_raw:
+                log_audit(args.role, "LLM Consult Error", f"Failed to save raw LLM JSON: {e_write_raw}")
+                raw_json_filename = None # Ensure it's None if save failed
     
-    if PerplexityCoTParser: # Check if parser is available before calling
-        log_structured_llm_consultation(args, raw_llm_json=raw_llm_json_response, raw_json_filename=raw_json_filename)
+    if load_perplexity_parser(): # Check if parser is available before calling
+        log_structured_llm_consultation(args, raw_llm_json=raw_llm_json_response, raw_json_filename=raw_json_filename, stream_metrics=stream_metrics)
     else:
         log_audit(args.role, "LLM Structured Log Skipped", "PerplexityCoTParser not available.")
 
 
+def read_batch_queries(path, default_profile):
+    """Yields (line_no, record) from a JSONL file ('-' = stdin). Lines are {"query", ["agent_profile"], ["id"]} or a bare JSON string."""
+    stream = sys.stdin if path == "-" else open(path, "r", encoding='utf-8')
+    try:
+        for line_no, line in enumerate(stream, 1):
+            if not line.strip(): continue
+            try: item = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, {"error": f"Invalid JSON: {e}"}
+                continue
+            if isinstance(item, str): item = {"query": item}
+            if not isinstance(item, dict) or not isinstance(item.get("query"), str) or not item["query"].strip():
+                yield line_no, {"error": "Expected a JSON string or an object with a non-empty 'query'."}
+                continue
+            item.setdefault("agent_profile", default_profile)
+            item.setdefault("id", line_no)
+            yield line_no, item
+    finally:
+        if stream is not sys.stdin: stream.close()
+
+def handle_consult_batch(args):
+    config = ESSENTIAL_CONFIG_LOADED
+    records, failed = [], []
+    for line_no, item in read_batch_queries(args.input, args.agent_profile):
+        if "error" not in item and item["agent_profile"] not in config["agent_profiles"]:
+            item = {"error": f"Agent profile '{item['agent_profile']}' not found"}
+        (failed if "error" in item else records).append((line_no, item))
+
+    # Identical (query, profile) pairs share one request; every input line still gets its own result line.
+    groups = {}
+    for line_no, item in records:
+        groups.setdefault((item["query"], item["agent_profile"]), []).append((line_no, item))
+
+    concurrency = max(1, args.concurrency)
+    rate_limiter = TokenBucket(args.rate, burst=args.burst or concurrency) if args.rate > 0 else None
+    get_http_session(pool_size=concurrency)
+    log_audit(args.role, "Initiated batch LLM consultation", f"Queries: {len(records)}, Unique: {len(groups)}, Invalid: {len(failed)}, Concurrency: {concurrency}, Rate: {args.rate or 'unlimited'}/s")
+
+    out = sys.stdout if args.output == "-" else open(args.output, "a" if args.append else "w", encoding='utf-8')
+    counts = {"ok": 0, "error": len(failed)}
+
+    def emit(line_no, item, result):
+        record = {"line": line_no, "id": item.get("id", line_no), "query": item.get("query"), "agent_profile": item.get("agent_profile")}
+        record.update(result)
+        out.write(json.dumps(record) + "\n"); out.flush()
+
+    def consult(query_text, agent_profile_name):
+        t0 = time.perf_counter()
+        try:
+            response = send_to_perplexity_with_retry(query_text, agent_profile_name, session_id=args.session_id, api_url=args.api_url, rate_limiter=rate_limiter)
+            content = ((response or {}).get("choices") or [{}])[0].get("message", {}).get("content")
+            return {"ok": True, "content": content, "response": response, "seconds": round(time.perf_counter() - t0, 3)}
+        except PhalanxError as e:
+            return {"ok": False, "error": e.message, "error_context": e.context, "seconds": round(time.perf_counter() - t0, 3)}
+
+    futures_module = lazy_import("concurrent.futures")
+    t_start = time.perf_counter()
+    try:
+        for line_no, item in failed: emit(line_no, item, {"ok": False, "error": item["error"]})
+        with futures_module.ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = {pool.submit(consult, *key): key for key in groups}
+            for future in futures_module.as_completed(futures):
+                result = future.result()
+                for i, (line_no, item) in enumerate(groups[futures[future]]):
+                    emit(line_no, item, dict(result, deduplicated=i > 0))
+                    counts["ok" if result["ok"] else "error"] += 1
+    finally:
+        if out is not sys.stdout: out.close()
+
+    elapsed = time.perf_counter() - t_start
+    summary = f"{counts['ok']} ok, {counts['error']} failed, {len(records) - len(groups)} deduplicated, {elapsed:.2f}s ({len(groups) / elapsed if elapsed > 0 else 0:.1f} req/s)"
+    print(f"Batch consultation finished: {summary}", file=sys.stderr)
+    log_audit(args.role, "Completed batch LLM consultation", f"{summary}, Output: {args.output}")
+    if counts["error"]: raise PhalanxError(f"{counts['error']} batch queries failed", context={"output": args.output})
+
+
 def handle_validate_workspace(args):
     # Simplified implementation to avoid further errors, assumes ESSENTIAL_CONFIG_LOADED
     config = ESSENTIAL_CONFIG_LOADED
@@ -577,10 +1039,51 @@ def handle_validate_workspace(args):
     return True
 
 
+# --- Episode ANN Index ---
+# Recall goes through a persistent IVF index (episode_index.py) kept in <episodes_db>/ann_index, so a query probes a few
+# clusters instead of scanning every episode in the store. create_episode appends to it incrementally.
+EPISODE_INDEX_DIR = "ann_index"
+EPISODE_INDEX_DEFAULT_THRESHOLD = 0.1 # recall --index: hashed bag-of-words cosine runs lower than the store's similarity
+EPISODE_STORE_DEFAULT_THRESHOLD = 0.3
+
+def get_episodes_db_dir():
+    config = ESSENTIAL_CONFIG_LOADED
+    storage_dir_path = config.get("directories", {}).get("episodes_db", "PHALANX/memory_db") # Default if not in config
+    phalanx_root = config.get("phalanx_root")
+    if not os.path.isabs(storage_dir_path) and phalanx_root:
+        storage_dir_path = os.path.join(phalanx_root, storage_dir_path)
+    return os.path.normpath(storage_dir_path)
+
+def load_episode_index_module():
+    try: return lazy_import("episode_index")
+    except ImportError as e:
+        print(f"WARNING: Episode index unavailable, recall falls back to a full scan: {e}", file=sys.stderr)
+        return None
+
+def sync_episode_index(storage_dir_path, store, rebuild=False):
+    """Brings the index in line with the store (episodes added, edited or removed by other tools); None without NumPy.
+
+    The index records a content fingerprint of what it holds. If the store's copies of those episodes still have the same
+    fingerprint, only the episodes it lacks are appended; any edit, removal or replacement (even one that keeps the
+    count) rebuilds it."""
+    episode_index = load_episode_index_module()
+    if episode_index is None: return None
+    index_dir = os.path.join(storage_dir_path, EPISODE_INDEX_DIR)
+    index = episode_index.EpisodeIndex(index_dir)
+    known = index.ids()
+    if (rebuild or not known <= set(store.ids) or
+            episode_index.fingerprint(store.episodes[ep_id] for ep_id in known) != index.content_fingerprint):
+        return episode_index.rebuild(index_dir, (store.episodes[ep_id] for ep_id in store.ids))
+    missing = [store.episodes[ep_id] for ep_id in store.ids if ep_id not in known]
+    if missing: index.add_many(missing)
+    return index
+
 def handle_create_episode(args):
     config = ESSENTIAL_CONFIG_LOADED
+    Episode, SimpleVectorStore = load_episodic_memory()
     if not Episode or not SimpleVectorStore:
         raise PhalanxError("Episodic memory system not loaded.")
+    ValidationError = lazy_import("pydantic").ValidationError
     
     episode_data = {k: getattr(args, k) for k in ["role", "task", "context", "reasoning", "action", "outcome"] if hasattr(args, k)}
     episode_data["session_id"] = getattr(args, 'session_id', str(uuid.uuid4())[:8])
@@ -591,49 +1094,72 @@ def handle_create_episode(args):
     try: episode = Episode(**episode_data)
     except ValidationError as ve: raise PhalanxError("Episode data validation failed.", context={"errors": json.loads(ve.json())})
     
-    storage_dir_path = config.get("directories", {}).get("episodes_db", "PHALANX/memory_db") # Default if not in config
-    phalanx_root = config.get("phalanx_root")
-    if not os.path.isabs(storage_dir_path) and phalanx_root:
-        storage_dir_path = os.path.join(phalanx_root, storage_dir_path)
-    storage_dir_path = os.path.normpath(storage_dir_path)
+    storage_dir_path = get_episodes_db_dir()
     
     store = SimpleVectorStore(storage_dir=storage_dir_path)
     episode_id = store.add(episode)
     if "ERROR_" in episode_id: raise PhalanxError(f"Failed to add episode: {episode_id}")
+
+    # The index is opt-in (recall --index); keep it current once it exists, but don't create it here.
+    index_dir = os.path.join(storage_dir_path, EPISODE_INDEX_DIR)
+    episode_index = load_episode_index_module() if os.path.isdir(index_dir) else None
+    if episode_index is not None and episode_index.EpisodeIndex.exists(index_dir):
+        sync_episode_index(storage_dir_path, store) # Appends just the new episode unless other tools changed the store
     log_audit(args.role, "Created Memory Episode", f"ID: {episode_id}, Task: {args.task[:50]}...")
     print(f"Memory episode '{episode_id}' stored successfully in {storage_dir_path}.")
 
 
 def handle_recall_episodes(args):
-    config = ESSENTIAL_CONFIG_LOADED
-    if not Episode or not SimpleVectorStore:
-        raise PhalanxError("Episodic memory system not loaded.")
-
     query = args.query
     if not query and not args.list_all:
         # Non-interactive assumption for now
         print("No query provided. Use --query or --list-all.", file=sys.stderr)
         return
 
-    storage_dir_path = config.get("directories", {}).get("episodes_db", "PHALANX/memory_db")
-    phalanx_root = config.get("phalanx_root")
-    if not os.path.isabs(storage_dir_path) and phalanx_root:
-        storage_dir_path = os.path.join(phalanx_root, storage_dir_path)
-    storage_dir_path = os.path.normpath(storage_dir_path)
+    storage_dir_path = get_episodes_db_dir()
+
+    def open_store():
+        Episode, SimpleVectorStore = load_episodic_memory()
+        if not Episode or not SimpleVectorStore:
+            raise PhalanxError("Episodic memory system not loaded.")
+        return SimpleVectorStore(storage_dir=storage_dir_path)
+
+    # By default the store searches its own embeddings. With --index the lexical ANN index answers without loading the
+    # store; the store is then only opened to build or refresh the index.
+    index = None
+    episode_index = load_episode_index_module() if args.index or args.reindex else None
+    if episode_index is not None:
+        index_dir = os.path.join(storage_dir_path, EPISODE_INDEX_DIR)
+        if args.reindex or not episode_index.EpisodeIndex.exists(index_dir):
+            index = sync_episode_index(storage_dir_path, open_store(), rebuild=args.reindex)
+            log_audit(args.role, "Episode Index Built", f"{index.count} episode(s) in {index_dir}")
+        else:
+            index = episode_index.EpisodeIndex(index_dir)
 
-    store = SimpleVectorStore(storage_dir=storage_dir_path)
-    results = []
-    if args.list_all:
-        results = [(1.0, store.episodes[ep_id]) for ep_id in store.ids]
-    elif query:
-        results = store.search(query, top_k=args.limit, similarity_threshold=args.threshold)
+    if index is None:
+        store = open_store()
+        if args.list_all:
+            results = [(1.0, store.episodes[ep_id]) for ep_id in store.ids]
+        else:
+            threshold = args.threshold if args.threshold is not None else EPISODE_STORE_DEFAULT_THRESHOLD
+            results = store.search(query, top_k=args.limit, similarity_threshold=threshold)
+        total = len(results)
+    elif args.list_all:
+        # Streamed from the index's docs file rather than materialising every episode (unless a handoff needs them all).
+        total = index.count
+        results = ((1.0, doc) for doc in index.iter_docs())
+        if args.generate_handoff: results = list(results)
+    else:
+        threshold = args.threshold if args.threshold is not None else EPISODE_INDEX_DEFAULT_THRESHOLD
+        results = index.search(query, top_k=args.limit, similarity_threshold=threshold, nprobe=args.nprobe)
+        total = len(results)
 
-    if not results:
+    if not total:
         print("No relevant episodes found.")
         log_audit(args.role, "Recall Episodes", f"No results for query: '{query if query else '(list_all)'}'")
         return
 
-    print(f"\nFound {len(results)} relevant episode(s):")
+    print(f"\nFound {total} relevant episode(s):")
     for i, (similarity, episode_dict) in enumerate(results, 1):
         print(f"\n--- Episode {i} (ID: {episode_dict['id']}) ---")
         if query and not args.list_all: print(f"  Relevance: {similarity:.4f}")
@@ -673,6 +1199,17 @@ def generate_handoff_from_episodes(recalled_episodes: List[Tuple[float, Dict]],
     log_audit(role, "Handoff Generated", f"File: {handoff_filepath}")
 
 
+def handle_cache_stats(args):
+    cache = get_llm_cache()
+    if cache is None: raise PhalanxError("LLM cache not available", context={"missing_config": "phalanx_root or directories.llm_cache"})
+    stats = cache.stats()
+    print(f"\n--- LLM Cache ({cache.db_path}) ---")
+    print(f"  Entries: {stats['entries']} across {stats['profiles']} profile(s), {stats['bytes'] / 1048576:.1f} of {stats['max_bytes'] / 1048576:.0f} MiB")
+    print(f"  Lookups: {stats['hits']} hit(s), {stats['misses']} miss(es) ({stats['stale']} stale), hit rate {stats['hit_rate']:.1%}")
+    print(f"  Stores: {stats['stores']}, evictions: {stats['evictions']}")
+    log_audit(args.role, "Cache Stats", json.dumps(stats))
+
+
 # This is the main function for direct script execution, using the Zsh-aware parser
 def main():
     """Main function to parse arguments and dispatch commands."""
@@ -682,6 +1219,10 @@ def main():
     parser = PhalanxZshAwareArgumentParser(description="PHALANX CLI Tool - Adherence to the PHALANX doctrine.")
     parser.add_argument("--role", required=True, choices=ESSENTIAL_CONFIG_LOADED.get("roles", ["default_role"]), 
                         help="The role of the user invoking the command.")
+    parser.add_argument("--recheck", action="store_true",
+                        help="Re-run config validation and the directory check even if they passed before for this config.")
+    parser.add_argument("--startup_report", action="store_true", default=bool(os.environ.get("PHALANX_STARTUP_REPORT")),
+                        help="Print where startup time went (imports, config, checks, command) to stderr.")
 
     subparsers = parser.add_subparsers(title="commands", dest="command", required=True,
                                      help="Available PHALANX commands. Use 'phalanx.py <command> --help' for details on each command.")
@@ -704,8 +1245,24 @@ def main():
     consult_llm_parser.add_argument("--agent_profile", default="planner",
                                     choices=list(ESSENTIAL_CONFIG_LOADED.get("agent_profiles", {}).keys()),
                                     help="The agent profile to use for the LLM consultation.")
+    consult_llm_parser.add_argument("--stream", action="store_true",
+                                    help="Print the answer as it is generated and log time-to-first-token and tokens/sec.")
     consult_llm_parser.set_defaults(func=handle_direct_consult_llm)
 
+    # --- consult_batch command ---
+    consult_batch_parser = subparsers.add_parser("consult_batch", help="Consult an LLM agent for many queries concurrently (JSONL in, JSONL out).")
+    consult_batch_parser.add_argument("--input", default="-", help="JSONL file of queries: {\"query\": ..., \"agent_profile\": ..., \"id\": ...} or bare strings (default: stdin).")
+    consult_batch_parser.add_argument("--output", default="-", help="JSONL file for results, written as they complete (default: stdout).")
+    consult_batch_parser.add_argument("--append", action="store_true", help="Append to --output instead of overwriting it.")
+    consult_batch_parser.add_argument("--agent_profile", default="planner",
+                                      choices=list(ESSENTIAL_CONFIG_LOADED.get("agent_profiles", {}).keys()),
+                                      help="Agent profile for queries that don't name one.")
+    consult_batch_parser.add_argument("--concurrency", type=int, default=8, help="Max requests in flight (default: 8).")
+    consult_batch_parser.add_argument("--rate", type=float, default=10.0, help="Max requests per second, 0 for unlimited (default: 10).")
+    consult_batch_parser.add_argument("--burst", type=int, help="Token bucket size (default: --concurrency).")
+    consult_batch_parser.add_argument("--api_url", help="Chat completions endpoint (default: $PERPLEXITY_API_URL or the Perplexity API).")
+    consult_batch_parser.set_defaults(func=handle_consult_batch)
+
     # --- validate_workspace command ---
     validate_ws_parser = subparsers.add_parser("validate_workspace", help="Validate workspace setup and permissions.")
     validate_ws_parser.set_defaults(func=handle_validate_workspace)
@@ -722,29 +1279,39 @@ def main():
     recall_parser = subparsers.add_parser('recall', help='Recall and search episodes from memory.')
     recall_parser.add_argument('--query', '-q', help='Search query for episodic memory.')
     recall_parser.add_argument('--limit', '-l', type=int, default=3, help='Max episodes (default: 3).')
-    recall_parser.add_argument('--threshold', '-t', type=float, default=0.3, help='Min similarity (default: 0.3).')
+    recall_parser.add_argument('--threshold', '-t', type=float, help=f'Min similarity (default: {EPISODE_STORE_DEFAULT_THRESHOLD}, or {EPISODE_INDEX_DEFAULT_THRESHOLD} with --index).')
     recall_parser.add_argument('--list-all', action='store_true', help='List all episodes.')
     recall_parser.add_argument('--verbose', '-v', action='store_true', help='Verbose output.')
     recall_parser.add_argument('--generate-handoff', action='store_true', help='Generate handoff doc.')
+    recall_parser.add_argument('--index', action='store_true', help='Search the lexical ANN index (episode_index.py) instead of the store\'s embeddings; faster on large archives, but scores and rankings differ.')
+    recall_parser.add_argument('--reindex', action='store_true', help='Rebuild the ANN index from the episode store first (implies --index).')
+    recall_parser.add_argument('--nprobe', type=int, default=8, help='With --index: clusters probed per query; higher is slower but closer to exact (default: 8).')
     recall_parser.set_defaults(func=handle_recall_episodes)
 
+    # --- cache_stats command ---
+    cache_stats_parser = subparsers.add_parser('cache_stats', help='Show LLM response cache size and hit/miss counters.')
+    cache_stats_parser.set_defaults(func=handle_cache_stats)
+
+    args = None
     try:
+        t0 = time.perf_counter()
         args = parser.parse_args()
         args.session_id = current_session_id # Add session ID to args
+        record_startup("build parser + parse arguments", time.perf_counter() - t0)
         
         # Basic check if ESSENTIAL_CONFIG_LOADED is populated
         if not ESSENTIAL_CONFIG_LOADED or not ESSENTIAL_CONFIG_LOADED.get("phalanx_root"):
              print("CRITICAL: PHALANX Core Configuration not loaded. Cannot proceed.", file=sys.stderr)
              sys.exit(1)
 
-        validate_config() # Validates ESSENTIAL_CONFIG_LOADED
-        
-        if not ensure_directories_exist(args.role if hasattr(args, 'role') else "SYSTEM_SETUP"):
+        if not run_startup_checks(args.role if hasattr(args, 'role') else "SYSTEM_SETUP", use_cache=not args.recheck):
             print("CRITICAL: Failed to ensure required directory structure. Aborting.", file=sys.stderr)
             sys.exit(1)
 
         if hasattr(args, 'func'):
+            t0 = time.perf_counter()
             args.func(args)
+            record_startup(f"command {args.command}", time.perf_counter() - t0)
         else:
             parser.print_help()
 
@@ -757,6 +1324,8 @@ def main():
         import traceback
         traceback.print_exc()
         sys.exit(1)
+    finally:
+        if args is not None and args.startup_report: print_startup_report()
 
 if __name__ == "__main__":
     # Ensure PHALANX_INVOCATION_CWD is set correctly if phalanx.py is the entry point
@@ -768,4 +1337,13 @@ if __name__ == "__main__":
     
     # Call the new CLI entry point from the phalanx package
     # This ensures that the argument parsing defined in phalanx.cli.main and its submodules is used.
-    phalanx_cli_main() 
\ No newline at end of file
+    # Commands/options only the built-in CLI has (BUILTIN_CLI_COMMANDS/OPTIONS) go to main() above instead, as does
+    # everything when the package CLI can't be imported.
+    if wants_builtin_cli(sys.argv[1:]):
+        main()
+    else:
+        phalanx_cli_main = load_package_cli()
+        try: (phalanx_cli_main or main)()
+        finally:
+            # main() prints its own report; for the package CLI only the env var can ask for one.
+            if phalanx_cli_main and os.environ.get("PHALANX_STARTUP_REPORT"): print_startup_report()
\ No newline at end of file
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+audio_timeline.py
+
+Real audio features for the K1 physics kernel.
+
+useK1Physics.ts fakes its audio inputs with ghostAudio (beat-phase envelopes
+and a synthetic 12-bin chromagram). This tool analyses a WAV/FLAC track once
+and writes, per physics frame, the values those ghosts stand in for:
+
+    waveformPeakScaled  peak |sample| over the frame's audio (x gain)
+    onset               spectral-flux onset strength in [0, 1)
+    chromagram[12]      pitch-class energy C..B, normalised to the loudest
+                        class (0..1; near 0 in silence)
+
+Frame k covers samples [round(k * sr / fps), round((k + 1) * sr / fps)); its
+STFT window (Hann, n_fft) ends where that span ends, so, like the firmware's
+analysis, it only sees audio already played and an onset never lights up
+before it is heard. The track is read in chunks through a fixed-size ring
+buffer, and the frames each chunk completes are transformed together (one
+batched rfft), so memory stays flat for hour-long tracks.
+
+Timeline file (.k1a), little-endian:
+
+    24-byte header  "K1AU" | u16 version | u16 columns | f32 fps |
+                    u32 sampleRate | u32 frames | u32 reserved
+    frames x columns float16, row k = frame k, columns in TIMELINE_COLUMNS
+
+Frame k lives at a fixed offset, so read_timeline() memory-maps the file and
+any frame is one lookup. k1_physics.py consumes it with --audio.
+
+FLAC (and float WAV) needs the optional `soundfile` package; PCM WAV uses the
+standard library.
+
+Usage:
+    python audio_timeline.py track.wav
+    python audio_timeline.py track.flac --fps 60 --out track.k1a
+"""
+
+import argparse
+import os
+import struct
+import sys
+import time
+import wave
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+from scipy import fft as sp_fft
+from scipy.signal import lfilter
+
+
+TIMELINE_MAGIC = b"K1AU"
+TIMELINE_VERSION = 1
+_HEADER = struct.Struct("<4sHHfIII")
+
+TIMELINE_COLUMNS = ("waveformPeakScaled", "onset") + tuple(f"chroma{i}" for i in range(12))
+
+DEFAULT_FPS = 60.0
+DEFAULT_N_FFT = 4096
+CHUNK_SAMPLES = 1 << 16
+
+# Pitch range mapped into the chromagram (C2..C8).
+CHROMA_FMIN = 65.4
+CHROMA_FMAX = 4186.0
+
+# Classes quieter than this (relative to a full-scale sine) count as silence.
+SILENCE_DB = -50.0
+
+# Log compression for spectral flux, and the running-mean time constant
+# the flux is compared against.
+FLUX_COMPRESSION = 100.0
+ONSET_MEAN_SECONDS = 1.0
+
+
+# ---------- READING ----------------------------------------------------------
+
+def _pcm_to_float(raw: bytes, width: int) -> np.ndarray:
+    if width == 1:
+        return (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    if width == 2:
+        return np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    if width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        v = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        v = np.where(v >= 1 << 23, v - (1 << 24), v)
+        return v.astype(np.float32) / float(1 << 23)
+    if width == 4:
+        return np.frombuffer(raw, dtype="<i4").astype(np.float32) / float(1 << 31)
+    raise ValueError(f"Unsupported PCM sample width: {width} bytes")
+
+
+def _open_soundfile(path: str):
+    try:
+        import soundfile
+    except ImportError:
+        raise RuntimeError(
+            f"Reading {os.path.basename(path)} needs the 'soundfile' package "
+            "(pip install soundfile); PCM WAV works without it."
+        ) from None
+    return soundfile.SoundFile(path)
+
+
+def audio_info(path: str) -> Tuple[int, int]:
+    """(sample_rate, total_samples) of an audio file."""
+    try:
+        with wave.open(path, "rb") as w:
+            return w.getframerate(), w.getnframes()
+    except (wave.Error, EOFError):
+        with _open_soundfile(path) as f:
+            return f.samplerate, f.frames
+
+
+def iter_audio_chunks(path: str, chunk: int = CHUNK_SAMPLES) -> Iterator[np.ndarray]:
+    """Yield mono float32 blocks of up to `chunk` samples."""
+    try:
+        w = wave.open(path, "rb")
+    except (wave.Error, EOFError):
+        w = None
+    if w is not None:
+        with w:
+            channels, width = w.getnchannels(), w.getsampwidth()
+            while True:
+                raw = w.readframes(chunk)
+                if not raw:
+                    return
+                yield _pcm_to_float(raw, width).reshape(-1, channels).mean(axis=1)
+    with _open_soundfile(path) as f:
+        for block in f.blocks(blocksize=chunk, dtype="float32", always_2d=True):
+            yield block.mean(axis=1)
+
+
+# ---------- ANALYSIS ---------------------------------------------------------
+
+def chroma_weights(sample_rate: int, n_fft: int) -> np.ndarray:
+    """(n_fft // 2 + 1, 12) matrix assigning each rfft bin to its pitch class."""
+    freqs = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    weights = np.zeros((freqs.size, 12), dtype=np.float32)
+    band = (freqs >= CHROMA_FMIN) & (freqs <= CHROMA_FMAX)
+    midi = 69.0 + 12.0 * np.log2(freqs[band] / 440.0)
+    weights[np.nonzero(band)[0], np.round(midi).astype(np.int64) % 12] = 1.0
+    return weights
+
+
+class AudioAnalyzer:
+    """
+    Streaming feature extractor: push() sample blocks, get completed frames.
+
+    Returns (frames, len(TIMELINE_COLUMNS)) float32 arrays; call finish()
+    after the last block to flush the final, partial frame.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        fps: float = DEFAULT_FPS,
+        n_fft: int = DEFAULT_N_FFT,
+        gain: float = 1.0,
+        max_chunk: int = CHUNK_SAMPLES,
+    ):
+        self.sample_rate = sample_rate
+        self.fps = fps
+        self.n_fft = n_fft
+        self.gain = gain
+        self.max_chunk = max_chunk
+        self.window = np.hanning(n_fft).astype(np.float32)
+        self.weights = chroma_weights(sample_rate, n_fft)
+        # A full-scale sine peaks at |X| ~ n_fft / 4 under a Hann window.
+        self.energy_floor = (n_fft / 4.0) ** 2 * 10.0 ** (SILENCE_DB / 10.0)
+        a = float(np.exp(-1.0 / (fps * ONSET_MEAN_SECONDS)))
+        self.mean_filter = (np.array([1.0 - a]), np.array([1.0, -a]))
+        self.mean_state = np.zeros(1)
+
+        # Ring buffer: data[0] is absolute sample `offset`; starts with n_fft
+        # samples of leading silence so frame 0's window is complete.
+        self.data = np.zeros(n_fft + max_chunk + self.hop_max(), dtype=np.float32)
+        self.size = n_fft
+        self.offset = -n_fft
+        self.samples = 0
+        self.next_frame = 0
+        self.prev_log: Optional[np.ndarray] = None
+
+    def hop_max(self) -> int:
+        return int(np.ceil(self.sample_rate / self.fps)) + 1
+
+    def frame_start(self, k: np.ndarray) -> np.ndarray:
+        return np.round(np.asarray(k) * self.sample_rate / self.fps).astype(np.int64)
+
+    def push(self, block: np.ndarray) -> np.ndarray:
+        out = []
+        for i in range(0, len(block), self.max_chunk):
+            part = block[i:i + self.max_chunk]
+            self.data[self.size:self.size + len(part)] = part
+            self.size += len(part)
+            self.samples += len(part)
+            out.append(self._drain(final=False))
+        return np.concatenate(out) if out else np.zeros((0, len(TIMELINE_COLUMNS)), np.float32)
+
+    def finish(self) -> np.ndarray:
+        """Pad with silence and emit the remaining frames of the track."""
+        total = int(np.ceil(self.samples * self.fps / self.sample_rate))
+        out = []
+        while self.next_frame < total:
+            pad = min(self.max_chunk, len(self.data) - self.size)
+            self.data[self.size:self.size + pad] = 0.0
+            self.size += pad
+            out.append(self._drain(final=True, total=total))
+        return np.concatenate(out) if out else np.zeros((0, len(TIMELINE_COLUMNS)), np.float32)
+
+    def _drain(self, final: bool, total: Optional[int] = None) -> np.ndarray:
+        end = self.offset + self.size
+        # Frames whose span (and so their whole window) is inside the buffer.
+        k_hi = int(np.floor(end * self.fps / self.sample_rate))
+        while k_hi > self.next_frame and int(self.frame_start(k_hi)) > end:
+            k_hi -= 1
+        if final:
+            k_hi = min(k_hi, total)
+        ks = np.arange(self.next_frame, max(k_hi, self.next_frame))
+        features = self._features(ks) if ks.size else np.zeros((0, len(TIMELINE_COLUMNS)), np.float32)
+        self.next_frame += ks.size
+
+        # Drop samples no future frame needs.
+        keep_from = int(self.frame_start(self.next_frame + 1)) - self.n_fft
+        drop = max(0, min(keep_from - self.offset, self.size))
+        if drop:
+            self.data[:self.size - drop] = self.data[drop:self.size]
+            self.size -= drop
+            self.offset += drop
+        return features
+
+    def _features(self, ks: np.ndarray) -> np.ndarray:
+        bounds = self.frame_start(np.append(ks, ks[-1] + 1)) - self.offset
+        starts = bounds[:-1]
+        windows = self.data[(bounds[1:] - self.n_fft)[:, None] + np.arange(self.n_fft)]
+
+        # Waveform peak per frame span (spans tile the buffer contiguously).
+        span = np.abs(self.data[starts[0]:bounds[-1]])
+        peak = np.maximum.reduceat(span, bounds[:-1] - starts[0]) * self.gain
+
+        windows *= self.window
+        mag = np.abs(sp_fft.rfft(windows, axis=1, workers=-1))
+        energy = (mag * mag) @ self.weights
+        chroma = energy / np.maximum(energy.max(axis=1, keepdims=True), self.energy_floor)
+
+        log_mag = np.log1p(FLUX_COMPRESSION * mag)
+        prev = self.prev_log if self.prev_log is not None else log_mag[:1]
+        diff = np.diff(np.concatenate([prev, log_mag]), axis=0)
+        flux = np.maximum(diff, 0.0).mean(axis=1).astype(np.float64)
+        self.prev_log = log_mag[-1:]
+        mean, self.mean_state = lfilter(*self.mean_filter, flux, zi=self.mean_state)
+        onset = np.maximum(flux - mean, 0.0) / (flux + 1e-9)
+
+        return np.column_stack([peak, onset, chroma]).astype(np.float32)
+
+
+# ---------- TIMELINE FILES ---------------------------------------------------
+
+class TimelineWriter:
+    """Appends float16 frames; the frame count is patched into the header on close()."""
+
+    def __init__(self, path: str, fps: float, sample_rate: int):
+        self.path = path
+        self.frames = 0
+        self.fps = fps
+        self.sample_rate = sample_rate
+        self.f = open(path, "wb")
+        self.f.write(self._header())
+
+    def _header(self) -> bytes:
+        return _HEADER.pack(TIMELINE_MAGIC, TIMELINE_VERSION, len(TIMELINE_COLUMNS),
+                            self.fps, self.sample_rate, self.frames, 0)
+
+    def write(self, frames: np.ndarray) -> None:
+        self.f.write(np.asarray(frames, dtype="<f2").tobytes())
+        self.frames += len(frames)
+
+    def close(self) -> None:
+        self.f.seek(0)
+        self.f.write(self._header())
+        self.f.close()
+
+
+@dataclass
+class AudioTimeline:
+    fps: float
+    sampleRate: int
+    data: np.ndarray  # (frames, len(TIMELINE_COLUMNS)) float16, usually memory-mapped
+
+    def __len__(self) -> int:
+        return self.data.shape[0]
+
+    @property
+    def waveformPeakScaled(self) -> np.ndarray:
+        return self.data[:, 0]
+
+    @property
+    def onset(self) -> np.ndarray:
+        return self.data[:, 1]
+
+    @property
+    def chromagram(self) -> np.ndarray:
+        return self.data[:, 2:]
+
+
+def read_timeline(path: str) -> AudioTimeline:
+    """Memory-map a .k1a timeline written by write_timeline / TimelineWriter."""
+    with open(path, "rb") as f:
+        header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise RuntimeError(f"Not a K1 audio timeline: {path}")
+    magic, version, columns, fps, sample_rate, frames, _ = _HEADER.unpack(header)
+    if magic != TIMELINE_MAGIC or version != TIMELINE_VERSION or columns != len(TIMELINE_COLUMNS):
+        raise RuntimeError(f"Not a K1 audio timeline (v{TIMELINE_VERSION}): {path}")
+    if frames == 0:
+        data = np.zeros((0, columns), dtype="<f2")
+    else:
+        data = np.memmap(path, dtype="<f2", mode="r", offset=_HEADER.size, shape=(frames, columns))
+    return AudioTimeline(fps=float(fps), sampleRate=sample_rate, data=data)
+
+
+def write_timeline(
+    audio_path: str,
+    out_path: str,
+    fps: float = DEFAULT_FPS,
+    n_fft: int = DEFAULT_N_FFT,
+    gain: float = 1.0,
+) -> int:
+    """Analyse a track chunk by chunk into a .k1a timeline; returns the frame count."""
+    sample_rate, _ = audio_info(audio_path)
+    analyzer = AudioAnalyzer(sample_rate, fps=fps, n_fft=n_fft, gain=gain)
+    writer = TimelineWriter(out_path, fps, sample_rate)
+    try:
+        for block in iter_audio_chunks(audio_path):
+            writer.write(analyzer.push(block))
+        writer.write(analyzer.finish())
+    finally:
+        writer.close()
+    return writer.frames
+
+
+# ---------- MAIN -------------------------------------------------------------
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Analyse a WAV/FLAC track into a K1 audio timeline.")
+    parser.add_argument("audio", help="Input WAV or FLAC file.")
+    parser.add_argument("--out", help="Output .k1a file (default: next to the input).")
+    parser.add_argument("--fps", type=float, default=DEFAULT_FPS, help="Physics frame rate.")
+    parser.add_argument("--n-fft", type=int, default=DEFAULT_N_FFT, help="STFT window length in samples.")
+    parser.add_argument("--gain", type=float, default=1.0, help="Scale applied to waveformPeakScaled.")
+    args = parser.parse_args(argv)
+
+    out_path = args.out or os.path.splitext(args.audio)[0] + ".k1a"
+    sample_rate, samples = audio_info(args.audio)
+    duration = samples / float(sample_rate)
+
+    t0 = time.perf_counter()
+    frames = write_timeline(args.audio, out_path, fps=args.fps, n_fft=args.n_fft, gain=args.gain)
+    elapsed = time.perf_counter() - t0
+
+    print(f"{args.audio}: {duration:.1f}s @ {sample_rate} Hz -> {frames} frames @ {args.fps:g} fps")
+    print(f"Wrote {out_path} ({os.path.getsize(out_path) / 1024:.1f} KB) "
+          f"in {elapsed:.2f}s ({duration / max(elapsed, 1e-9):.0f}x real time)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
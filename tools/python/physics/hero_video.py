@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+hero_video.py
+
+Render the landing-page hero video on the CPU from an LED timeline.
+
+Each frame is the edge-lit shader (calibration/edge_lit_render.py, PHYSICAL
+and HERO branches) applied to one frame of a .k1ls LED timeline
+(led_timeline.py), so the video shows exactly what the web engine would.
+
+Pipeline:
+    - Frames are split into horizontal bands; (frame, band) tiles go to a
+      process pool. The shader's cost is per row, so bands are independent.
+    - Workers write uint8 RGB straight into a shared-memory ring of frame
+      slots, so no pixel data is pickled between processes.
+    - The main process hands finished slots, in order, to an encoder
+      subprocess (ffmpeg rawvideo on stdin). Nothing touches disk except
+      the final video.
+
+The timeline loops if the video is longer than it (hero loops are short).
+
+Usage:
+    python hero_video.py hero.k1ls --out hero.mp4
+    python hero_video.py hero.k1ls --width 3840 --height 2160 --seconds 30 --workers 8 --out hero_4k.mp4
+    python hero_video.py hero.k1ls --benchmark          # render only, no encoder
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from led_timeline import LedTimeline
+
+# The shader port lives with the calibration tools.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "calibration"))
+from edge_lit_render import OPTICS_MODES, PRESETS, render_frame  # noqa: E402
+
+
+DEFAULT_PRESET = "HERO_V1"
+DEFAULT_BANDS = 4
+
+# Frames in flight per worker (ring slots = workers x this).
+SLOTS_PER_WORKER = 2
+
+
+# ---------- WORKERS ----------------------------------------------------------
+
+_worker = {}
+
+
+def _init_worker(shm_name: str, slot_shape: Tuple[int, ...], slots: int, leds: np.ndarray,
+                 preset: str, mode: Optional[str]) -> None:
+    shm = shared_memory.SharedMemory(name=shm_name)
+    optics, settings = PRESETS[preset]
+    if mode:
+        settings = replace(settings, opticsMode=mode)
+    _worker.update(
+        shm=shm,
+        ring=np.ndarray((slots,) + slot_shape, dtype=np.uint8, buffer=shm.buf),
+        leds=leds,
+        optics=optics,
+        settings=settings,
+    )
+
+
+def _render_tile(slot: int, frame: int, rows: Tuple[int, int]) -> None:
+    w = _worker
+    height, width, _ = w["ring"].shape[1:]
+    bottom, top = w["leds"][frame % len(w["leds"])]
+    tile = render_frame(bottom, top, w["optics"], w["settings"], width, height, rows=rows)
+    # to_uint8, in place and straight into the shared slot.
+    np.clip(tile, 0.0, 1.0, out=tile)
+    tile *= 255.0
+    tile += 0.5
+    np.copyto(w["ring"][slot, rows[0]:rows[1]], tile, casting="unsafe")
+
+
+def band_rows(height: int, bands: int) -> List[Tuple[int, int]]:
+    edges = np.linspace(0, height, max(1, min(bands, height)) + 1).astype(int)
+    return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:])]
+
+
+# ---------- ENCODER ----------------------------------------------------------
+
+def ffmpeg_command(out: str, width: int, height: int, fps: float, ffmpeg: str = "ffmpeg",
+                   crf: int = 18) -> List[str]:
+    return [
+        ffmpeg, "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", f"{fps:g}", "-i", "-",
+        "-c:v", "libx264", "-preset", "slow", "-crf", str(crf), "-pix_fmt", "yuv420p",
+        "-movflags", "+faststart", out,
+    ]
+
+
+# ---------- RENDER -----------------------------------------------------------
+
+def render_video(
+    leds: np.ndarray,
+    frames: int,
+    width: int,
+    height: int,
+    sink=None,
+    preset: str = DEFAULT_PRESET,
+    mode: Optional[str] = None,
+    workers: Optional[int] = None,
+    bands: int = DEFAULT_BANDS,
+    progress: bool = False,
+) -> None:
+    """
+    Render `frames` frames from `leds` ((n, 2, LEDs, 3) bottom/top, looped)
+    and pass each finished (height, width, 3) uint8 frame to sink(frame) in
+    order. The frame is a view into shared memory, valid only during the call.
+    """
+    workers = workers or os.cpu_count() or 1
+    slots = max(2, workers * SLOTS_PER_WORKER)
+    slot_shape = (height, width, 3)
+    rows = band_rows(height, bands)
+    shm = shared_memory.SharedMemory(create=True, size=slots * height * width * 3)
+    try:
+        ring = np.ndarray((slots,) + slot_shape, dtype=np.uint8, buffer=shm.buf)
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(shm.name, slot_shape, slots, leds, preset, mode)) as pool:
+            pending = {}
+
+            def submit(k: int) -> None:
+                pending[k] = [pool.submit(_render_tile, k % slots, k, r) for r in rows]
+
+            for k in range(min(slots, frames)):
+                submit(k)
+            t0 = time.perf_counter()
+            for k in range(frames):
+                for future in pending.pop(k):
+                    future.result()
+                if sink is not None:
+                    sink(ring[k % slots])
+                if k + slots < frames:
+                    submit(k + slots)
+                if progress and (k + 1) % 60 == 0:
+                    rate = (k + 1) / (time.perf_counter() - t0)
+                    print(f"  {k + 1}/{frames} frames ({rate:.1f} fps)", file=sys.stderr)
+            del ring
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+# ---------- MAIN -------------------------------------------------------------
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Render the K1 hero video from an LED timeline.")
+    parser.add_argument("timeline", help=".k1ls LED timeline (led_timeline.py).")
+    parser.add_argument("--out", default="hero.mp4")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--seconds", type=float, help="Video length (default: one pass of the timeline).")
+    parser.add_argument("--preset", default=DEFAULT_PRESET, choices=sorted(PRESETS))
+    parser.add_argument("--mode", choices=sorted(OPTICS_MODES), help="Override the preset's optics mode.")
+    parser.add_argument("--workers", type=int, help="Render processes (default: all cores).")
+    parser.add_argument("--bands", type=int, default=DEFAULT_BANDS, help="Row bands per frame.")
+    parser.add_argument("--ffmpeg", default="ffmpeg", help="Encoder executable.")
+    parser.add_argument("--crf", type=int, default=18)
+    parser.add_argument("--benchmark", action="store_true", help="Render without encoding.")
+    args = parser.parse_args(argv)
+
+    with LedTimeline(args.timeline) as tl:
+        fps = tl.fps
+        leds = tl.frames_range(0, len(tl))
+    frames = int(round(args.seconds * fps)) if args.seconds else len(leds)
+
+    proc = None
+    sink = None
+    # Encoder errors go to a file, not a pipe: nobody reads stderr while
+    # rendering, and a full pipe would stall ffmpeg.
+    encoder_log = tempfile.TemporaryFile()
+    if not args.benchmark:
+        cmd = ffmpeg_command(args.out, args.width, args.height, fps, args.ffmpeg, args.crf)
+        try:
+            proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=encoder_log)
+        except FileNotFoundError:
+            print(f"Encoder not found: {args.ffmpeg} (install ffmpeg or pass --ffmpeg)", file=sys.stderr)
+            encoder_log.close()
+            return 1
+        sink = proc.stdin.write
+
+    print(f"Rendering {frames} frames at {args.width}x{args.height} ({args.preset}, "
+          f"{args.workers or os.cpu_count()} workers, {args.bands} bands)")
+    t0 = time.perf_counter()
+    broken_pipe = False
+    try:
+        render_video(leds, frames, args.width, args.height, sink=sink, preset=args.preset,
+                     mode=args.mode, workers=args.workers, bands=args.bands, progress=True)
+    except BrokenPipeError:
+        broken_pipe = True  # Encoder exited early; its status and log are reported below.
+    finally:
+        if proc is not None:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                broken_pipe = True
+            proc.wait()
+    elapsed = time.perf_counter() - t0
+
+    with encoder_log:
+        if proc is not None and (proc.returncode != 0 or broken_pipe):
+            encoder_log.seek(0)
+            log = encoder_log.read().decode(errors="replace").strip()
+            print(f"Encoder exited with status {proc.returncode}"
+                  f"{' before all frames were written' if broken_pipe else ''}", file=sys.stderr)
+            if log:
+                print(log, file=sys.stderr)
+            return 1
+
+    print(f"{frames} frames in {elapsed:.1f}s ({frames / elapsed:.2f} fps)")
+    if proc is not None:
+        print(f"Wrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+"""
+k1_physics.py
+
+Headless NumPy port of the K1 LED physics kernel
+(apps/web-main/app/k1/core/physics/useK1Physics.ts).
+
+The React hook advances one 160-LED field per animation frame. This engine
+advances many independent simulations at once and records every frame:
+
+    bottom, top = simulate(PhysicsParams(mode="Snapwave"), steps=3600, sims=64)
+    bottom.shape == top.shape == (64, 3600, 160, 4)      # RGBA, float32
+
+so minutes of LED state for video renders, regression fixtures or
+calibration can be generated offline far faster than real time.
+
+Matching the TS kernel:
+    - The LED buffers are float32 (Float32Array in TS) and every arithmetic
+      step is done in float64 and rounded on store, in the same order as the
+      TS loops, so identical inputs give identical float32 buffers.
+    - Scalar state (time, huePos, peak follower) is float64 like JS numbers.
+    - Snapwave ghost audio calls Math.random(); here that comes from a seeded
+      generator, or from a `random` callable to replay a recorded sequence.
+    - Per-frame `delta` is the useFrame delta in seconds (default 1/60).
+    - sin/tanh/pow go through the C math library rather than V8's, which can
+      differ in the last float64 bit; that almost never survives the float32
+      store.
+
+Real audio: audio_timeline.py turns a WAV/FLAC track into per-frame
+waveformPeakScaled / onset / chromagram values; run(..., audio=timeline) with
+ghostAudio=False feeds frame k of the timeline into step k, in place of the
+ghost envelopes. Onsets at or above ONSET_TRIGGER fire the Existing-mode
+centre trigger (the TS kernel has no trigger source without ghost audio, so
+runs without a timeline are unchanged).
+
+All simulations in one batch share the structural switches (mode,
+diagnosticMode, heroMode, ghostAudio); the numeric parameters
+(simulationSpeed, decay, heroLoopDuration, hueOffset) may be scalars or one
+value per simulation.
+
+Usage:
+    python k1_physics.py --mode Snapwave --seconds 60 --out snapwave.npz
+    python k1_physics.py --mode Bloom --sims 256 --seconds 30 --benchmark
+    python k1_physics.py --mode Snapwave --audio track.k1a --out track.npz
+"""
+
+import argparse
+import math
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple, Union
+
+import numpy as np
+
+
+K1_PHYSICS_VERSION = "K1Physics_v1"
+
+LED_COUNT = 160
+LED_STRIDE = 4
+CENTER = LED_COUNT // 2
+
+MODES = ("Existing", "Snapwave", "Bloom")
+DIAGNOSTIC_MODES = ("NONE", "TOP_ONLY", "BOTTOM_ONLY", "COLLISION", "EDGES_ONLY")
+MOTION_MODE = "Center Origin"
+
+HERO_SCHEDULE = (2.0, 5.0, 10.0)
+
+# Onset strength (audio_timeline.py) that fires the Existing-mode trigger.
+ONSET_TRIGGER = 0.5
+
+# Bloom constants (see the Bloom branch of useK1Physics.ts).
+BLOOM_ALPHA = 0.97
+BLOOM_SHARE = 1.0 / 4.0
+BLOOM_FADE_LENGTH = math.floor(LED_COUNT * 0.2)
+
+Numeric = Union[float, np.ndarray]
+
+
+@dataclass
+class PhysicsParams:
+    """Mirror of PhysicsParams in useK1Physics.ts (view-only fields omitted)."""
+    simulationSpeed: Numeric = 1.0
+    decay: Numeric = 0.15
+    ghostAudio: bool = True
+    motionMode: str = MOTION_MODE
+    diagnosticMode: str = "NONE"
+    heroMode: bool = False
+    heroLoopDuration: Numeric = 20.0
+    mode: str = "Existing"
+    hueOffset: Numeric = 0.0
+
+
+# ---------- HELPERS ----------------------------------------------------------
+
+def _f32(x: np.ndarray) -> np.ndarray:
+    return np.asarray(x, dtype=np.float64).astype(np.float32)
+
+
+def hsv_to_rgb(h: np.ndarray, s: Numeric, v: Numeric) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Vectorized hsvToRgb; h wraps into [0, 1) like the TS version."""
+    h = np.fmod(np.asarray(h, dtype=np.float64), 1.0)
+    h = np.where(h < 0.0, h + 1.0, h)
+    s = np.asarray(s, dtype=np.float64)
+    v = np.asarray(v, dtype=np.float64)
+    i = np.floor(h * 6.0)
+    f = h * 6.0 - i
+    p = v * (1.0 - s)
+    q = v * (1.0 - f * s)
+    t = v * (1.0 - (1.0 - f) * s)
+    sector = np.fmod(i, 6.0).astype(np.int64)
+    v, p, q, t = np.broadcast_arrays(v, p, q, t)
+    r = np.choose(sector, (v, q, p, p, t, v))
+    g = np.choose(sector, (t, v, v, q, p, p))
+    b = np.choose(sector, (p, p, t, v, v, q))
+    return r, g, b
+
+
+def shift_leds(field: np.ndarray) -> None:
+    """Center-origin shift, in place on (..., LED_COUNT, 4): halves move outward."""
+    field[..., CENTER + 1:, :] = field[..., CENTER:LED_COUNT - 1, :].copy()
+    field[..., :CENTER, :] = field[..., 1:CENTER + 1, :].copy()
+
+
+def add_color(field: np.ndarray, idx: np.ndarray, r, g, b, intensity) -> None:
+    """addColor for one LED index per simulation, in place on (sims, LED_COUNT, 4)."""
+    sims = np.arange(field.shape[0])
+    idx = np.broadcast_to(np.asarray(idx, dtype=np.int64), sims.shape)
+    ok = (idx >= 0) & (idx < LED_COUNT)
+    if not ok.all():
+        sims, idx = sims[ok], idx[ok]
+        r, g, b, intensity = (np.broadcast_to(np.asarray(a, dtype=np.float64), ok.shape)[ok]
+                              for a in (r, g, b, intensity))
+    for channel, value in enumerate((r, g, b)):
+        cur = field[sims, idx, channel].astype(np.float64)
+        field[sims, idx, channel] = _f32(np.minimum(2.0, cur + value * intensity))
+    field[sims, idx, 3] = 1.0
+
+
+def mirror_top(field: np.ndarray, out: np.ndarray) -> None:
+    """Top strip = LED-reversed field (top[159 - i] = field[i])."""
+    out[...] = field[..., ::-1, :]
+
+
+# ---------- ENGINE -----------------------------------------------------------
+
+class K1Physics:
+    """
+    Batched physics state; step() advances every simulation by one frame.
+
+    After each step `bottom` and `top` hold the (sims, LED_COUNT, 4) textures
+    the hook would upload.
+    """
+
+    def __init__(
+        self,
+        params: PhysicsParams,
+        sims: int = 1,
+        seed: Optional[int] = None,
+        random: Optional[Callable[[int], np.ndarray]] = None,
+    ):
+        if params.motionMode != MOTION_MODE:
+            raise ValueError(f"CENTER ORIGIN VIOLATION: motionMode={params.motionMode!r}; "
+                             f"only {MOTION_MODE!r} is allowed")
+        if params.mode not in MODES:
+            raise ValueError(f"Unknown mode {params.mode!r}; expected one of {MODES}")
+        if params.diagnosticMode not in DIAGNOSTIC_MODES:
+            raise ValueError(f"Unknown diagnosticMode {params.diagnosticMode!r}; expected one of {DIAGNOSTIC_MODES}")
+
+        self.params = params
+        self.sims = sims
+
+        def per_sim(value: Numeric) -> np.ndarray:
+            return np.broadcast_to(np.asarray(value, dtype=np.float64), (sims,)).copy()
+
+        self.simulation_speed = per_sim(params.simulationSpeed)
+        self.decay = per_sim(params.decay)
+        self.hero_loop_duration = per_sim(params.heroLoopDuration)
+        self.hue_offset = per_sim(params.hueOffset)
+
+        if random is None:
+            rng = np.random.default_rng(seed)
+            random = rng.random
+        self.random = random
+
+        shape = (sims, LED_COUNT, LED_STRIDE)
+        self.field = np.zeros(shape, dtype=np.float32)
+        self.field_prev = np.zeros(shape, dtype=np.float32)
+        self.bottom = np.zeros(shape, dtype=np.float32)
+        self.top = np.zeros(shape, dtype=np.float32)
+        self.chromagram = np.zeros((sims, 12), dtype=np.float32)
+        self.hue_pos = np.zeros(sims)
+        self.time = np.zeros(sims)
+        self.last_phase = np.zeros(sims)
+        self.waveform_peak_scaled = np.zeros(sims)
+        self.waveform_peak_scaled_last = np.zeros(sims)
+        self.onset = np.zeros(sims)
+        self.frame = 0
+
+    # --- frame ---------------------------------------------------------------
+
+    def step(self, delta: float = 1.0 / 60.0) -> None:
+        p = self.params
+        dt = delta * self.simulation_speed
+        self.time += dt
+        field = self.field
+
+        trigger = np.zeros(self.sims)
+        if p.diagnosticMode == "NONE":
+            if p.heroMode:
+                phase_prev = self.last_phase
+                phase = np.fmod(self.time, self.hero_loop_duration)
+                field[phase < phase_prev] = 0.0
+                for t in HERO_SCHEDULE:
+                    trigger[(phase_prev < t) & (phase >= t)] = 1.0
+                self.last_phase = phase
+            elif p.ghostAudio:
+                beat = np.fmod(self.time * 2.0, 1.0)
+                trigger[beat < 0.1] = 1.0
+            else:
+                trigger[self.onset >= ONSET_TRIGGER] = 1.0
+
+        if p.diagnosticMode == "NONE" and p.mode == "Snapwave":
+            self._snapwave()
+        elif p.diagnosticMode == "NONE" and p.mode == "Bloom":
+            self._bloom()
+        elif p.diagnosticMode != "NONE":
+            self._diagnostic()
+        else:
+            self._existing(trigger)
+
+    def _publish(self) -> None:
+        self.bottom[...] = self.field
+        mirror_top(self.field, self.top)
+
+    def _existing(self, trigger: np.ndarray) -> None:
+        field = self.field
+        field[...] = _f32(field * (1.0 - self.decay)[:, None, None])
+        shift_leds(field)
+
+        self.hue_pos += 0.002 * self.simulation_speed
+        r, g, b = hsv_to_rgb(self.hue_pos, 1.0, 1.0)
+        hit = trigger > 0
+        if hit.any():
+            intensity = np.where(hit, trigger * 2.0, 0.0)
+            sub = field[hit]
+            add_color(sub, CENTER - 1, r[hit], g[hit], b[hit], intensity[hit])
+            add_color(sub, CENTER, r[hit], g[hit], b[hit], intensity[hit])
+            field[hit] = sub
+        self._publish()
+
+    def _snapwave(self) -> None:
+        field = self.field
+        if self.params.ghostAudio:
+            beat_phase = np.fmod(self.time * 1.25, 1.0)
+            env_raw = np.maximum(0.0, np.sin(beat_phase * math.pi))
+            self.waveform_peak_scaled = 0.6 * env_raw + 0.2 * np.asarray(self.random(self.sims), dtype=np.float64)
+        peak_now = self.waveform_peak_scaled
+        smoothed = peak_now * 0.1 + self.waveform_peak_scaled_last * 0.9
+        self.waveform_peak_scaled_last = smoothed
+
+        abs_amp = np.minimum(1.0, np.abs(peak_now))
+        dynamic_fade = 1.0 - 0.1 * abs_amp
+        field[...] = _f32(field * ((1.0 - self.decay) * dynamic_fade)[:, None, None])
+
+        shift_leds(field)
+
+        self.hue_pos += 0.002 * self.simulation_speed + self.hue_offset
+        millis = self.time * 1000.0
+        osc = np.tanh(np.sin(millis * 0.002) * 2.0)
+        amp = np.clip(osc * smoothed * 0.7, -1.0, 1.0)
+
+        r, g, b = hsv_to_rgb(self.hue_pos, 1.0, 1.0)
+        intensity = 0.5 + 0.5 * np.abs(smoothed)
+        offset = np.floor(np.abs(amp) * (CENTER * 0.9)).astype(np.int64)
+        pos_left = np.maximum(0, CENTER - offset)
+        pos_right = np.minimum(LED_COUNT - 1, CENTER + offset)
+        add_color(field, pos_left, r, g, b, intensity)
+        add_color(field, pos_right, r, g, b, intensity)
+        self._publish()
+
+    def _bloom(self) -> None:
+        field, field_prev, chroma = self.field, self.field_prev, self.chromagram
+
+        if self.params.ghostAudio:
+            beat_phase = np.fmod(self.time * 1.2, 1.0)
+            envelope = np.maximum(0.0, np.sin(beat_phase * math.pi))
+            dominant = np.floor(np.fmod(self.time * 0.5, 12.0))
+            bins = np.arange(12)
+            dist = np.abs(bins[None, :] - dominant[:, None])
+            dist = np.minimum(dist, 12 - dist)
+            chroma[...] = _f32(np.where(dist <= 1,
+                                        envelope[:, None] * (0.8 - dist * 0.3),
+                                        envelope[:, None] * 0.05))
+
+        # draw_sprite: move the previous frame by `position` LEDs with linear split.
+        beat_phase2 = np.fmod(self.time * 1.2, 1.0)
+        mood = np.power(np.maximum(0.0, np.sin(beat_phase2 * math.pi)), 0.5)
+        position = 0.0 + 3.0 * mood
+        whole = np.floor(position).astype(np.int64)
+        mix_right = position - whole
+        mix_left = 1.0 - mix_right
+
+        # Destination d receives src d-whole-1 (right share) then src d-whole
+        # (left share), in that order in the TS loop. Sources left of LED 0
+        # read from zero padding; whole is at most 3.
+        pad = 4
+        prev = np.zeros((self.sims, LED_COUNT + pad, 3))
+        prev[:, pad:] = field_prev[:, :, :3]
+        acc = np.zeros((self.sims, LED_COUNT, 3), dtype=np.float32)
+        for w in np.unique(whole):
+            group = whole == w
+            start = pad - int(w)
+            for offset, mix in ((start - 1, mix_right), (start, mix_left)):
+                src = prev[group, offset:offset + LED_COUNT]
+                acc[group] = _f32(acc[group] + src * mix[group][:, None, None] * BLOOM_ALPHA)
+        field[...] = 0.0
+        field[:, :, :3] = acc
+
+        # Chromagram colour synthesis. cumsum adds bin by bin, in the TS order.
+        hue = np.arange(12) / 12.0
+        value = np.sqrt(chroma.astype(np.float64)) * BLOOM_SHARE
+        rgb = np.stack(hsv_to_rgb(hue[None, :], 1.0, value), axis=-1)
+        colour = _f32(np.minimum(np.cumsum(rgb, axis=1)[:, -1], 2.0))
+        for idx in (CENTER - 1, CENTER):
+            field[:, idx, :3] = colour
+            field[:, idx, 3] = 1.0
+
+        field_prev[...] = field
+
+        # Edge fade on the right end, then mirror the right half onto the left.
+        prog = np.arange(BLOOM_FADE_LENGTH) / (BLOOM_FADE_LENGTH - 1)
+        fade = prog * prog
+        idx = LED_COUNT - 1 - np.arange(BLOOM_FADE_LENGTH)
+        field[:, idx, :3] = _f32(field[:, idx, :3] * fade[None, :, None])
+        field[:, :CENTER, :] = field[:, LED_COUNT - 1:CENTER - 1:-1, :]
+        self._publish()
+
+    def _diagnostic(self) -> None:
+        mode = self.params.diagnosticMode
+        field = self.field
+        field[...] = 0.0
+        self.bottom[...] = 0.0
+        self.top[...] = 0.0
+        if mode == "EDGES_ONLY":
+            add_color(field, 0, 1.0, 1.0, 1.0, 1.0)
+            add_color(field, LED_COUNT - 1, 1.0, 1.0, 1.0, 1.0)
+        else:
+            add_color(field, CENTER - 1, 1.0, 1.0, 1.0, 1.0)
+            add_color(field, CENTER, 1.0, 1.0, 1.0, 1.0)
+        if mode != "TOP_ONLY":
+            self.bottom[...] = field
+        if mode != "BOTTOM_ONLY":
+            mirror_top(field, self.top)
+
+    # --- batches -------------------------------------------------------------
+
+    def set_audio_frame(self, audio, k: int) -> None:
+        """Load frame k of an audio timeline into every simulation's audio inputs."""
+        if k < len(audio):
+            self.waveform_peak_scaled[:] = float(audio.waveformPeakScaled[k])
+            self.onset[:] = float(audio.onset[k])
+            self.chromagram[:] = np.asarray(audio.chromagram[k], dtype=np.float32)
+        else:
+            self.waveform_peak_scaled[:] = 0.0
+            self.onset[:] = 0.0
+            self.chromagram[:] = 0.0
+
+    def run(
+        self,
+        steps: int,
+        delta: Union[float, np.ndarray] = 1.0 / 60.0,
+        out: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+        audio=None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Advance `steps` frames, returning (bottom, top) of shape
+        (sims, steps, LED_COUNT, 4). `delta` is one frame time or one per
+        step; pass `out` to fill preallocated arrays (e.g. np.memmap).
+        Call repeatedly to generate long runs in chunks.
+
+        `audio` is an audio_timeline.AudioTimeline (needs ghostAudio=False);
+        frames past its end are silence.
+        """
+        if audio is not None and self.params.ghostAudio:
+            raise ValueError("audio timelines replace ghost audio; set ghostAudio=False")
+        deltas = np.broadcast_to(np.asarray(delta, dtype=np.float64), (steps,))
+        if out is None:
+            shape = (self.sims, steps, LED_COUNT, LED_STRIDE)
+            out = (np.empty(shape, dtype=np.float32), np.empty(shape, dtype=np.float32))
+        bottom, top = out
+        for t in range(steps):
+            if audio is not None:
+                self.set_audio_frame(audio, self.frame)
+            self.step(float(deltas[t]))
+            self.frame += 1
+            bottom[:, t] = self.bottom
+            top[:, t] = self.top
+        return bottom, top
+
+
+def simulate(
+    params: PhysicsParams,
+    steps: int,
+    sims: int = 1,
+    delta: Union[float, np.ndarray] = 1.0 / 60.0,
+    seed: Optional[int] = None,
+    audio=None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Run fresh simulations; returns (bottom, top), each (sims, steps, LED_COUNT, 4) float32."""
+    return K1Physics(params, sims=sims, seed=seed).run(steps, delta, audio=audio)
+
+
+# ---------- MAIN -------------------------------------------------------------
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate K1 LED states offline.")
+    parser.add_argument("--mode", default="Existing", choices=MODES)
+    parser.add_argument("--diagnostic", default="NONE", choices=DIAGNOSTIC_MODES)
+    parser.add_argument("--hero", action="store_true", help="Use the hero-loop trigger schedule.")
+    parser.add_argument("--no-ghost-audio", action="store_true")
+    parser.add_argument("--speed", type=float, default=1.0, help="simulationSpeed")
+    parser.add_argument("--decay", type=float, default=0.15)
+    parser.add_argument("--hue-offset", type=float, default=0.0)
+    parser.add_argument("--sims", type=int, default=1)
+    parser.add_argument("--seconds", type=float, help="Duration (default: 10, or the whole --audio track).")
+    parser.add_argument("--fps", type=float, help="Frame rate (default: 60, or the --audio timeline's).")
+    parser.add_argument("--audio", help="Drive the simulation from a .k1a timeline (audio_timeline.py).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write bottom/top arrays to this .npz file.")
+    parser.add_argument("--benchmark", action="store_true", help="Report simulated-seconds per wall-second.")
+    args = parser.parse_args(argv)
+
+    audio = None
+    if args.audio:
+        from audio_timeline import read_timeline
+        audio = read_timeline(args.audio)
+    fps = args.fps or (audio.fps if audio is not None else 60.0)
+    seconds = args.seconds or (len(audio) / audio.fps if audio is not None else 10.0)
+
+    params = PhysicsParams(
+        simulationSpeed=args.speed,
+        decay=args.decay,
+        ghostAudio=not args.no_ghost_audio and audio is None,
+        diagnosticMode=args.diagnostic,
+        heroMode=args.hero,
+        mode=args.mode,
+        hueOffset=args.hue_offset,
+    )
+    steps = int(round(seconds * fps))
+
+    t0 = time.perf_counter()
+    bottom, top = simulate(params, steps, sims=args.sims, delta=1.0 / fps, seed=args.seed, audio=audio)
+    elapsed = time.perf_counter() - t0
+
+    if args.out:
+        np.savez(args.out, bottom=bottom, top=top, fps=fps, version=K1_PHYSICS_VERSION)
+        print(f"Wrote {bottom.shape} bottom/top LED states -> {args.out}")
+    if args.benchmark or not args.out:
+        simulated = args.sims * steps / fps
+        print(f"{args.sims} sims x {steps} steps in {elapsed:.2f}s "
+              f"({simulated / max(elapsed, 1e-9):.0f}x real time)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
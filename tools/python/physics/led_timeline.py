@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+led_timeline.py
+
+Precomputed LED-state timelines: render a physics run once (k1_physics.py)
+and play it back by frame index instead of simulating in the browser.
+
+File layout (.k1ls, little-endian):
+
+    header (40 bytes)
+        "K1LS" | u16 version | u8 format | u8 reserved | u16 leds |
+        u16 strips | u16 channels | u16 chunkFrames | u32 frames | f32 fps |
+        f32 scale | u32 chunks | u64 indexOffset
+    chunks       zlib streams, one per chunkFrames frames
+    index        (chunks + 1) x u64 byte offsets; chunk c is
+                 bytes [index[c], index[c + 1])
+
+format 0 stores uint8 (value = byte / 255 * scale, scale defaults to 2.0,
+the kernel's addColor ceiling); format 1 stores float16 bit patterns
+(lossless for the float16 range).
+
+Inside a chunk the frames are laid out column by column (strip, channel,
+LED, then frame), and each column holds its first value followed by
+frame-to-frame differences (modulo 2^8 / 2^16 on the stored integers, so the
+round trip is exact). LEDs change slowly from frame to frame, so the
+differences are mostly zero and deflate well. Strips are (bottom, top); only
+RGB is kept.
+
+Seeking to frame k reads the 40-byte header and the index once, then one
+byte range (chunk k // chunkFrames), whose size is bounded by chunkFrames,
+so it is O(1) in the timeline length. A web client does the same with HTTP
+Range requests and DecompressionStream("deflate").
+
+Usage:
+    python led_timeline.py --out hero.k1ls                       # one hero loop
+    python led_timeline.py --mode Bloom --seconds 60 --format float16 --out bloom.k1ls
+    python led_timeline.py --info hero.k1ls
+"""
+
+import argparse
+import os
+import struct
+import sys
+import time
+import zlib
+from collections import OrderedDict
+from typing import Tuple
+
+import numpy as np
+
+from k1_physics import LED_COUNT, MODES, K1Physics, PhysicsParams
+
+
+LED_TIMELINE_MAGIC = b"K1LS"
+LED_TIMELINE_VERSION = 1
+_HEADER = struct.Struct("<4sHBBHHHHIffIQ")
+
+FORMATS = ("uint8", "float16")
+_STORAGE = {"uint8": np.uint8, "float16": np.uint16}
+
+STRIPS = 2
+CHANNELS = 3
+DEFAULT_CHUNK_FRAMES = 120
+DEFAULT_SCALE = 2.0
+COMPRESSION_LEVEL = 6
+
+# Decoded chunks kept by LedTimeline (sequential playback hits the same chunk).
+CHUNK_CACHE = 4
+
+HERO_LOOP_SECONDS = 20.0  # TIMELINE_DURATION in apps/web-main/app/engine/timeline/sequence.ts
+
+
+# ---------- ENCODING ---------------------------------------------------------
+
+def quantize(frames: np.ndarray, fmt: str, scale: float = DEFAULT_SCALE) -> np.ndarray:
+    """(frames, strips, leds, 3) float -> stored integers."""
+    if fmt == "uint8":
+        return np.round(np.clip(frames / scale, 0.0, 1.0) * 255.0).astype(np.uint8)
+    return np.asarray(frames, dtype=np.float16).view(np.uint16)
+
+
+def dequantize(stored: np.ndarray, fmt: str, scale: float = DEFAULT_SCALE) -> np.ndarray:
+    if fmt == "uint8":
+        return stored.astype(np.float32) * np.float32(scale / 255.0)
+    return stored.view(np.float16).astype(np.float32)
+
+
+def encode_chunk(stored: np.ndarray) -> bytes:
+    """(frames, strips, leds, 3) stored integers -> compressed columnar deltas."""
+    columns = np.ascontiguousarray(stored.transpose(1, 3, 2, 0))
+    deltas = columns.copy()
+    deltas[..., 1:] -= columns[..., :-1]  # wraps modulo the integer width
+    return zlib.compress(deltas.tobytes(), COMPRESSION_LEVEL)
+
+
+def decode_chunk(blob: bytes, dtype, frames: int, leds: int) -> np.ndarray:
+    """Inverse of encode_chunk."""
+    deltas = np.frombuffer(zlib.decompress(blob), dtype=dtype).reshape(STRIPS, CHANNELS, leds, frames)
+    columns = np.cumsum(deltas, axis=-1, dtype=dtype)
+    return columns.transpose(3, 0, 2, 1)
+
+
+# ---------- WRITER / READER --------------------------------------------------
+
+class LedTimelineWriter:
+    """
+    Streaming writer: append (bottom, top) frame blocks of any length,
+    close() writes the index and patches the header.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fps: float,
+        fmt: str = "uint8",
+        chunk_frames: int = DEFAULT_CHUNK_FRAMES,
+        scale: float = DEFAULT_SCALE,
+        leds: int = LED_COUNT,
+    ):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format {fmt!r}; expected one of {FORMATS}")
+        self.path = path
+        self.fps = fps
+        self.fmt = fmt
+        self.chunk_frames = chunk_frames
+        self.scale = scale
+        self.leds = leds
+        self.frames = 0
+        self.offsets = []
+        self.pending = []
+        self.pending_frames = 0
+        self.f = open(path, "wb")
+        self.f.write(self._header(0))
+
+    def _header(self, index_offset: int) -> bytes:
+        return _HEADER.pack(LED_TIMELINE_MAGIC, LED_TIMELINE_VERSION, FORMATS.index(self.fmt), 0,
+                            self.leds, STRIPS, CHANNELS, self.chunk_frames, self.frames,
+                            self.fps, self.scale, len(self.offsets), index_offset)
+
+    def write(self, bottom: np.ndarray, top: np.ndarray) -> None:
+        """Append frames; bottom/top are (frames, leds, 3 or 4) arrays."""
+        block = np.stack([bottom[..., :CHANNELS], top[..., :CHANNELS]], axis=1)
+        self.pending.append(quantize(block, self.fmt, self.scale))
+        self.pending_frames += len(block)
+        self.frames += len(block)
+        if self.pending_frames >= self.chunk_frames:
+            self._flush(final=False)
+
+    def _flush(self, final: bool) -> None:
+        if not self.pending:
+            return
+        stored = np.concatenate(self.pending)
+        full = len(stored) if final else len(stored) - len(stored) % self.chunk_frames
+        for start in range(0, full, self.chunk_frames):
+            self.offsets.append(self.f.tell())
+            self.f.write(encode_chunk(stored[start:start + self.chunk_frames]))
+        rest = stored[full:]
+        self.pending = [rest] if len(rest) else []
+        self.pending_frames = len(rest)
+
+    def close(self) -> None:
+        self._flush(final=True)
+        index_offset = self.f.tell()
+        self.f.write(np.asarray(self.offsets + [index_offset], dtype="<u8").tobytes())
+        self.f.seek(0)
+        self.f.write(self._header(index_offset))
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LedTimeline:
+    """Random-access reader; frame(k) returns (bottom, top) as (leds, 3) float32."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.f = open(path, "rb")
+        header = self.f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise RuntimeError(f"Not a K1 LED timeline: {path}")
+        (magic, version, fmt, _, self.leds, strips, channels, self.chunk_frames,
+         self.frames, self.fps, self.scale, chunks, index_offset) = _HEADER.unpack(header)
+        if magic != LED_TIMELINE_MAGIC or version != LED_TIMELINE_VERSION:
+            raise RuntimeError(f"Not a K1 LED timeline (v{LED_TIMELINE_VERSION}): {path}")
+        if (strips, channels) != (STRIPS, CHANNELS) or fmt >= len(FORMATS):
+            raise RuntimeError(f"Unsupported LED timeline layout in {path}")
+        self.fmt = FORMATS[fmt]
+        self.f.seek(index_offset)
+        self.index = np.frombuffer(self.f.read(8 * (chunks + 1)), dtype="<u8")
+        self._cache: "OrderedDict[int, np.ndarray]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return self.frames
+
+    def chunk_range(self, c: int) -> Tuple[int, int]:
+        """Byte range [start, end) of chunk c (what an HTTP Range request would fetch)."""
+        return int(self.index[c]), int(self.index[c + 1])
+
+    def _chunk(self, c: int) -> np.ndarray:
+        if c in self._cache:
+            self._cache.move_to_end(c)
+            return self._cache[c]
+        start, end = self.chunk_range(c)
+        self.f.seek(start)
+        frames = min(self.chunk_frames, self.frames - c * self.chunk_frames)
+        stored = decode_chunk(self.f.read(end - start), _STORAGE[self.fmt], frames, self.leds)
+        values = dequantize(stored, self.fmt, self.scale)
+        self._cache[c] = values
+        if len(self._cache) > CHUNK_CACHE:
+            self._cache.popitem(last=False)
+        return values
+
+    def frame(self, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if not 0 <= k < self.frames:
+            raise IndexError(f"frame {k} out of range (0..{self.frames - 1})")
+        values = self._chunk(k // self.chunk_frames)[k % self.chunk_frames]
+        return values[0], values[1]
+
+    def frames_range(self, start: int, stop: int) -> np.ndarray:
+        """(stop - start, strips, leds, 3) float32 for frames [start, stop)."""
+        stop = min(stop, self.frames)
+        parts = []
+        k = start
+        while k < stop:
+            c = k // self.chunk_frames
+            chunk = self._chunk(c)
+            lo = k - c * self.chunk_frames
+            hi = min(len(chunk), lo + stop - k)
+            parts.append(chunk[lo:hi])
+            k += hi - lo
+        return np.concatenate(parts) if parts else np.zeros((0, STRIPS, self.leds, CHANNELS), np.float32)
+
+    def close(self) -> None:
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def export_run(
+    engine: K1Physics,
+    path: str,
+    steps: int,
+    fps: float,
+    fmt: str = "uint8",
+    chunk_frames: int = DEFAULT_CHUNK_FRAMES,
+    audio=None,
+) -> int:
+    """Render `steps` frames of simulation 0 of `engine` into a timeline; returns the file size."""
+    with LedTimelineWriter(path, fps, fmt=fmt, chunk_frames=chunk_frames) as writer:
+        for start in range(0, steps, chunk_frames):
+            bottom, top = engine.run(min(chunk_frames, steps - start), 1.0 / fps, audio=audio)
+            writer.write(bottom[0], top[0])
+    return os.path.getsize(path)
+
+
+# ---------- MAIN -------------------------------------------------------------
+
+def print_info(path: str) -> None:
+    with LedTimeline(path) as tl:
+        raw = tl.frames * STRIPS * tl.leds * CHANNELS * np.dtype(_STORAGE[tl.fmt]).itemsize
+        size = os.path.getsize(path)
+        print(f"{path}: {tl.frames} frames @ {tl.fps:g} fps ({tl.frames / tl.fps:.1f}s), "
+              f"{tl.fmt}, {len(tl.index) - 1} chunks of {tl.chunk_frames}")
+        print(f"  {size / 1024:.1f} KB ({raw / max(size, 1):.1f}x smaller than raw {raw / 1024:.1f} KB)")
+        rng = np.random.default_rng(0)
+        picks = rng.integers(0, tl.frames, 200)
+        t0 = time.perf_counter()
+        for k in picks:
+            tl._cache.clear()
+            tl.frame(int(k))
+        print(f"  random seek + decode: {(time.perf_counter() - t0) / len(picks) * 1e3:.2f} ms/frame")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Render K1 physics runs to seekable LED timelines.")
+    parser.add_argument("--info", metavar="FILE", help="Describe an existing timeline and exit.")
+    parser.add_argument("--out", default="hero.k1ls", help="Output .k1ls file.")
+    parser.add_argument("--mode", default="Snapwave", choices=MODES)
+    parser.add_argument("--no-hero", action="store_true", help="Free-running instead of the hero loop.")
+    parser.add_argument("--seconds", type=float, default=HERO_LOOP_SECONDS)
+    parser.add_argument("--fps", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--audio", help="Drive the run from a .k1a timeline (audio_timeline.py).")
+    parser.add_argument("--format", default="uint8", choices=FORMATS)
+    parser.add_argument("--chunk-frames", type=int, default=DEFAULT_CHUNK_FRAMES)
+    args = parser.parse_args(argv)
+
+    if args.info:
+        print_info(args.info)
+        return 0
+
+    audio = None
+    if args.audio:
+        from audio_timeline import read_timeline
+        audio = read_timeline(args.audio)
+    params = PhysicsParams(mode=args.mode, heroMode=not args.no_hero,
+                           heroLoopDuration=HERO_LOOP_SECONDS, ghostAudio=audio is None)
+    engine = K1Physics(params, seed=args.seed)
+    steps = int(round(args.seconds * args.fps))
+
+    t0 = time.perf_counter()
+    export_run(engine, args.out, steps, args.fps, fmt=args.format,
+               chunk_frames=args.chunk_frames, audio=audio)
+    print(f"Rendered {steps} frames in {time.perf_counter() - t0:.2f}s")
+    print_info(args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())